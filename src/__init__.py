@@ -9,7 +9,7 @@ from src.data_models.models import (
     SyllabusNode, QuestionTopicMap, TopicStatus,
 
     # Memory Management Agent
-    MemoryArtifact, MemoryType, VECTOR_DIM,
+    VECTOR_DIM,
 
     # Question generator agent
     # (Models may be shared, e.g. QuestionNormalized)
@@ -17,21 +17,12 @@ from src.data_models.models import (
     # Template Generator Agent
     VariantGroup,
 
-    # Voting & Ranking Agent
-    EnsembleVote, VoteDecision,
-
     # Pattern & Trend Analysis Agent
     TrendSnapshot, PredictionCandidate, CandidateStatus,
     
     # Sample Paper generator agent
     SamplePaper, SamplePaperItem,
 
-    # Reasoning + Report Generation Agent
-    ProvenanceLink,
-
-    # Evaluation agent
-    ModelRun, EvaluationResult, Exclusion, ExclusionReason, ModelPhase,
-    
     # Submission Builder Agent
     # (Uses SamplePaper and others)
 )
\ No newline at end of file
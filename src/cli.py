@@ -18,9 +18,28 @@ def main():
         default=2025,
         help="Target year for exam prediction (default: 2025)"
     )
+    parser.add_argument(
+        "--grouping-sweep",
+        action="store_true",
+        help="Report variant group counts for thresholds 0.80-0.95 and exit"
+    )
+    parser.add_argument(
+        "--regroup-threshold",
+        type=float,
+        default=None,
+        help="Regroup variants at this similarity threshold and exit"
+    )
     
     args = parser.parse_args()
     
+    if args.grouping_sweep or args.regroup_threshold is not None:
+        from src.sub_agents.question_preprocessing_agent.variant_grouping import threshold_sweep, regroup_at_threshold
+        if args.grouping_sweep:
+            asyncio.run(threshold_sweep())
+        else:
+            asyncio.run(regroup_at_threshold(args.regroup_threshold))
+        return
+    
     logger.info("")
     logger.info(f"🎓 Generating exam paper for {args.target_year}...")
     logger.info(f"📁 Reading PYQs from: static/pyqs/")
@@ -1,17 +1,17 @@
 from src.data_models.models import (
-    QuestionRaw, VariantGroup, QuestionNormalized, SyllabusNode, 
-    TrendSnapshot, PredictionCandidate, SamplePaper, MemoryArtifact,
-    ModelRun, EnsembleVote, Exclusion, QuestionParameter, QuestionTopicMap,
-    CompositeQuestion, SamplePaperItem, ProvenanceLink, EvaluationResult,
-    MemoryType, ExclusionReason, ModelPhase, VoteDecision, CandidateStatus, TopicStatus,
+    QuestionRaw, PdfIngestion, ExtractionCache, GeminiFileUpload, EmbeddingCache, ClusteringTree, VariantGroup, QuestionNormalized, SyllabusNode, 
+    TrendSnapshot, PredictionCandidate, SamplePaper,
+    QuestionParameter, QuestionTopicMap,
+    CompositeQuestion, SamplePaperItem,
+    CandidateStatus, TopicStatus,
     VECTOR_DIM
 )
 
 __all__=[
-    "QuestionRaw", "VariantGroup", "QuestionNormalized", "SyllabusNode", 
-    "TrendSnapshot", "PredictionCandidate", "SamplePaper", "MemoryArtifact",
-    "ModelRun", "EnsembleVote", "Exclusion", "QuestionParameter", "QuestionTopicMap",
-    "CompositeQuestion", "SamplePaperItem", "ProvenanceLink", "EvaluationResult",
-    "MemoryType", "ExclusionReason", "ModelPhase", "VoteDecision", "CandidateStatus", "TopicStatus",
+    "QuestionRaw", "PdfIngestion", "ExtractionCache", "GeminiFileUpload", "EmbeddingCache", "ClusteringTree", "VariantGroup", "QuestionNormalized", "SyllabusNode", 
+    "TrendSnapshot", "PredictionCandidate", "SamplePaper",
+    "QuestionParameter", "QuestionTopicMap",
+    "CompositeQuestion", "SamplePaperItem",
+    "CandidateStatus", "TopicStatus",
     "VECTOR_DIM"
 ]
\ No newline at end of file
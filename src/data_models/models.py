@@ -3,6 +3,7 @@ from datetime import datetime
 from uuid import UUID, uuid4
 from enum import Enum
 from sqlmodel import Field, SQLModel, Relationship, Column
+from sqlalchemy import UniqueConstraint, Index, text
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY, TEXT
 from pgvector.sqlalchemy import Vector
 
@@ -24,20 +25,81 @@ class TopicStatus(str, Enum):
 
 # Models
 
+class PdfIngestion(SQLModel, table=True):
+    __tablename__ = "pdf_ingestions"
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    file_hash: str = Field(unique=True, index=True) # SHA-256 of the PDF bytes
+    source_file: str # File name at first ingestion; renamed copies share the row
+    question_count: int = Field(default=0)
+    extraction_path: str # "rules", "rules+windows", "markdown", "windows", "multimodal", "cache" or "legacy"
+    ingested_at: datetime = Field(default_factory=datetime.utcnow)
+
 class QuestionRaw(SQLModel, table=True):
     __tablename__ = "questions_raw"
+    __table_args__ = (
+        # Work queue of the normalization step
+        Index("ix_questions_raw_unprocessed", "id", postgresql_where=text("processed = false")),
+    )
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     year: int = Field(index=True)
     section: Optional[str] = None
     original_numbering: Optional[str] = None
     raw_text: str = Field(sa_column=Column(TEXT))
     marks: Optional[int] = None
-    source_pdf: Optional[str] = None
+    ingestion_id: Optional[UUID] = Field(default=None, foreign_key="pdf_ingestions.id", index=True)
     ocr_confidence: Optional[float] = None
+    # Tags assigned during extraction (settings.ocr_fused_tagging); copied to QuestionNormalized
+    difficulty: Optional[int] = None # 1-5
+    taxonomy: Optional[List[str]] = Field(default=None, sa_column=Column(ARRAY(TEXT)))
     processed: bool = Field(default=False)
     ingestion_time: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class ExtractionCache(SQLModel, table=True):
+    __tablename__ = "extraction_cache"
+    __table_args__ = (
+        UniqueConstraint("pdf_hash", "kind", "prompt_version", "model_name", name="uq_extraction_cache_key"),
+    )
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    pdf_hash: str = Field(index=True) # SHA-256 of the PDF bytes
+    kind: str # "questions" or "syllabus"
+    prompt_version: str
+    model_name: str
+    result_json: Dict[str, Any] = Field(default={}, sa_column=Column(JSONB))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class GeminiFileUpload(SQLModel, table=True):
+    __tablename__ = "gemini_file_uploads"
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    content_hash: str = Field(unique=True, index=True) # SHA-256 of the uploaded bytes
+    file_name: str # File API resource name, e.g. "files/abc123"
+    file_uri: str
+    mime_type: str = Field(default="application/pdf")
+    expires_at: datetime = Field(index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class EmbeddingCache(SQLModel, table=True):
+    __tablename__ = "embedding_cache"
+    __table_args__ = (
+        UniqueConstraint("text_hash", "model_name", "dim", name="uq_embedding_cache_key"),
+    )
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    text_hash: str = Field(index=True) # SHA-256 of the whitespace-normalized text
+    model_name: str
+    dim: int = Field(default=VECTOR_DIM)
+    embedding: List[float] = Field(sa_column=Column(Vector(VECTOR_DIM)))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ClusteringTree(SQLModel, table=True):
+    __tablename__ = "clustering_trees"
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
+    fingerprint: str = Field(unique=True, index=True) # SHA-256 of linkage, floor, embedding model and question ids
+    linkage: str = Field(default="single")
+    min_similarity: float # Cuts below this similarity are not represented
+    question_ids: List[str] = Field(default=[], sa_column=Column(ARRAY(TEXT))) # Leaf order
+    merges_json: List[Any] = Field(default=[], sa_column=Column(JSONB)) # [i, j, similarity], strongest first
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
 class VariantGroup(SQLModel, table=True):
     __tablename__ = "variant_groups"
     id: UUID = Field(default_factory=uuid4, primary_key=True)
@@ -51,6 +113,9 @@ class VariantGroup(SQLModel, table=True):
     
     # Vector embedding for the canonical stem
     embedding: List[float] = Field(sa_column=Column(Vector(VECTOR_DIM)))
+    # Mean member embedding, maintained incrementally by variant grouping
+    centroid: Optional[List[float]] = Field(default=None, sa_column=Column(Vector(VECTOR_DIM)))
+    member_count: int = Field(default=0)
     
     syllabus_node_id: Optional[UUID] = Field(default=None, foreign_key="syllabus_nodes.id")
     syllabus_node: Optional["SyllabusNode"] = Relationship(back_populates=None) # One-way relationship is fine for now
@@ -59,15 +124,24 @@ class VariantGroup(SQLModel, table=True):
 
 class QuestionNormalized(SQLModel, table=True):
     __tablename__ = "questions_normalized"
+    __table_args__ = (
+        # Work queues of the grouping and tagging steps
+        Index("ix_questions_normalized_ungrouped", "id", postgresql_where=text("variant_group_id IS NULL")),
+        Index("ix_questions_normalized_untagged", "id", postgresql_where=text("difficulty IS NULL")),
+        Index("ix_questions_normalized_unindexed", "id", postgresql_where=text("topics_indexed_at IS NULL")),
+        # Exact-duplicate lookups of the normalization step
+        Index("ix_questions_normalized_canonical_hash", "canonical_hash"),
+    )
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     base_form: str = Field(sa_column=Column(TEXT))
     marks: Optional[int] = None
     difficulty: Optional[int] = None # 1-5
-    variant_group_id: Optional[UUID] = Field(default=None, foreign_key="variant_groups.id")
+    variant_group_id: Optional[UUID] = Field(default=None, foreign_key="variant_groups.id", index=True)
     canonical_hash: str = Field(sa_column=Column(TEXT))
     original_ids: List[UUID] = Field(default=[], sa_column=Column(ARRAY(TEXT))) # Storing UUIDs as strings in array for simplicity or UUID array
     placeholders: List[str] = Field(default=[], sa_column=Column(ARRAY(TEXT)))
     taxonomy: List[str] = Field(default=[], sa_column=Column(ARRAY(TEXT)))
+    topics_indexed_at: Optional[datetime] = None # Last QuestionTopicMap indexing; None = pending
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
@@ -115,11 +189,14 @@ class SyllabusNode(SQLModel, table=True):
 
 class QuestionTopicMap(SQLModel, table=True):
     __tablename__ = "question_topic_map"
+    __table_args__ = (
+        UniqueConstraint("question_id", "topic_id", name="uq_question_topic_map"),
+    )
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     question_id: UUID = Field(foreign_key="questions_normalized.id")
-    topic_id: UUID = Field(foreign_key="syllabus_nodes.id")
-    relevance_score: float = Field(default=1.0)
-    source: Optional[str] = None
+    topic_id: UUID = Field(foreign_key="syllabus_nodes.id", index=True)
+    relevance_score: float = Field(default=1.0) # Cosine similarity of question and topic embeddings
+    source: Optional[str] = None # "group" (the variant group's topic) and/or "tier>=<threshold>", comma-separated
     
     question: QuestionNormalized = Relationship(back_populates="topic_maps")
     topic: SyllabusNode = Relationship(back_populates="topic_maps")
@@ -152,7 +229,7 @@ class PredictionCandidate(SQLModel, table=True):
     __tablename__ = "prediction_candidates"
     id: UUID = Field(default_factory=uuid4, primary_key=True)
     normalized_question_id: UUID = Field(foreign_key="questions_normalized.id")
-    trend_snapshot_id: Optional[UUID] = Field(default=None, foreign_key="trend_snapshots.id")
+    trend_snapshot_id: Optional[UUID] = Field(default=None, foreign_key="trend_snapshots.id", index=True)
     scores_json: Dict[str, float] = Field(default={}, sa_column=Column(JSONB))
     status: CandidateStatus = Field(default=CandidateStatus.pending)
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,6 +1,7 @@
 """Normalization node."""
 import asyncio
 from utils.logger import get_logger
+from utils.embedding_cache import embedding_cache
 from src.schemas import PipelineState
 from src.sub_agents.question_preprocessing_agent.question_preprocessing_agent import process_questions
 
@@ -13,6 +14,7 @@ async def normalization_node(state: PipelineState) -> PipelineState:
     
     try:
         await process_questions()
+        logger.info(f"Embedding cache: {embedding_cache.get_stats()}")
         logger.info("✓ Normalization complete")
     except Exception as e:
         logger.error(f"Error in normalization: {e}")
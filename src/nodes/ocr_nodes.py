@@ -1,11 +1,13 @@
 """OCR nodes for processing PDFs."""
 import asyncio
+import time
 from pathlib import Path
 from utils.logger import get_logger
+from utils.settings import settings
 from src.schemas import PipelineState
+from src.sub_agents.ocr_agent.file_uploads import file_upload_manager
 from src.sub_agents.ocr_agent.ocr_agent import (
-    extract_questions_from_pdf,
-    populate_db,
+    ingest_pyq_pdfs,
     extract_syllabus_from_pdf,
     populate_syllabus_db
 )
@@ -19,20 +21,36 @@ async def ocr_pyqs_node(state: PipelineState) -> PipelineState:
     
     try:
         pyq_dir = Path(state["pyq_directory"])
-        pdf_files = list(pyq_dir.glob("*.pdf"))
+        pdf_files = sorted(pyq_dir.glob("*.pdf"))
+        max_concurrency = max(1, settings.ocr_max_concurrent_pdfs)
         
-        logger.info(f"Found {len(pdf_files)} PYQ PDF files")
+        # Drop File API uploads that can no longer be reused before creating new ones
+        await file_upload_manager.cleanup_expired()
         
-        async def process_pyq(pdf_path):
-            questions = await extract_questions_from_pdf(str(pdf_path))
-            if questions:
-                await populate_db(questions)
+        logger.info(f"Found {len(pdf_files)} PYQ PDF files (max {max_concurrency} in flight)")
         
-        for pdf_path in pdf_files:
-            logger.info(f"Processing: {pdf_path.name}")
-            await process_pyq(pdf_path)
+        started = time.perf_counter()
+        results = await ingest_pyq_pdfs([str(p) for p in pdf_files], max_concurrency=max_concurrency)
+        elapsed = time.perf_counter() - started
         
-        logger.info("PYQ OCR complete")
+        # Per-PDF timing summary, used to size OCR_MAX_CONCURRENT_PDFS against the API quota
+        for result in sorted(results, key=lambda r: r.total_seconds, reverse=True):
+            if result.error:
+                status = f"ERROR: {result.error}"
+            elif result.skipped:
+                status = "skipped, already ingested"
+            else:
+                status = f"{result.question_count} questions via {result.extraction_path}"
+            logger.info(f"  {result.source_file}: {result.total_seconds:.1f}s ({status})")
+            if result.error:
+                state["errors"].append(f"OCR PYQs ({result.source_file}): {result.error}")
+        
+        serial_seconds = sum(r.total_seconds for r in results)
+        skipped = sum(1 for r in results if r.skipped)
+        logger.info(
+            f"PYQ OCR complete in {elapsed:.1f}s (sum of per-PDF time: {serial_seconds:.1f}s, "
+            f"{skipped} already-ingested PDFs skipped)"
+        )
     except Exception as e:
         logger.error(f"Error in OCR (PYQs): {e}")
         state["errors"].append(f"OCR PYQs: {str(e)}")
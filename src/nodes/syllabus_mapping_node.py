@@ -1,9 +1,11 @@
 """Syllabus mapping node."""
 import asyncio
 from utils.logger import get_logger
+from utils.embedding_cache import embedding_cache
 from src.schemas import PipelineState
 from src.sub_agents.syll_mapping_tag_agent.mapping_agent import (
     map_questions_to_syllabus,
+    embedding_semaphore,
     enrich_syllabus_nodes,
     enrich_variant_groups
 )
@@ -16,14 +18,14 @@ async def syllabus_mapping_node(state: PipelineState) -> PipelineState:
     state["current_step"] = "Syllabus Mapping"
     
     try:
-        # 1. Enrich Syllabus Nodes (Generate Embeddings)
-        await enrich_syllabus_nodes()
+        # 1. Enrich Syllabus Nodes and Variant Groups (Generate Embeddings), concurrently
+        #    under one embedding concurrency limit
+        semaphore = embedding_semaphore()
+        await asyncio.gather(enrich_syllabus_nodes(semaphore), enrich_variant_groups(semaphore))
         
-        # 2. Enrich Variant Groups (Generate Embeddings)
-        await enrich_variant_groups()
-        
-        # 3. Map Questions
+        # 2. Map Questions
         await map_questions_to_syllabus()
+        logger.info(f"Embedding cache: {embedding_cache.get_stats()}")
         logger.info("✓ Syllabus mapping complete")
     except Exception as e:
         logger.error(f"Error in syllabus mapping: {e}")
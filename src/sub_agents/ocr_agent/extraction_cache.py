@@ -0,0 +1,95 @@
+"""
+Content-addressed cache for OCR extraction results.
+
+Entries are keyed by the SHA-256 of the PDF bytes, the prompt version and the
+model name, so a re-run on unchanged PDFs never touches the LLM or the File API.
+"""
+import hashlib
+from datetime import datetime
+from uuid import uuid4
+from typing import Optional, Type, TypeVar
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from utils.logger import get_logger
+from src.data_models.models import ExtractionCache
+
+logger = get_logger()
+
+M = TypeVar("M", bound=BaseModel)
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def get_cached_extraction(
+    pdf_hash: str,
+    kind: str,
+    prompt_version: str,
+    model_name: str,
+    output_class: Type[M],
+) -> Optional[M]:
+    """
+    Returns the cached extraction result for this key, or None on a miss.
+    Cache failures are logged and treated as misses.
+    """
+    from utils.db import get_session
+
+    payload = None
+    try:
+        async for session in get_session():
+            stmt = select(ExtractionCache.result_json).where(
+                ExtractionCache.pdf_hash == pdf_hash,
+                ExtractionCache.kind == kind,
+                ExtractionCache.prompt_version == prompt_version,
+                ExtractionCache.model_name == model_name,
+            )
+            result = await session.execute(stmt)
+            payload = result.scalar_one_or_none()
+            break
+        if payload is None:
+            return None
+        return output_class.model_validate(payload)
+    except Exception as e:
+        logger.warning(f"Extraction cache lookup failed ({kind}, {pdf_hash[:12]}): {e}")
+        return None
+
+async def store_extraction(
+    pdf_hash: str,
+    kind: str,
+    prompt_version: str,
+    model_name: str,
+    extraction: BaseModel,
+):
+    """
+    Stores (or replaces) the extraction result for this key.
+    Cache failures are logged and never propagate to the caller.
+    """
+    from utils.db import get_session
+
+    payload = extraction.model_dump(mode="json")
+    try:
+        async for session in get_session():
+            stmt = insert(ExtractionCache).values(
+                id=uuid4(),
+                pdf_hash=pdf_hash,
+                kind=kind,
+                prompt_version=prompt_version,
+                model_name=model_name,
+                result_json=payload,
+                created_at=datetime.utcnow(),
+            )
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_extraction_cache_key",
+                set_={"result_json": payload, "created_at": datetime.utcnow()},
+            )
+            await session.execute(stmt)
+            await session.commit()
+            break
+    except Exception as e:
+        logger.warning(f"Extraction cache store failed ({kind}, {pdf_hash[:12]}): {e}")
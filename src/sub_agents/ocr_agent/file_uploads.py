@@ -0,0 +1,188 @@
+"""
+Gemini File API upload manager.
+
+Uploads run in a worker thread so they never block the event loop, and are
+deduplicated by content hash: while an earlier upload of the same bytes is
+still live, its file_uri is reused instead of uploading again.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from uuid import uuid4
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+import google.generativeai as genai
+
+from utils.logger import get_logger
+from utils.settings import settings
+from src.data_models.models import GeminiFileUpload
+from src.sub_agents.ocr_agent.extraction_cache import file_sha256
+
+logger = get_logger()
+
+# Uploaded files live for 48 hours; don't hand out a URI that may expire mid-request
+REUSE_MARGIN = timedelta(minutes=30)
+DEFAULT_FILE_TTL = timedelta(hours=47)
+
+def _to_naive_utc(value: Optional[datetime]) -> datetime:
+    if value is None:
+        return datetime.utcnow() + DEFAULT_FILE_TTL
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class FileUploadManager:
+    """Process-wide, hash-deduplicated access to File API uploads."""
+
+    def __init__(self):
+        self._live: Dict[str, GeminiFileUpload] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._configured = False
+
+    def _configure(self):
+        if self._configured:
+            return
+        # settings.google_api_key is a SecretStr, so we need .get_secret_value()
+        api_key = settings.google_api_key.get_secret_value() if settings.google_api_key else None
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found in settings")
+        genai.configure(api_key=api_key)
+        self._configured = True
+
+    @staticmethod
+    def _is_live(upload: Optional[GeminiFileUpload]) -> bool:
+        return upload is not None and upload.expires_at - REUSE_MARGIN > datetime.utcnow()
+
+    async def _load(self, content_hash: str) -> Optional[GeminiFileUpload]:
+        from utils.db import get_session
+
+        upload = None
+        try:
+            async for session in get_session():
+                stmt = select(GeminiFileUpload).where(GeminiFileUpload.content_hash == content_hash)
+                result = await session.execute(stmt)
+                upload = result.scalar_one_or_none()
+                break
+        except Exception as e:
+            logger.warning(f"Could not read upload registry for {content_hash[:12]}: {e}")
+        return upload
+
+    async def _save(self, upload: GeminiFileUpload):
+        from utils.db import get_session
+
+        values = {
+            "file_name": upload.file_name,
+            "file_uri": upload.file_uri,
+            "mime_type": upload.mime_type,
+            "expires_at": upload.expires_at,
+            "created_at": upload.created_at,
+        }
+        try:
+            async for session in get_session():
+                stmt = insert(GeminiFileUpload).values(id=upload.id, content_hash=upload.content_hash, **values)
+                stmt = stmt.on_conflict_do_update(index_elements=["content_hash"], set_=values)
+                await session.execute(stmt)
+                await session.commit()
+                break
+        except Exception as e:
+            logger.warning(f"Could not record upload {upload.file_name}: {e}")
+
+    async def _delete_remote(self, file_name: str):
+        try:
+            await asyncio.to_thread(genai.delete_file, file_name)
+            logger.info(f"Deleted File API upload {file_name}")
+        except Exception as e:
+            # Usually already gone (expired or deleted elsewhere)
+            logger.debug(f"Could not delete File API upload {file_name}: {e}")
+
+    async def get_file_uri(
+        self,
+        pdf_path: str,
+        content_hash: Optional[str] = None,
+        mime_type: str = "application/pdf",
+    ) -> str:
+        """
+        Returns a live File API URI for the file's contents, uploading only if
+        no live upload of the same bytes exists.
+        """
+        content_hash = content_hash or await asyncio.to_thread(file_sha256, pdf_path)
+        lock = self._locks.setdefault(content_hash, asyncio.Lock())
+
+        async with lock:
+            upload = self._live.get(content_hash)
+            if not self._is_live(upload):
+                upload = await self._load(content_hash)
+
+            if self._is_live(upload):
+                logger.info(f"Reusing File API upload {upload.file_name} for {os.path.basename(pdf_path)}")
+                self._live[content_hash] = upload
+                return upload.file_uri
+
+            stale_name = upload.file_name if upload else None
+
+            self._configure()
+            logger.info(f"Uploading PDF to Google AI File API: {pdf_path}")
+            uploaded_file = await asyncio.to_thread(
+                genai.upload_file,
+                pdf_path,
+                mime_type=mime_type,
+                display_name=f"kripaa-{content_hash[:16]}",
+            )
+            logger.info(f"File uploaded successfully: {uploaded_file.uri}")
+
+            upload = GeminiFileUpload(
+                id=uuid4(),
+                content_hash=content_hash,
+                file_name=uploaded_file.name,
+                file_uri=uploaded_file.uri,
+                mime_type=mime_type,
+                expires_at=_to_naive_utc(getattr(uploaded_file, "expiration_time", None)),
+                created_at=datetime.utcnow(),
+            )
+            await self._save(upload)
+            self._live[content_hash] = upload
+
+            if stale_name and stale_name != upload.file_name:
+                await self._delete_remote(stale_name)
+
+            return upload.file_uri
+
+    async def cleanup_expired(self) -> int:
+        """
+        Removes registry entries (and, best-effort, the remote files) for uploads
+        that can no longer be reused. Returns the number of entries removed.
+        """
+        from utils.db import get_session
+
+        cutoff = datetime.utcnow() + REUSE_MARGIN
+        expired = []
+        try:
+            async for session in get_session():
+                result = await session.execute(
+                    select(GeminiFileUpload).where(GeminiFileUpload.expires_at <= cutoff)
+                )
+                expired = result.scalars().all()
+                if expired:
+                    await session.execute(
+                        delete(GeminiFileUpload).where(GeminiFileUpload.expires_at <= cutoff)
+                    )
+                    await session.commit()
+                break
+        except Exception as e:
+            logger.warning(f"Could not clean up expired uploads: {e}")
+            return 0
+
+        if expired:
+            try:
+                self._configure()
+                await asyncio.gather(*(self._delete_remote(u.file_name) for u in expired))
+            except ValueError:
+                pass # No API key: the registry is clean, remote files expire on their own
+            for u in expired:
+                self._live.pop(u.content_hash, None)
+            logger.info(f"Cleaned up {len(expired)} expired File API uploads")
+        return len(expired)
+
+# Process-wide instance shared by every extraction call
+file_upload_manager = FileUploadManager()
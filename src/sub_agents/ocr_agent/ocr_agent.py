@@ -1,94 +1,367 @@
 import json
 import os
+import time
+import asyncio
 import base64
-from typing import List, Optional
-from uuid import uuid4
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
 from datetime import datetime
-import pymupdf4llm
 from pydantic import BaseModel
+from sqlalchemy import inspect, select, text as sql_text
+from sqlalchemy.dialects.postgresql import insert
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
-import google.generativeai as genai
 
 from utils import get_llm, get_logger
+from utils.llm import DEFAULT_MODEL
 from utils.settings import settings
-from src.data_models.models import QuestionRaw
-from src.sub_agents.ocr_agent.prompts import system_prompt, user_prompt
-from src.sub_agents.ocr_agent.schemas import ExtractionResult
+from src.data_models.models import QuestionRaw, PdfIngestion
+from src.sub_agents.ocr_agent.prompts import (
+    system_prompt, user_prompt, window_user_prompt, with_tagging,
+    QUESTION_PROMPT_VERSION, SYLLABUS_PROMPT_VERSION, TAGGING_PROMPT_VERSION
+)
+from src.sub_agents.ocr_agent.schemas import ExtractionResult, ExtractedQuestion, TaggedExtractionResult
+from src.sub_agents.ocr_agent.extraction_cache import file_sha256, get_cached_extraction, store_extraction
+from src.sub_agents.ocr_agent.file_uploads import file_upload_manager
+from src.sub_agents.ocr_agent.pdf_probe import probe_pdf_cached, VERDICT_MULTIMODAL
+from src.sub_agents.ocr_agent.pdf_conversion import pdf_to_markdown, pdf_to_markdown_pages
+from src.sub_agents.ocr_agent.page_windows import (
+    PageWindow, WindowExtractionError, build_page_windows, stitch_window_results
+)
+from src.sub_agents.ocr_agent.rule_based_extractor import parse_questions_by_rules, RULES_VERSION
+from src.sub_agents.syll_mapping_tag_agent.batch_packing import format_question, pack_by_token_budget
 
 logger = get_logger()
 
-async def extract_questions_from_pdf(pdf_path: str) -> List[QuestionRaw]:
+async def extract_questions_from_pdf(pdf_path: str, ingestion_id: Optional[UUID] = None) -> List[QuestionRaw]:
     """
     Extracts questions from a PDF using a Hybrid Strategy:
-    1. Try fast Markdown extraction (pymupdf4llm).
+    0. Return the cached extraction if this exact PDF was already processed.
+    1. Try fast Markdown extraction (pymupdf4llm): the rule-based splitter first,
+       the LLM only for pages the rules could not parse confidently.
     2. If question count is low (< threshold), fallback to Gemini Multimodal (Native PDF).
     """
+    questions, _ = await _extract_questions(pdf_path)
+    return _to_question_raw(questions, ingestion_id)
+
+async def _extract_questions(pdf_path: str, pdf_hash: Optional[str] = None) -> Tuple[List[ExtractedQuestion], str]:
+    """Returns the extracted questions and the extraction path that produced them."""
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
 
+    # 0. Content-addressed cache lookup (no LLM / File API traffic on a hit)
+    pdf_hash = pdf_hash or await asyncio.to_thread(file_sha256, pdf_path)
+    prompt_version = _question_prompt_version()
+    cached = await get_cached_extraction(
+        pdf_hash, "questions", prompt_version, DEFAULT_MODEL, ExtractionResult
+    )
+    if cached is not None:
+        logger.info(f"Extraction cache hit for {os.path.basename(pdf_path)} ({len(cached.questions)} questions)")
+        return cached.questions, "cache"
+
+    questions, extraction_path = await _extract_questions_uncached(pdf_path, pdf_hash)
+    if questions and settings.ocr_fused_tagging:
+        questions = await _tag_untagged_questions(questions, os.path.basename(pdf_path))
+
+    if questions:
+        await store_extraction(
+            pdf_hash, "questions", prompt_version, DEFAULT_MODEL,
+            ExtractionResult(questions=questions)
+        )
+    return questions, extraction_path
+
+def _question_prompt_version() -> str:
+    """Cache key component describing the prompt(s) and rules the current extraction mode uses."""
+    version = QUESTION_PROMPT_VERSION
+    if settings.ocr_page_windows:
+        version += "-windows"
+    if settings.ocr_rule_based:
+        version += f"-rules-{RULES_VERSION}"
+    if settings.ocr_fused_tagging:
+        version += f"-tagged-{TAGGING_PROMPT_VERSION}"
+    return version
+
+async def _tag_untagged_questions(questions: List[ExtractedQuestion], file_name: str) -> List[ExtractedQuestion]:
+    """
+    Fused tagging for questions no extraction call tagged, mainly those of the
+    rule-based splitter: packed tagging calls at ingest, while the text is at hand.
+    Questions left untagged (failed calls) are picked up by the standalone tagger.
+    """
+    from utils.llm import call_llm_with_structured_output
+    from src.sub_agents.syll_mapping_tag_agent.prompts import TAGGING_PROMPT
+    from src.sub_agents.syll_mapping_tag_agent.schemas import TaggingBatchResponse
+
+    untagged = [(i, format_question(str(i), q.raw_text)) for i, q in enumerate(questions) if q.difficulty is None]
+    if not untagged:
+        return questions
+
+    llm = get_llm(temperature=0.0)
+    semaphore = asyncio.Semaphore(max(1, settings.tagging_max_concurrency))
+
+    async def tag_batch(batch: List[Tuple[int, str]]) -> Optional[TaggingBatchResponse]:
+        async with semaphore:
+            return await call_llm_with_structured_output(
+                llm=llm,
+                output_class=TaggingBatchResponse,
+                messages=TAGGING_PROMPT.format_messages(questions_text="\n\n".join(text for _, text in batch)),
+                context_desc=f"Ingest Tagging: {file_name} ({len(batch)} questions)"
+            )
+
+    batches = pack_by_token_budget(untagged, settings.tagging_token_budget)
+    tagged = list(questions)
+    tagged_count = 0
+    for response in await asyncio.gather(*(tag_batch(batch) for batch in batches)):
+        for tag in (response.tags if response else []):
+            i = int(tag.question_id) if tag.question_id.strip().isdigit() else -1
+            if 0 <= i < len(tagged) and tagged[i].difficulty is None:
+                tagged[i] = tagged[i].model_copy(update={"difficulty": tag.difficulty, "taxonomy": tag.taxonomy})
+                tagged_count += 1
+    logger.info(f"Ingest Tagging: {file_name} tagged {tagged_count}/{len(untagged)} questions in {len(batches)} calls.")
+    return tagged
+
+def _question_prompt(prompt: str) -> str:
+    """The question extraction prompt, extended with difficulty and taxonomy when tagging is fused."""
+    return with_tagging(prompt) if settings.ocr_fused_tagging else prompt
+
+def _extraction_output_class():
+    return TaggedExtractionResult if settings.ocr_fused_tagging else ExtractionResult
+
+async def _extract_questions_uncached(
+    pdf_path: str, pdf_hash: Optional[str] = None
+) -> Tuple[List[ExtractedQuestion], str]:
+    """
+    Runs the Markdown-first / Multimodal-fallback extraction.
+    When the local probe says the text layer is unusable (scanned or garbled),
+    the Markdown call is skipped and Multimodal runs directly.
+    """
+    # 0. Route up front using the local text-layer probe
+    if settings.ocr_probe_enabled:
+        try:
+            probe = await probe_pdf_cached(pdf_path, pdf_hash)
+        except Exception as e:
+            logger.warning(f"Text-layer probe failed for {os.path.basename(pdf_path)}: {e}")
+            probe = None
+        
+        if probe and probe.verdict == VERDICT_MULTIMODAL:
+            logger.info(f"Attempting Multimodal Extraction for: {pdf_path}")
+            try:
+                questions = await _extract_via_multimodal(pdf_path, pdf_hash)
+                if questions:
+                    return questions, "multimodal"
+                logger.warning("Multimodal extraction returned no questions. Falling back to Markdown...")
+            except Exception as e:
+                logger.error(f"Multimodal extraction failed: {e}. Falling back to Markdown...")
+            return await _extract_via_markdown_path(pdf_path)
+
     # 1. Try Markdown Extraction
     logger.info(f"Attempting Markdown Extraction for: {pdf_path}")
-    questions = await _extract_via_markdown(pdf_path)
+    try:
+        questions, extraction_path = await _extract_via_markdown_path(pdf_path)
+    except WindowExtractionError as e:
+        # Incomplete Markdown result: only a complete Multimodal extraction may replace it
+        logger.warning(f"{e}. Attempting Multimodal Fallback...")
+        questions = await _extract_via_multimodal(pdf_path, pdf_hash)
+        if not questions:
+            raise
+        return questions, "multimodal"
     
     # 2. Check Quality / Quantity
     if len(questions) < settings.ocr_fallback_threshold:
         logger.warning(f"Low question count ({len(questions)}) detected. Attempting Multimodal Fallback...")
         try:
-            multimodal_questions = await _extract_via_multimodal(pdf_path)
+            multimodal_questions = await _extract_via_multimodal(pdf_path, pdf_hash)
             
             # If Multimodal found significantly more, use it.
             # Or if Markdown found 0, use Multimodal.
             if len(multimodal_questions) > len(questions):
                 logger.info(f"Multimodal extraction yielded more questions ({len(multimodal_questions)} vs {len(questions)}). Using Multimodal result.")
-                return multimodal_questions
+                return multimodal_questions, "multimodal"
             else:
                 logger.info(f"Multimodal extraction did not improve result ({len(multimodal_questions)} found). Keeping Markdown result.")
-                return questions
+                return questions, extraction_path
                 
         except Exception as e:
             logger.error(f"Multimodal fallback failed: {e}")
             # Return what we have from Markdown
-            return questions
+            return questions, extraction_path
             
-    return questions
+    return questions, extraction_path
 
-async def _extract_via_markdown(pdf_path: str) -> List[QuestionRaw]:
-    """Helper to extract via pymupdf4llm -> LLM"""
-    try:
-        md_text = pymupdf4llm.to_markdown(pdf_path)
+async def _extract_via_markdown_path(pdf_path: str) -> Tuple[List[ExtractedQuestion], str]:
+    """
+    Runs the configured Markdown strategy: rules first, then page windows or one whole-paper call.
+    Returns the questions and the path that produced them.
+    """
+    if settings.ocr_rule_based:
+        return await _extract_via_rules(pdf_path)
+    if settings.ocr_page_windows:
+        return await _extract_via_markdown_windows(pdf_path), "windows"
+    return await _extract_via_markdown(pdf_path), "markdown"
 
+async def _extract_via_rules(pdf_path: str) -> Tuple[List[ExtractedQuestion], str]:
+    """
+    Helper to extract via pymupdf4llm -> rule-based splitter.
+    Pages the rules parse confidently need no LLM call; the remaining runs of
+    pages go to the LLM as page windows and the results are stitched in page order.
+    """
+    try:
+        pages = await pdf_to_markdown_pages(pdf_path)
     except Exception as e:
         logger.error(f"Error extracting text with pymupdf4llm: {e}")
-        return []
+        return [], "rules"
+
+    file_name = os.path.basename(pdf_path)
+    parsed = parse_questions_by_rules(pages, settings.ocr_rule_min_confidence)
+    unresolved = parsed.unresolved_pages
+
+    if not unresolved:
+        questions = [rq.question for rq in parsed.questions]
+        logger.info(f"Rule-based Extraction: {file_name} parsed without LLM ({len(questions)} questions).")
+        return questions, "rules"
+
+    if len(unresolved) == len(pages):
+        logger.info(f"Rule-based Extraction: {file_name} not recognised by rules; using LLM extraction.")
+        if settings.ocr_page_windows:
+            return await _extract_via_markdown_windows(pdf_path, pages), "windows"
+        return await _extract_via_markdown(pdf_path, "\n\n".join(pages)), "markdown"
+
+    # Contiguous runs of unresolved pages, each packed into windows
+    runs: List[List[int]] = []
+    for page in unresolved:
+        if runs and runs[-1][-1] == page - 1:
+            runs[-1].append(page)
+        else:
+            runs.append([page])
+    windows: List[PageWindow] = []
+    for run in runs:
+        windows.extend(build_page_windows(
+            [pages[p - 1] for p in run], settings.ocr_window_token_budget, first_page=run[0]
+        ))
+    for index, window in enumerate(windows):
+        window.index = index
+
+    logger.info(
+        f"Rule-based Extraction: {file_name} resolved {len(pages) - len(unresolved)}/{len(pages)} pages; "
+        f"sending pages {', '.join(f'{r[0]}-{r[-1]}' for r in runs)} to the LLM in {len(windows)} windows"
+    )
+    window_results = await _extract_windows(windows, len(pages), file_name)
+
+    # Merge rule pages and LLM windows back into page order before stitching
+    segments = [(page, parsed.questions_on_page(page)) for page in sorted(parsed.confident_pages)]
+    segments += [(w.page_start, window_results[w.index]) for w in windows]
+    segments.sort(key=lambda segment: segment[0])
+
+    questions = stitch_window_results([qs for _, qs in segments if qs])
+    logger.info(f"Rule-based Extraction: Extracted {len(questions)} questions.")
+    return questions, "rules+windows"
+
+async def _extract_via_markdown(pdf_path: str, md_text: Optional[str] = None) -> List[ExtractedQuestion]:
+    """Helper to extract via pymupdf4llm -> LLM"""
+    if md_text is None:
+        try:
+            md_text = await pdf_to_markdown(pdf_path)
+
+        except Exception as e:
+            logger.error(f"Error extracting text with pymupdf4llm: {e}")
+            return []
 
     prompt_template = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
-        ("human", user_prompt)
+        ("human", _question_prompt(user_prompt))
     ])
     
     messages = prompt_template.format_messages(md_text=md_text)
 
     return await _call_llm_and_parse(messages, pdf_path, "Markdown Extraction")
 
-async def _extract_via_multimodal(pdf_path: str) -> List[QuestionRaw]:
+async def _extract_via_markdown_windows(pdf_path: str, pages: Optional[List[str]] = None) -> List[ExtractedQuestion]:
+    """
+    Helper to extract via pymupdf4llm -> LLM, one page window at a time.
+    Windows run concurrently; only windows whose call failed are retried.
+    """
+    if pages is None:
+        try:
+            pages = await pdf_to_markdown_pages(pdf_path)
+        except Exception as e:
+            logger.error(f"Error extracting text with pymupdf4llm: {e}")
+            return []
+
+    windows = build_page_windows(pages, settings.ocr_window_token_budget)
+    file_name = os.path.basename(pdf_path)
+    logger.info(f"Window Extraction: {file_name} split into {len(windows)} windows ({len(pages)} pages)")
+
+    results = await _extract_windows(windows, len(pages), file_name)
+    questions = stitch_window_results([results[w.index] for w in windows])
+    logger.info(f"Window Extraction: Extracted {len(questions)} questions.")
+    return questions
+
+async def _extract_windows(
+    windows: List[PageWindow], page_count: int, file_name: str
+) -> Dict[int, List[ExtractedQuestion]]:
+    """
+    Extracts each window with its own LLM call, at most
+    settings.ocr_window_max_concurrency at a time, retrying failed windows only.
+    Returns questions keyed by window index.
+
+    Raises WindowExtractionError if any window still fails after the retries: a
+    paper with missing pages must not be cached or recorded as ingested.
+    """
+    from utils.llm import get_default_llm, call_llm_with_structured_output
+
+    prompt_template = ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("human", _question_prompt(window_user_prompt))
+    ])
+    llm = get_default_llm()
+    output_class = _extraction_output_class()
+    semaphore = asyncio.Semaphore(max(1, settings.ocr_window_max_concurrency))
+
+    async def extract_window(window: PageWindow) -> Optional[ExtractionResult]:
+        messages = prompt_template.format_messages(
+            md_text=window.text,
+            page_start=window.page_start,
+            page_end=window.page_end,
+            page_count=page_count
+        )
+        async with semaphore:
+            return await call_llm_with_structured_output(
+                llm=llm,
+                output_class=output_class,
+                messages=messages,
+                context_desc=f"Window Extraction: {file_name} pages {window.page_start}-{window.page_end}"
+            )
+
+    results: Dict[int, List[ExtractedQuestion]] = {}
+    pending = windows
+    for attempt in range(settings.ocr_window_retries + 1):
+        if not pending:
+            break
+        if attempt:
+            logger.warning(f"Retrying {len(pending)} failed windows for {file_name} (attempt {attempt + 1})")
+        outcomes = await asyncio.gather(*(extract_window(w) for w in pending))
+        for window, outcome in zip(pending, outcomes):
+            if outcome is not None:
+                results[window.index] = outcome.questions
+        pending = [w for w in pending if w.index not in results]
+
+    if pending:
+        failed_pages = ", ".join(f"{w.page_start}-{w.page_end}" for w in pending)
+        logger.error(f"Window Extraction: {file_name} pages {failed_pages} failed after retries")
+        raise WindowExtractionError(f"{file_name}: pages {failed_pages} failed after retries")
+
+    return results
+
+async def _extract_via_multimodal(pdf_path: str, pdf_hash: Optional[str] = None) -> List[ExtractedQuestion]:
     """Helper to extract via Gemini Native PDF (File API)"""
     try:
-        # settings.google_api_key is a SecretStr, so we need .get_secret_value()
-        api_key = settings.google_api_key.get_secret_value() if settings.google_api_key else None
-        if not api_key:
-             raise ValueError("GOOGLE_API_KEY not found in settings")
-             
-        genai.configure(api_key=api_key)
-        logger.info(f"Uploading PDF to Google AI File API: {pdf_path}")
-        uploaded_file = genai.upload_file(pdf_path)
-        logger.info(f"File uploaded successfully: {uploaded_file.uri}")
+        file_uri = await file_upload_manager.get_file_uri(pdf_path, content_hash=pdf_hash)
     except Exception as e:
         logger.error(f"Error uploading PDF file: {e}")
         raise
 
     # We pass the prompt text AND the PDF file URI in a single HumanMessage
-    clean_user_prompt = user_prompt.replace("{md_text}", "")
+    clean_user_prompt = _question_prompt(user_prompt).replace("{md_text}", "")
     
     message = HumanMessage(
         content=[
@@ -98,7 +371,7 @@ async def _extract_via_multimodal(pdf_path: str) -> List[QuestionRaw]:
             },
             {
                 "type": "media",
-                "file_uri": uploaded_file.uri,
+                "file_uri": file_uri,
                 "mime_type": "application/pdf"
             }
         ]
@@ -111,15 +384,18 @@ async def _extract_via_multimodal(pdf_path: str) -> List[QuestionRaw]:
     
     return await _call_llm_and_parse(messages, pdf_path, "Multimodal Extraction")
 
-async def _call_llm_and_parse(messages, pdf_path: str, context_desc: str) -> List[QuestionRaw]:
-    """Shared helper to call LLM and parse results"""
+async def _call_llm_and_parse(messages, pdf_path: str, context_desc: str) -> List[ExtractedQuestion]:
+    """
+    Shared helper to call LLM and parse results.
+    With settings.ocr_fused_tagging the questions also carry difficulty and taxonomy.
+    """
     from utils.llm import get_default_llm, call_llm_with_structured_output
     
     try:
         llm = get_default_llm()
         extraction_result = await call_llm_with_structured_output(
             llm=llm,
-            output_class=ExtractionResult,
+            output_class=_extraction_output_class(),
             messages=messages,
             context_desc=f"{context_desc}: {os.path.basename(pdf_path)}"
         )
@@ -127,49 +403,222 @@ async def _call_llm_and_parse(messages, pdf_path: str, context_desc: str) -> Lis
         if not extraction_result:
             return []
             
-        questions_data = extraction_result.questions
-        
-        extracted_questions = []
-        for q_data in questions_data:
-            question = QuestionRaw(
-                id=uuid4(),
-                year=q_data.year,
-                section=q_data.section,
-                original_numbering=q_data.original_numbering,
-                raw_text=q_data.raw_text,
-                marks=q_data.marks,
-                source_pdf=os.path.basename(pdf_path),
-                ocr_confidence=1.0, 
-                ingestion_time=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-            extracted_questions.append(question)
-            
-        logger.info(f"{context_desc}: Extracted {len(extracted_questions)} questions.")
-        return extracted_questions
+        logger.info(f"{context_desc}: Extracted {len(extraction_result.questions)} questions.")
+        return extraction_result.questions
         
     except Exception as e:
         logger.error(f"Error during LLM extraction ({context_desc}): {e}")
         return []
 
-async def populate_db(extracted_questions: List[QuestionRaw]):
+def _to_question_raw(questions_data: List[ExtractedQuestion], ingestion_id: Optional[UUID] = None) -> List[QuestionRaw]:
+    """Converts extracted questions into QuestionRaw rows, linked to their ingestion ledger entry."""
+    extracted_questions = []
+    for q_data in questions_data:
+        question = QuestionRaw(
+            id=uuid4(),
+            year=q_data.year,
+            section=q_data.section,
+            original_numbering=q_data.original_numbering,
+            raw_text=q_data.raw_text,
+            marks=q_data.marks,
+            ingestion_id=ingestion_id,
+            ocr_confidence=q_data.confidence if q_data.confidence is not None else 1.0,
+            difficulty=min(5, max(1, q_data.difficulty)) if q_data.difficulty is not None else None,
+            taxonomy=q_data.taxonomy or None,
+            ingestion_time=datetime.utcnow(),
+            updated_at=datetime.utcnow()
+        )
+        extracted_questions.append(question)
+    return extracted_questions
+
+async def populate_db(extracted_questions: List[QuestionRaw], ingestion: Optional[PdfIngestion] = None) -> bool:
     """
     Populates the database with the extracted questions asynchronously.
+    When an ingestion ledger entry is given, it is recorded in the same transaction;
+    if another run already recorded the same file hash, nothing is written and
+    False is returned.
     """
     from utils.db import get_session
     
     logger.info(f"Populating database with {len(extracted_questions)} questions...")
+    stored = False
     async for session in get_session():
         try:
+            if ingestion is not None:
+                stmt = insert(PdfIngestion).values(
+                    id=ingestion.id,
+                    file_hash=ingestion.file_hash,
+                    source_file=ingestion.source_file,
+                    question_count=ingestion.question_count,
+                    extraction_path=ingestion.extraction_path,
+                    ingested_at=ingestion.ingested_at,
+                ).on_conflict_do_nothing(index_elements=["file_hash"]).returning(PdfIngestion.id)
+                if (await session.execute(stmt)).scalar_one_or_none() is None:
+                    await session.rollback()
+                    logger.info(f"{ingestion.source_file} was ingested concurrently; skipping insert.")
+                    break
             for question in extracted_questions:
                 session.add(question)
             await session.commit()
+            stored = True
             logger.info("Database population successful.")
         except Exception as e:
             logger.error(f"Error populating database: {e}")
             await session.rollback()
             raise
         break
+    return stored
+
+async def get_ingestion(file_hash: str) -> Optional[PdfIngestion]:
+    """Returns the ledger entry for a PDF's content hash, if it was already ingested."""
+    from utils.db import get_session
+
+    ingestion = None
+    async for session in get_session():
+        result = await session.execute(select(PdfIngestion).where(PdfIngestion.file_hash == file_hash))
+        ingestion = result.scalar_one_or_none()
+        break
+    return ingestion
+
+# Column that named the source PDF of each questions_raw row before the ledger existed
+LEGACY_SOURCE_COLUMN = "source_pdf"
+
+async def adopt_legacy_ingestion(file_hash: str, source_file: str) -> Optional[PdfIngestion]:
+    """
+    Records the ledger entry of a PDF ingested before the ingestion ledger existed.
+
+    Those runs only wrote the PDF's file name to questions_raw.source_pdf. If unlinked
+    rows with this file name exist, they are linked to a new "legacy" ledger entry,
+    which is returned so the PDF is not extracted again. Returns None otherwise,
+    including on databases created without the source_pdf column.
+    """
+    from utils.db import get_session
+
+    ingestion = None
+    async for session in get_session():
+        columns = await session.run_sync(
+            lambda sync_session: {c["name"] for c in inspect(sync_session.connection()).get_columns("questions_raw")}
+        )
+        if LEGACY_SOURCE_COLUMN not in columns:
+            break
+        legacy_rows = f"FROM questions_raw WHERE {LEGACY_SOURCE_COLUMN} = :source_file AND ingestion_id IS NULL"
+        count = (await session.execute(sql_text(f"SELECT count(*) {legacy_rows}"), {"source_file": source_file})).scalar_one()
+        if not count:
+            break
+
+        candidate = PdfIngestion(
+            id=uuid4(),
+            file_hash=file_hash,
+            source_file=source_file,
+            question_count=count,
+            extraction_path="legacy",
+            ingested_at=datetime.utcnow(),
+        )
+        stmt = insert(PdfIngestion).values(
+            id=candidate.id,
+            file_hash=candidate.file_hash,
+            source_file=candidate.source_file,
+            question_count=candidate.question_count,
+            extraction_path=candidate.extraction_path,
+            ingested_at=candidate.ingested_at,
+        ).on_conflict_do_nothing(index_elements=["file_hash"]).returning(PdfIngestion.id)
+        if (await session.execute(stmt)).scalar_one_or_none() is None:
+            # Another run recorded this file in the meantime
+            await session.rollback()
+            break
+        await session.execute(
+            sql_text(f"UPDATE questions_raw SET ingestion_id = :ingestion_id {legacy_rows}"),
+            {"ingestion_id": candidate.id, "source_file": source_file},
+        )
+        await session.commit()
+        ingestion = candidate
+        logger.info(f"Recorded {count} questions ingested before the ledger as {source_file}.")
+        break
+    return ingestion
+
+@dataclass
+class PdfIngestResult:
+    """Outcome and wall-clock timing of ingesting a single PYQ PDF."""
+    source_file: str
+    question_count: int = 0
+    extract_seconds: float = 0.0
+    populate_seconds: float = 0.0
+    extraction_path: Optional[str] = None
+    skipped: bool = False # Same bytes were already ingested (possibly under another name)
+    error: Optional[str] = None
+
+    @property
+    def total_seconds(self) -> float:
+        return self.extract_seconds + self.populate_seconds
+
+# Serializes ingestion of identical files (e.g. renamed copies in one folder) within this process
+_ingest_locks: Dict[str, asyncio.Lock] = {}
+
+async def ingest_pyq_pdf(pdf_path: str) -> PdfIngestResult:
+    """
+    Extracts and stores the questions of a single PYQ PDF, once per file content.
+    PDFs whose hash is already in the ingestion ledger are skipped, so re-running
+    the pipeline on the same folder does not duplicate QuestionRaw rows.
+    Errors are captured on the result instead of raised, so one bad PDF
+    never aborts a batch.
+    """
+    result = PdfIngestResult(source_file=os.path.basename(pdf_path))
+    started = time.perf_counter()
+    try:
+        file_hash = await asyncio.to_thread(file_sha256, pdf_path)
+        async with _ingest_locks.setdefault(file_hash, asyncio.Lock()):
+            existing = await get_ingestion(file_hash) or await adopt_legacy_ingestion(file_hash, result.source_file)
+            if existing is not None:
+                result.skipped = True
+                result.question_count = existing.question_count
+                result.extraction_path = existing.extraction_path
+                logger.info(
+                    f"Skipping {result.source_file}: already ingested as {existing.source_file} "
+                    f"on {existing.ingested_at:%Y-%m-%d} ({existing.question_count} questions)"
+                )
+                return result
+
+            extracted, result.extraction_path = await _extract_questions(pdf_path, file_hash)
+            result.extract_seconds = time.perf_counter() - started
+            result.question_count = len(extracted)
+
+            if extracted:
+                # No ledger entry for empty extractions, so the PDF is retried on the next run
+                ingestion = PdfIngestion(
+                    id=uuid4(),
+                    file_hash=file_hash,
+                    source_file=result.source_file,
+                    question_count=len(extracted),
+                    extraction_path=result.extraction_path,
+                    ingested_at=datetime.utcnow(),
+                )
+                populate_started = time.perf_counter()
+                result.skipped = not await populate_db(_to_question_raw(extracted, ingestion.id), ingestion)
+                result.populate_seconds = time.perf_counter() - populate_started
+        logger.info(
+            f"Ingested {result.source_file}: {result.question_count} questions via {result.extraction_path} "
+            f"(extract {result.extract_seconds:.1f}s, populate {result.populate_seconds:.1f}s)"
+        )
+    except Exception as e:
+        if not result.extract_seconds:
+            result.extract_seconds = time.perf_counter() - started
+        logger.error(f"Failed to ingest {result.source_file}: {e}")
+        result.error = str(e)
+    return result
+
+async def ingest_pyq_pdfs(pdf_paths: List[str], max_concurrency: int = 1) -> List[PdfIngestResult]:
+    """
+    Ingests several PYQ PDFs with at most `max_concurrency` PDFs in flight.
+    Returns one PdfIngestResult per input path, in input order.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def bounded_ingest(pdf_path: str) -> PdfIngestResult:
+        async with semaphore:
+            logger.info(f"Processing: {os.path.basename(pdf_path)}")
+            return await ingest_pyq_pdf(pdf_path)
+
+    return list(await asyncio.gather(*(bounded_ingest(str(p)) for p in pdf_paths)))
 
 async def extract_syllabus_from_pdf(pdf_path: str) -> List['ExtractedTopic']:
     """
@@ -183,16 +632,18 @@ async def extract_syllabus_from_pdf(pdf_path: str) -> List['ExtractedTopic']:
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
 
-    # 1. Upload PDF to Google AI File API
+    # 0. Content-addressed cache lookup (no LLM / File API traffic on a hit)
+    pdf_hash = await asyncio.to_thread(file_sha256, pdf_path)
+    cached = await get_cached_extraction(
+        pdf_hash, "syllabus", SYLLABUS_PROMPT_VERSION, DEFAULT_MODEL, SyllabusExtractionResult
+    )
+    if cached is not None:
+        logger.info(f"Extraction cache hit for syllabus {os.path.basename(pdf_path)} ({len(cached.topics)} topics)")
+        return cached.topics
+
+    # 1. Upload PDF to Google AI File API (reuses a live upload of the same bytes)
     try:
-        api_key = settings.google_api_key.get_secret_value() if settings.google_api_key else None
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found in settings")
-             
-        genai.configure(api_key=api_key)
-        logger.info(f"Uploading Syllabus PDF to Google AI File API: {pdf_path}")
-        uploaded_file = genai.upload_file(pdf_path)
-        logger.info(f"Syllabus file uploaded successfully: {uploaded_file.uri}")
+        file_uri = await file_upload_manager.get_file_uri(pdf_path, content_hash=pdf_hash)
     except Exception as e:
         logger.error(f"Error uploading syllabus PDF file: {e}")
         raise
@@ -206,7 +657,7 @@ async def extract_syllabus_from_pdf(pdf_path: str) -> List['ExtractedTopic']:
             },
             {
                 "type": "media",
-                "file_uri": uploaded_file.uri,
+                "file_uri": file_uri,
                 "mime_type": "application/pdf"
             }
         ]
@@ -238,6 +689,10 @@ async def extract_syllabus_from_pdf(pdf_path: str) -> List['ExtractedTopic']:
             
         topics_data = extraction_result.topics
         logger.info(f"Extracted {len(topics_data)} syllabus topics from PDF: {pdf_path}")
+        if topics_data:
+            await store_extraction(
+                pdf_hash, "syllabus", SYLLABUS_PROMPT_VERSION, DEFAULT_MODEL, extraction_result
+            )
         return topics_data
         
     except Exception as e:
@@ -247,120 +702,37 @@ async def extract_syllabus_from_pdf(pdf_path: str) -> List['ExtractedTopic']:
 async def populate_syllabus_db(extracted_topics: List['ExtractedTopic']):
     """
     Populates the database with the extracted syllabus topics, flattening the hierarchy.
+    Only leaf topics become rows, with their module and parent topic (title) as columns.
     """
     from utils.db import get_session
     from src.data_models.models import SyllabusNode
+    from src.sub_agents.ocr_agent.syllabus_hierarchy import flatten_syllabus_topics
     
     logger.info(f"Populating database with {len(extracted_topics)} syllabus topics...")
+    flat_topics = flatten_syllabus_topics(extracted_topics)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": uuid4(),
+            "topic": flat.topic.name,
+            "description": flat.topic.description,
+            "module": flat.module,
+            "parent_topic": flat.parent_topic,
+            "level": flat.topic.level,
+            "estimated_hours": flat.topic.estimated_hours or 0.0,
+            "created_at": now,
+        }
+        for flat in flat_topics
+    ]
+
     async for session in get_session():
         try:
-            # We need to flatten the hierarchy.
-            # The LLM returns a list of topics with parent_name.
-            # We need to infer Module and Parent Topic.
-            
-            # 1. Build a map of all items to resolve hierarchy
-            topic_map = {t.name: t for t in extracted_topics}
-            
-            flat_nodes = []
-            
-            for topic in extracted_topics:
-                # We only want to store "leaf" nodes or actual topics as rows.
-                # If an item is a Module (Level 1) or Chapter (Level 2), we don't store it as a row 
-                # UNLESS it has no children (which we can't easily know without checking all others).
-                # BUT, the user said "having only topics in the datatable".
-                # So we filter for Level 3 (Topic) or maybe Level 2 if it's a direct topic.
-                
-                # Let's assume Level 3 are the topics.
-                # And Level 1 is Module, Level 2 is Title/Chapter.
-                
-                if topic.level >= 2: # Store Level 2 and 3. Level 1 is just a container.
-                    
-                    # Resolve Module and Parent Topic
-                    module_name = None
-                    parent_topic_name = None
-                    
-                    current = topic
-                    
-                    # Traverse up to find Module
-                    # This is tricky with just parent_name strings if names aren't unique, but let's try.
-                    
-                    # Immediate parent
-                    if current.parent_name:
-                        parent = topic_map.get(current.parent_name)
-                        if parent:
-                            if parent.level == 1:
-                                module_name = parent.name
-                                parent_topic_name = None # Direct child of module
-                            elif parent.level == 2:
-                                parent_topic_name = parent.name
-                                # Grandparent should be module
-                                if parent.parent_name:
-                                    grandparent = topic_map.get(parent.parent_name)
-                                    if grandparent and grandparent.level == 1:
-                                        module_name = grandparent.name
-                    
-                    # If we couldn't resolve module, maybe it IS a module? No, we filtered level >= 2.
-                    # If we are at level 2, and parent is Module, then module is parent.
-                    
-                    if topic.level == 2:
-                         # It's a Chapter/Title.
-                         # User wants "topics in datatable... module and title in separate column"
-                         # If this is a Title, does it go in?
-                         # Maybe user means ONLY the lowest level things go in.
-                         pass
-
-                    # Let's simplify: Store EVERYTHING that is NOT a root module as a row?
-                    # Or strictly follow: Row = Topic. Columns = Module, Title.
-                    
-                    # Let's try to store Level 3 items.
-                    if topic.level == 3:
-                        node = SyllabusNode(
-                            id=uuid4(),
-                            topic=topic.name,
-                            description=topic.description,
-                            module=module_name if module_name else "Unknown",
-                            parent_topic=parent_topic_name,
-                            level=topic.level,
-                            estimated_hours=topic.estimated_hours if topic.estimated_hours else 0.0,
-                            created_at=datetime.utcnow()
-                        )
-                        flat_nodes.append(node)
-                    
-                    # What if there are topics at Level 2 (direct under module)?
-                    elif topic.level == 2:
-                         # Check if this has children. If not, it might be a topic itself.
-                         # For now, let's assume the LLM follows the 1-2-3 structure.
-                         # If we miss Level 2 topics, we might miss data.
-                         # Let's store Level 2 as well, treating them as "Topics" with no "Parent Topic" (Title).
-                         
-                         # But wait, if Level 2 is a "Title" that contains Level 3 "Topics", we don't want a row for the Title itself?
-                         # The user said "keeping the module name and title in separate column".
-                         # This implies the Row IS the Topic.
-                         # So we only store the "leaves".
-                         
-                         # To find leaves: Check if any other topic has this topic as parent.
-                         is_parent = any(t.parent_name == topic.name for t in extracted_topics)
-                         if not is_parent:
-                             # It's a leaf.
-                             node = SyllabusNode(
-                                id=uuid4(),
-                                topic=topic.name,
-                                description=topic.description,
-                                module=module_name if module_name else "Unknown",
-                                parent_topic=parent_topic_name, # Might be None if direct under Module
-                                level=topic.level,
-                                estimated_hours=topic.estimated_hours if topic.estimated_hours else 0.0,
-                                created_at=datetime.utcnow()
-                            )
-                             flat_nodes.append(node)
-
-            for node in flat_nodes:
-                session.add(node)
-            
+            if rows:
+                await session.execute(insert(SyllabusNode), rows)
             await session.commit()
-            logger.info(f"Syllabus database population successful. Added {len(flat_nodes)} topics.")
+            logger.info(f"Syllabus database population successful. Added {len(rows)} topics.")
         except Exception as e:
             logger.error(f"Error populating syllabus database: {e}")
             await session.rollback()
             raise
-        break
\ No newline at end of file
+        break
@@ -0,0 +1,111 @@
+"""
+Page-window helpers for chunked OCR extraction.
+
+Long PDFs are split into windows of consecutive pages that fit a token budget,
+extracted independently, and stitched back into a single question list.
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Optional
+
+from utils.token_estimation import count_tokens
+from src.sub_agents.ocr_agent.schemas import ExtractedQuestion
+
+# original_numbering the LLM uses for a fragment that continues the previous window's last question
+CONTINUATION_MARKER = "(continued)"
+
+class WindowExtractionError(RuntimeError):
+    """Raised when some page windows still fail after their retries, so the extraction is incomplete."""
+
+@dataclass
+class PageWindow:
+    """A run of consecutive pages sent to the LLM in one call."""
+    index: int
+    page_start: int # 1-indexed, inclusive
+    page_end: int # 1-indexed, inclusive
+    text: str
+
+def build_page_windows(pages: List[str], token_budget: int = 0, first_page: int = 1) -> List[PageWindow]:
+    """
+    Packs consecutive pages into windows of at most `token_budget` tokens.
+    A budget of 0 (or a page larger than the budget) yields one window per page.
+    `first_page` is the page number of pages[0], for runs taken from the middle of a PDF.
+    """
+    windows: List[PageWindow] = []
+    current: List[str] = []
+    current_tokens = 0
+    start = first_page
+
+    def flush(end: int):
+        nonlocal current, current_tokens
+        if current:
+            windows.append(PageWindow(len(windows), start, end, "\n\n".join(current)))
+        current = []
+        current_tokens = 0
+
+    for page_no, page_text in enumerate(pages, start=first_page):
+        page_tokens = count_tokens(page_text)
+        if current and (token_budget <= 0 or current_tokens + page_tokens > token_budget):
+            flush(page_no - 1)
+        if not current:
+            start = page_no
+        current.append(page_text)
+        current_tokens += page_tokens
+
+    flush(first_page + len(pages) - 1)
+    return windows
+
+def _numbering_key(numbering: Optional[str]) -> str:
+    """Normalizes '1(a)', 'Q1 a)', 'q.1 (a)' to a comparable key ('1a')."""
+    if not numbering:
+        return ""
+    key = re.sub(r"^\s*q(uestion)?\.?\s*", "", numbering.strip().lower())
+    return re.sub(r"[^0-9a-z]", "", key)
+
+def _merge_into(target: ExtractedQuestion, fragment: ExtractedQuestion):
+    """Appends a continuation fragment to the question it belongs to."""
+    fragment_text = fragment.raw_text.strip()
+    if fragment_text and fragment_text not in target.raw_text:
+        target.raw_text = f"{target.raw_text.rstrip()}\n{fragment_text}"
+    if not target.marks and fragment.marks:
+        target.marks = fragment.marks
+
+def stitch_window_results(window_results: List[List[ExtractedQuestion]]) -> List[ExtractedQuestion]:
+    """
+    Stitches per-window extractions (in page order) into one question list.
+
+    - A leading "(continued)" fragment, or a leading question whose numbering
+      repeats the previous window's last question, is merged into that question.
+    - Missing sections are carried forward from the preceding question.
+    - Missing years are filled with the most common year found in the paper.
+    """
+    stitched: List[ExtractedQuestion] = []
+
+    for questions in window_results:
+        for position, question in enumerate(questions):
+            question = question.model_copy()
+            if position == 0 and stitched:
+                previous = stitched[-1]
+                is_continuation = question.original_numbering.strip().lower() == CONTINUATION_MARKER
+                repeats_previous = _numbering_key(question.original_numbering) == _numbering_key(previous.original_numbering)
+                if is_continuation or repeats_previous:
+                    _merge_into(previous, question)
+                    continue
+            if question.original_numbering.strip().lower() == CONTINUATION_MARKER:
+                # Nothing to attach to (first window); keep the text rather than lose it
+                question.original_numbering = ""
+            stitched.append(question)
+
+    years = Counter(q.year for q in stitched if q.year)
+    paper_year = years.most_common(1)[0][0] if years else None
+    section = None
+    for question in stitched:
+        if question.section:
+            section = question.section
+        else:
+            question.section = section
+        if question.year is None:
+            question.year = paper_year
+
+    return stitched
@@ -0,0 +1,66 @@
+"""
+PDF -> Markdown conversion off the event loop.
+
+pymupdf4llm is CPU-bound and synchronous, so conversions run in a process pool
+that is created once and reused for every PDF and every pipeline run in this
+process. N PDFs convert on N cores while LLM calls for earlier PDFs stay in flight.
+"""
+import asyncio
+import atexit
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from utils.logger import get_logger
+from utils.settings import settings
+
+logger = get_logger()
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def _convert(pdf_path: str, page_chunks: bool):
+    """Runs inside a worker process. Only plain strings are sent back."""
+    import pymupdf4llm
+
+    if page_chunks:
+        return [chunk.get("text", "") for chunk in pymupdf4llm.to_markdown(pdf_path, page_chunks=True)]
+    return pymupdf4llm.to_markdown(pdf_path)
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    """Returns the shared conversion pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        workers = settings.pdf_conversion_workers or os.cpu_count() or 1
+        # Spawned workers do not inherit the parent's event loop, DB pool or gRPC state
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        logger.info(f"Started PDF conversion pool ({workers} workers)")
+    return _executor
+
+def shutdown_pdf_executor():
+    """Stops the shared conversion pool. It is recreated lazily if needed again."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+atexit.register(shutdown_pdf_executor)
+
+async def _run_conversion(pdf_path: str, page_chunks: bool):
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_pdf_executor(), _convert, pdf_path, page_chunks)
+    except BrokenProcessPool:
+        # A worker died (e.g. a pathological PDF); drop the pool so the next call starts a fresh one
+        logger.error(f"PDF conversion pool broke while converting {pdf_path}; restarting pool")
+        shutdown_pdf_executor()
+        raise
+
+async def pdf_to_markdown(pdf_path: str) -> str:
+    """Converts a whole PDF to Markdown without blocking the event loop."""
+    return await _run_conversion(pdf_path, page_chunks=False)
+
+async def pdf_to_markdown_pages(pdf_path: str) -> List[str]:
+    """Converts a PDF to one Markdown string per page without blocking the event loop."""
+    return await _run_conversion(pdf_path, page_chunks=True)
@@ -0,0 +1,129 @@
+"""
+Local text-layer quality probe.
+
+Inspects a PDF with PyMuPDF (no LLM call) and decides up front whether the
+Markdown path can work or the paper needs Gemini's multimodal path, so scanned
+papers no longer pay for a Markdown extraction that is bound to fail.
+"""
+import asyncio
+import os
+import unicodedata
+from typing import Optional
+from pydantic import BaseModel, Field
+
+from utils.logger import get_logger
+from utils.settings import settings
+from src.sub_agents.ocr_agent.extraction_cache import file_sha256, get_cached_extraction, store_extraction
+from src.sub_agents.ocr_agent.pdf_conversion import get_pdf_executor
+
+logger = get_logger()
+
+# Bump when the metrics change, so cached metrics are recomputed. Only the metrics are
+# cached: the verdict is decided again on every read, from the current settings.
+PROBE_VERSION = "v2"
+
+VERDICT_MARKDOWN = "markdown"
+VERDICT_MULTIMODAL = "multimodal"
+
+class PdfProbeMetrics(BaseModel):
+    """Text-layer metrics of one PDF (what the probe cache stores)."""
+    page_count: int = 0
+    chars_per_page: float = 0.0
+    image_area_ratio: float = Field(0.0, description="Share of page area covered by images (0-1)")
+    garbage_ratio: float = Field(0.0, description="Share of text characters that are not readable text (0-1)")
+
+class PdfProbeResult(PdfProbeMetrics):
+    """Text-layer metrics and routing verdict for one PDF."""
+    verdict: str = VERDICT_MARKDOWN
+    reason: str = ""
+
+def _is_garbage(ch: str) -> bool:
+    if ch.isspace():
+        return False
+    if ch == "�":
+        return True
+    # Control, private-use, unassigned and surrogate code points come from broken font maps
+    return unicodedata.category(ch) in ("Cc", "Co", "Cn", "Cs")
+
+def decide_verdict(
+    chars_per_page: float,
+    image_area_ratio: float,
+    garbage_ratio: float,
+) -> tuple:
+    """Returns (verdict, reason) for the given text-layer metrics."""
+    min_chars = settings.ocr_probe_min_chars_per_page
+    if chars_per_page < min_chars:
+        return VERDICT_MULTIMODAL, f"sparse text layer ({chars_per_page:.0f} chars/page < {min_chars})"
+    if garbage_ratio > settings.ocr_probe_max_garbage_ratio:
+        return VERDICT_MULTIMODAL, f"garbled text layer ({garbage_ratio:.1%} unreadable)"
+    if image_area_ratio >= settings.ocr_probe_max_image_ratio and chars_per_page < 2 * min_chars:
+        return VERDICT_MULTIMODAL, f"image-dominated pages ({image_area_ratio:.0%} image area)"
+    return VERDICT_MARKDOWN, f"usable text layer ({chars_per_page:.0f} chars/page)"
+
+def with_verdict(metrics: PdfProbeMetrics) -> PdfProbeResult:
+    """Adds the routing verdict for the current thresholds to the metrics."""
+    verdict, reason = decide_verdict(metrics.chars_per_page, metrics.image_area_ratio, metrics.garbage_ratio)
+    return PdfProbeResult(**metrics.model_dump(), verdict=verdict, reason=reason)
+
+def measure_pdf(pdf_path: str) -> PdfProbeMetrics:
+    """Measures the PDF's text layer. Synchronous and CPU-bound."""
+    import pymupdf
+
+    total_chars = 0
+    garbage_chars = 0
+    page_area = 0.0
+    image_area = 0.0
+
+    with pymupdf.open(pdf_path) as doc:
+        page_count = doc.page_count
+        for page in doc:
+            text = page.get_text("text")
+            total_chars += sum(1 for ch in text if not ch.isspace())
+            garbage_chars += sum(1 for ch in text if _is_garbage(ch))
+
+            rect = page.rect
+            area = rect.width * rect.height
+            page_area += area
+            covered = 0.0
+            for info in page.get_image_info():
+                bbox = pymupdf.Rect(info["bbox"]) & rect
+                if not bbox.is_empty:
+                    covered += bbox.width * bbox.height
+            image_area += min(covered, area)
+
+    chars_per_page = total_chars / page_count if page_count else 0.0
+    image_area_ratio = image_area / page_area if page_area else 0.0
+    garbage_ratio = garbage_chars / total_chars if total_chars else 0.0
+
+    return PdfProbeMetrics(
+        page_count=page_count,
+        chars_per_page=round(chars_per_page, 1),
+        image_area_ratio=round(image_area_ratio, 3),
+        garbage_ratio=round(garbage_ratio, 4),
+    )
+
+def probe_pdf(pdf_path: str) -> PdfProbeResult:
+    """Measures the PDF's text layer and decides its route. Synchronous and CPU-bound."""
+    return with_verdict(measure_pdf(pdf_path))
+
+async def probe_pdf_cached(pdf_path: str, pdf_hash: Optional[str] = None) -> PdfProbeResult:
+    """
+    Probes a PDF off the event loop, caching its metrics per PDF hash.
+    The verdict is decided on every call, so threshold changes apply to cached PDFs too.
+    """
+    pdf_hash = pdf_hash or await asyncio.to_thread(file_sha256, pdf_path)
+    cached = await get_cached_extraction(pdf_hash, "probe", PROBE_VERSION, "pymupdf", PdfProbeMetrics)
+    if cached is not None:
+        metrics = cached
+    else:
+        loop = asyncio.get_running_loop()
+        metrics = await loop.run_in_executor(get_pdf_executor(), measure_pdf, pdf_path)
+        await store_extraction(pdf_hash, "probe", PROBE_VERSION, "pymupdf", metrics)
+    result = with_verdict(metrics)
+
+    logger.info(
+        f"Probe {os.path.basename(pdf_path)}: {result.verdict} - {result.reason} "
+        f"[{result.chars_per_page:.0f} chars/page, {result.image_area_ratio:.0%} images, "
+        f"{result.garbage_ratio:.1%} garbage{', cached' if cached is not None else ''}]"
+    )
+    return result
@@ -1,3 +1,8 @@
+# Bump these whenever the corresponding prompt changes, so cached extractions are invalidated.
+QUESTION_PROMPT_VERSION = "v1"
+SYLLABUS_PROMPT_VERSION = "v1"
+TAGGING_PROMPT_VERSION = "v2"
+
 # 2. Construct Prompt for LLM
 system_prompt = """You are an expert exam paper parser. Your task is to extract questions from the provided exam paper text.
 Identify the Section, Question Number, Question Text, and Marks for each question.
@@ -42,6 +47,33 @@ Exam Paper Content:
 {md_text}
 """
 
+# Used by page-window extraction: same rules, applied to a slice of the paper.
+window_user_prompt = user_prompt.replace("Exam Paper Content:", """### PARTIAL CONTENT:
+This is only pages {page_start}-{page_end} of a {page_count}-page exam paper; the other pages are processed separately.
+- If the paper header is not visible, leave `year` null and use the last section heading you can see (or null).
+- If the content begins in the middle of a question (text before the first question number), extract that fragment as its own entry with original_numbering "(continued)".
+- If the content ends in the middle of a question, extract what is visible.
+
+Exam Paper Content:""")
+
+# Used when settings.ocr_fused_tagging is on: the extraction call also assigns the standalone tagger's tags.
+tagging_fields = """- difficulty: Difficulty from 1 to 5 (1: direct recall or definition, 2: basic explanation, 3: standard application, 4: multi-step analysis, 5: evaluation, design or novel synthesis).
+- taxonomy: Bloom's Taxonomy levels, one or more of "Recall", "Understand", "Apply", "Analyze", "Evaluate", "Create".
+"""
+
+def with_tagging(prompt: str) -> str:
+    """Extends a question extraction prompt with the difficulty and taxonomy fields."""
+    prompt = prompt.replace("Infer from header.\n", "Infer from header.\n" + tagging_fields, 1)
+    return prompt.replace(
+        '''        "year": ...
+''',
+        '''        "year": ...,
+        "difficulty": ...,
+        "taxonomy": ["..."]
+''',
+        1,
+    )
+
 syllabus_system_prompt = """You are an expert curriculum parser. Your task is to extract the syllabus structure from the provided document.
 Identify Units, Chapters, and Topics, maintaining their hierarchy.
 Return the output strictly as a JSON array of objects.
@@ -0,0 +1,236 @@
+"""
+Deterministic question splitter for well-structured PYQ papers.
+
+Most university papers follow a fixed layout ("Part-II", "Q2", "a) ...",
+"(2 x 10)", "(16)"). This module parses the pymupdf4llm Markdown with rules,
+scores every question, and reports which pages were parsed confidently so that
+only the remaining pages need an LLM call.
+"""
+import re
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from src.sub_agents.ocr_agent.schemas import ExtractedQuestion
+
+SECTION_RE = re.compile(r"\b(?P<kind>(?i:Part|Section))\s*[-–:]?\s*(?P<label>IV|III|II|I|[A-D]|[1-4])\b")
+QUESTION_RE = re.compile(r"(?<![A-Za-z0-9])Q\s*\.?\s*(?P<num>\d{1,2})\b")
+SUBPART_RE = re.compile(r"(?<!\S)\(?(?P<letter>[a-z])\)(?=\s)")
+GROUP_MARKS_RE = re.compile(r"\(\s*(?P<each>\d{1,2})\s*[x×X]\s*(?P<count>\d{1,2})\s*\)")
+# "[5 marks]" anywhere, or a bare "(16)" only at the end: "(3)" inside a question is part of its text
+MARKS_RE = re.compile(r"[\(\[]\s*(?P<marks>\d{1,2})\s*(?:(?i:marks?)\s*[\)\]]|[\)\]]\s*$)")
+YEAR_RANGE_RE = re.compile(r"(?P<start>20\d{2})\s*[-–/]\s*(?P<end>\d{2,4})\b")
+YEAR_RE = re.compile(r"\b(?P<year>20\d{2})\b")
+
+# Every structural marker, in one left-to-right pass over the paper
+MARKER_RE = re.compile(
+    r"(?P<section>\b(?i:Part|Section)\s*[-–:]?\s*(?:IV|III|II|I|[A-D]|[1-4])\b)"
+    r"|(?P<question>(?<![A-Za-z0-9])Q\s*\.?\s*\d{1,2}\b)"
+    r"|(?P<group_marks>\(\s*\d{1,2}\s*[x×X]\s*\d{1,2}\s*\))"
+    r"|(?P<subpart>(?<!\S)\(?[a-z]\)(?=\s))"
+)
+
+MIN_QUESTION_CHARS = 15
+MAX_QUESTION_CHARS = 1500
+# Pages with this much unclaimed text are not considered handled by the rules
+MAX_UNCLAIMED_PAGE_CHARS = 200
+
+# Bump when the rules or the scoring change, so cached extractions are recomputed
+RULES_VERSION = "v2"
+
+@dataclass
+class RuleQuestion:
+    """A question found by the rules, with the pages it spans and a 0-1 confidence."""
+    question: ExtractedQuestion
+    page: int
+    end_page: int
+    confidence: float
+
+@dataclass
+class RuleParseResult:
+    questions: List[RuleQuestion] = field(default_factory=list)
+    confident_pages: Set[int] = field(default_factory=set)
+    page_count: int = 0
+
+    def questions_on_page(self, page: int) -> List[ExtractedQuestion]:
+        return [rq.question for rq in self.questions if rq.page == page]
+
+    @property
+    def unresolved_pages(self) -> List[int]:
+        return [p for p in range(1, self.page_count + 1) if p not in self.confident_pages]
+
+def clean_markdown(text: str) -> str:
+    """Strips Markdown/HTML decoration that pymupdf4llm adds around the paper text."""
+    text = re.sub(r"<!--.*?-->", " ", text, flags=re.DOTALL)
+    text = re.sub(r"<br\s*/?>", "\n", text, flags=re.IGNORECASE)
+    text = re.sub(r"</?[a-zA-Z][^>]*>", "", text)
+    text = re.sub(r"^\s*\|?\s*:?-{3,}.*$", "", text, flags=re.MULTILINE) # table separators
+    text = text.replace("|", " ")
+    text = re.sub(r"\*\*[\d\s/\-–.]*\*\*", " ", text) # bold date/serial stamps ("**9-20/02**")
+    text = re.sub(r"(\*\*|__|`)", "", text)
+    text = re.sub(r"^\s*(?:[-*+]|#{1,6})\s+", "", text, flags=re.MULTILINE)
+    text = re.sub(r"[ \t]+", " ", text)
+    return text
+
+def detect_year(text: str) -> Optional[int]:
+    """Exam year from the header: '2022-23' -> 2023 (the year the exam is sat), else the first 20xx."""
+    match = YEAR_RANGE_RE.search(text)
+    if match:
+        end = match.group("end")
+        return int(end) if len(end) == 4 else int(match.group("start")[:2] + end)
+    match = YEAR_RE.search(text)
+    return int(match.group("year")) if match else None
+
+def _section_name(marker: str) -> str:
+    match = SECTION_RE.search(marker)
+    return f"{match.group('kind').title()}-{match.group('label').upper()}"
+
+def _finish_text(raw: str) -> tuple:
+    """Returns (text, marks) with a trailing/inline marks annotation removed."""
+    text = " ".join(raw.split())
+    marks_found = MARKS_RE.findall(text)
+    marks = int(marks_found[-1]) if len(marks_found) == 1 else None
+    if marks is not None:
+        text = " ".join(MARKS_RE.sub(" ", text).split())
+    return text, marks
+
+def _new_draft(kind: str, number: str, page: int, section: Optional[str], group_marks: Optional[int],
+               in_sequence: bool = True, parent: Optional[str] = None) -> dict:
+    return {"kind": kind, "number": number, "raw": "", "page": page, "end_page": page, "section": section,
+            "group_marks": group_marks, "in_sequence": in_sequence, "parent": parent}
+
+def _score(draft: dict, text: str, marks: Optional[int], duplicated: bool) -> float:
+    """Heuristic 0-1 confidence that the rules split and annotated this question correctly."""
+    confidence = 1.0
+    if duplicated:
+        confidence = 0.2 # Same numbering twice: the layout was duplicated or misread
+    if draft["kind"] == "orphan":
+        confidence -= 0.6
+    if marks is None:
+        confidence -= 0.4
+    if len(text) < MIN_QUESTION_CHARS:
+        confidence -= 0.5
+    if len(text) > MAX_QUESTION_CHARS:
+        confidence -= 0.3
+    if not draft["in_sequence"]:
+        confidence -= 0.3
+    if draft["section"] is None:
+        confidence -= 0.1
+    return round(max(confidence, 0.0), 2)
+
+def parse_questions_by_rules(pages: List[str], min_confidence: float = 0.8) -> RuleParseResult:
+    """
+    Parses per-page Markdown into questions.
+
+    A page is "confident" when every question starting on it scores at least
+    `min_confidence` and it carries no sizeable text the rules could not
+    attribute to a question. Everything else should go to the LLM.
+    """
+    result = RuleParseResult(page_count=len(pages))
+
+    # One stream over all pages so questions can run across page breaks
+    stream = ""
+    page_starts: List[int] = []
+    for page_text in pages:
+        page_starts.append(len(stream))
+        stream += clean_markdown(page_text) + "\n"
+
+    def page_of(pos: int) -> int:
+        return bisect_right(page_starts, pos)
+
+    markers = list(MARKER_RE.finditer(stream))
+    year = detect_year(stream[:markers[0].start()] if markers else stream) or detect_year(stream)
+
+    drafts: List[dict] = []
+    current: Optional[dict] = None
+    section: Optional[str] = None
+    main_number: Optional[str] = None
+    group_marks: Optional[int] = None
+    last_letter: Dict[str, str] = {}
+    unclaimed: Dict[int, int] = defaultdict(int)
+    cursor = 0
+
+    for marker in markers:
+        gap = stream[cursor:marker.start()]
+        if current is not None:
+            current["raw"] += gap
+            current["end_page"] = page_of(cursor + len(gap.rstrip()) - 1)
+        else:
+            unclaimed[page_of(cursor)] += len(gap.strip())
+        cursor = marker.end()
+        page = page_of(marker.start())
+
+        if marker.group("section"):
+            section = _section_name(marker.group(0))
+            current = None
+        elif marker.group("group_marks"):
+            # "Q1 Answer the following: (2 x 10)" - each sub-part that follows is worth 2
+            group_marks = int(GROUP_MARKS_RE.search(marker.group(0)).group("each"))
+            if current is not None and current["kind"] == "main":
+                current["group_marks"] = group_marks
+        elif marker.group("question"):
+            main_number = QUESTION_RE.search(marker.group(0)).group("num")
+            group_marks = None
+            current = _new_draft("main", main_number, page, section, None)
+            drafts.append(current)
+        else:
+            letter = marker.group(0).strip("()")
+            if main_number is None:
+                # Sub-part before any question number: nothing reliable to attach it to
+                current = _new_draft("orphan", f"({letter})", page, section, group_marks, in_sequence=False)
+            else:
+                previous = last_letter.get(main_number)
+                expected = chr(ord(previous) + 1) if previous else "a"
+                last_letter[main_number] = letter
+                current = _new_draft("sub", f"{main_number}({letter})", page, section, group_marks,
+                                     in_sequence=letter == expected, parent=main_number)
+            drafts.append(current)
+
+    tail = stream[cursor:]
+    if current is not None:
+        current["raw"] += tail
+        current["end_page"] = page_of(cursor + len(tail.rstrip()) - 1)
+    else:
+        unclaimed[page_of(cursor)] += len(tail.strip())
+
+    # A main question with sub-parts is just their instruction line ("Answer the following questions")
+    parents = {d["parent"] for d in drafts if d["kind"] == "sub"}
+    drafts = [d for d in drafts if not (d["kind"] == "main" and d["number"] in parents)]
+    counts = Counter(d["number"] for d in drafts)
+
+    for draft in drafts:
+        text, marks = _finish_text(draft["raw"])
+        if marks is None:
+            marks = draft["group_marks"]
+        confidence = _score(draft, text, marks, counts[draft["number"]] > 1)
+        result.questions.append(RuleQuestion(
+            question=ExtractedQuestion(
+                original_numbering=draft["number"],
+                raw_text=text,
+                marks=marks or 0,
+                section=draft["section"],
+                year=year,
+                confidence=confidence,
+            ),
+            page=draft["page"],
+            end_page=max(draft["page"], draft["end_page"]),
+            confidence=confidence,
+        ))
+
+    if not result.questions:
+        return result # Nothing recognisable: every page goes to the LLM
+
+    for page in range(1, len(pages) + 1):
+        scores = [rq.confidence for rq in result.questions if rq.page == page]
+        if scores and min(scores) < min_confidence:
+            continue
+        # Page 1 carries the paper header (university, course, instructions), which is expected to be unclaimed
+        if page > 1 and unclaimed[page] > MAX_UNCLAIMED_PAGE_CHARS:
+            continue
+        # The tail of a question from an unresolved page must go to the LLM together with its start
+        if any(rq.page < page <= rq.end_page and rq.page not in result.confident_pages for rq in result.questions):
+            continue
+        result.confident_pages.add(page)
+
+    return result
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
 from typing import Optional, List
 
 class PageContent(BaseModel):
@@ -21,12 +22,32 @@ class ExtractedQuestion(BaseModel):
     # If the LLM sees it in the text, it can extract it, otherwise optional.
     year: Optional[int] = Field(None, description="Year if explicitly mentioned in question text")
 
+    # Set by the rule-based splitter only; hidden from the LLM's output schema
+    confidence: SkipJsonSchema[Optional[float]] = None
+
+    # Filled by the extraction call only when settings.ocr_fused_tagging is on (see TaggedExtractedQuestion)
+    difficulty: SkipJsonSchema[Optional[int]] = None
+    taxonomy: SkipJsonSchema[Optional[List[str]]] = None
+
+class TaggedExtractedQuestion(ExtractedQuestion):
+    """
+    An extracted question that also carries the tags the standalone tagger would assign.
+    """
+    difficulty: Optional[int] = Field(None, description="Difficulty level from 1 (Easy) to 5 (Hard)")
+    taxonomy: Optional[List[str]] = Field(None, description="Bloom's Taxonomy levels (e.g., 'Recall', 'Apply', 'Analyze')")
+
 class ExtractionResult(BaseModel):
     """
     The final structured output from the LLM for a single PDF.
     """
     questions: List[ExtractedQuestion] = Field(..., description="List of extracted questions")
 
+class TaggedExtractionResult(BaseModel):
+    """
+    Structured output of a fused extraction + tagging call.
+    """
+    questions: List[TaggedExtractedQuestion] = Field(..., description="List of extracted and tagged questions")
+
 class ExtractedTopic(BaseModel):
     """
     A single topic or unit extracted from the syllabus.
@@ -0,0 +1,111 @@
+"""
+Syllabus hierarchy flattening.
+
+The LLM returns syllabus topics as a flat list linked by `parent_name`. This
+module resolves the links into a tree of any depth, where duplicate names
+are scoped by their parent (e.g. "Introduction" in every unit). It then emits
+one row per leaf topic with its module and immediate parent. Every step is a
+single pass over the list or over a children index, so large syllabi
+flatten in linear time.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from src.sub_agents.ocr_agent.schemas import ExtractedTopic
+
+UNKNOWN_MODULE = "Unknown"
+
+@dataclass
+class FlatTopic:
+    """A leaf syllabus topic with its resolved ancestry."""
+    topic: ExtractedTopic
+    module: str
+    parent_topic: Optional[str] # Immediate parent, None when the parent is the module itself
+
+def resolve_parents(topics: List[ExtractedTopic]) -> List[Optional[int]]:
+    """
+    Returns, for each topic, the index of its parent (or None for roots/orphans).
+
+    A parent must sit at a shallower level than its child, which also rules
+    out cycles. Among topics with the parent's name, the nearest preceding
+    one wins (document order scopes duplicates); a parent listed only after
+    its children is found through the first occurrence of the name.
+    """
+    first_by_name: Dict[str, int] = {}
+    first_by_name_level: Dict[Tuple[str, int], int] = {}
+    for index, topic in enumerate(topics):
+        first_by_name.setdefault(topic.name, index)
+        first_by_name_level.setdefault((topic.name, topic.level), index)
+
+    last_by_name: Dict[str, int] = {}
+    last_by_name_level: Dict[Tuple[str, int], int] = {}
+    parents: List[Optional[int]] = []
+
+    for index, topic in enumerate(topics):
+        parent = None
+        name = topic.parent_name
+        if name:
+            candidates = (
+                last_by_name_level.get((name, topic.level - 1)),
+                last_by_name.get(name),
+                first_by_name_level.get((name, topic.level - 1)),
+                first_by_name.get(name),
+            )
+            parent = next(
+                (c for c in candidates if c is not None and c != index and topics[c].level < topic.level),
+                None,
+            )
+        parents.append(parent)
+        last_by_name[topic.name] = index
+        last_by_name_level[(topic.name, topic.level)] = index
+
+    return parents
+
+def flatten_syllabus_topics(topics: List[ExtractedTopic]) -> List[FlatTopic]:
+    """
+    Flattens the topic tree into leaf rows, in document order.
+
+    Level-1 items are containers (modules) and never become rows. The module
+    of a row is its root ancestor. Topics with no module above them
+    (unresolvable parents) are kept under UNKNOWN_MODULE. Exact duplicates
+    (same module, parent and name) are emitted once.
+    """
+    parents = resolve_parents(topics)
+    children: List[List[int]] = [[] for _ in topics]
+    for index, parent in enumerate(parents):
+        if parent is not None:
+            children[parent].append(index)
+
+    # Root ancestor of every topic; parents always precede children in a root-first walk
+    roots: List[Optional[int]] = [None] * len(topics)
+    stack = [index for index, parent in enumerate(parents) if parent is None]
+    for index in stack:
+        roots[index] = index
+    while stack:
+        index = stack.pop()
+        for child in children[index]:
+            roots[child] = roots[index]
+            stack.append(child)
+
+    flat: List[FlatTopic] = []
+    seen = set()
+    for index, topic in enumerate(topics):
+        if children[index] or topic.level < 2:
+            continue
+
+        parent, root = parents[index], roots[index]
+        if topics[root].level < 2:
+            module = topics[root].name
+            parent_topic = None if parent == root else topics[parent].name
+        else:
+            # No module above this topic (orphaned chain)
+            module = UNKNOWN_MODULE
+            parent_topic = topics[parent].name if parent is not None else None
+
+        key = (module, parent_topic, topic.name)
+        if key in seen:
+            continue
+        seen.add(key)
+        flat.append(FlatTopic(topic=topic, module=module, parent_topic=parent_topic))
+
+    return flat
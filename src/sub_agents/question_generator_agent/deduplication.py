@@ -6,7 +6,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
 from utils.logger import get_logger
-from utils.llm import generate_embedding
+from utils.llm import generate_embeddings
 from src.data_models.models import PredictionCandidate, CandidateStatus, QuestionNormalized
 
 logger = get_logger()
@@ -70,19 +70,22 @@ async def deduplicate_candidates(
     
     logger.info(f"Comparing against {len(selected_data)} already-selected questions")
     
-    # Ensure all newly generated candidates have embeddings
-    for candidate in candidates:
-        if not candidate.normalized_question:
-            continue
-            
-        # Generate embedding if missing
-        if not candidate.normalized_question.embedding or len(candidate.normalized_question.embedding) == 0:
-            try:
-                norm_text = normalize_text(candidate.normalized_question.base_form)
-                embedding = await generate_embedding(norm_text)
+    # Ensure all newly generated candidates have embeddings (one batched request for the missing ones)
+    missing = [
+        candidate for candidate in candidates
+        if candidate.normalized_question and (
+            candidate.normalized_question.embedding is None or len(candidate.normalized_question.embedding) == 0
+        )
+    ]
+    if missing:
+        try:
+            embeddings = await generate_embeddings(
+                [normalize_text(c.normalized_question.base_form) for c in missing]
+            )
+            for candidate, embedding in zip(missing, embeddings):
                 candidate.normalized_question.embedding = embedding
-            except Exception as e:
-                logger.warning(f"Failed to generate embedding for candidate: {e}")
+        except Exception as e:
+            logger.warning(f"Failed to generate embeddings for {len(missing)} candidates: {e}")
     
     # Apply deduplication
     filtered_candidates = []
@@ -0,0 +1,145 @@
+"""
+In-memory similarity clustering for variant grouping.
+
+All embeddings are compared in float32 blocks (a block of rows against every
+later row), and every pair at or above the threshold is unioned. The result is
+the connected components of the threshold graph, which do not depend on the
+order of the input rows.
+
+The same pairs also give a single-linkage merge tree, which can be cut at any
+threshold above its floor without recomputing similarities.
+"""
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Rows per similarity block: block_size x n float32 values are held at once
+BLOCK_SIZE = 1024
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size."""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+    def groups(self) -> List[List[int]]:
+        """Components as sorted index lists, ordered by their smallest index."""
+        members = {}
+        for i in range(len(self.parent)):
+            members.setdefault(self.find(i), []).append(i)
+        return list(members.values())
+
+def normalize_rows(embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+    """float32 matrix with unit-length rows (all-zero rows stay zero)."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(embeddings), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def similarity_components(
+    embeddings: Sequence[Sequence[float]], threshold: float, block_size: int = BLOCK_SIZE
+) -> List[List[int]]:
+    """
+    Connected components of the graph linking every pair with cosine similarity >= threshold.
+
+    Returns the components as sorted index lists, ordered by their smallest index.
+    """
+    n = len(embeddings)
+    if n == 0:
+        return []
+    matrix = normalize_rows(embeddings)
+    uf = UnionFind(n)
+
+    for start in range(0, n, block_size):
+        block = matrix[start:start + block_size]
+        # The block against itself and every later row; triu keeps pairs (i, j) with j > i
+        similarity = block @ matrix[start:].T
+        rows, cols = np.nonzero(np.triu(similarity >= threshold, k=1))
+        for i, j in zip((rows + start).tolist(), (cols + start).tolist()):
+            uf.union(i, j)
+
+    return uf.groups()
+
+def _spanning_forest(
+    n: int, sources: np.ndarray, targets: np.ndarray, weights: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Kruskal: the maximum spanning forest of the given edges, strongest first (at most n - 1 edges)."""
+    # Ties in a fixed order, so the forest (and the tree built from it) is reproducible
+    order = np.lexsort((targets, sources, -weights))
+    uf = UnionFind(n)
+    kept = []
+    for position, i, j in zip(order.tolist(), sources[order].tolist(), targets[order].tolist()):
+        if uf.find(i) != uf.find(j):
+            uf.union(i, j)
+            kept.append(position)
+            if len(kept) == n - 1:
+                break
+    kept = np.asarray(kept, dtype=np.int64)
+    return sources[kept], targets[kept], weights[kept]
+
+def single_linkage_tree(
+    embeddings: Sequence[Sequence[float]], min_similarity: float, block_size: int = BLOCK_SIZE
+) -> List[Tuple[int, int, float]]:
+    """
+    Single-linkage merge tree (a maximum spanning forest) over pairs with similarity >= min_similarity.
+
+    Returns the merges as (i, j, similarity), most similar first. Cutting the
+    tree at any threshold >= min_similarity gives exactly the components that
+    similarity_components computes at that threshold.
+
+    Each block's pairs are reduced together with the forest so far, so at most
+    one block of pairs plus n - 1 forest edges are held at once. By the cut
+    property, an edge dropped from the forest of a subset of pairs is never in
+    the forest of all of them.
+    """
+    n = len(embeddings)
+    if n == 0:
+        return []
+    matrix = normalize_rows(embeddings)
+    sources = np.empty(0, dtype=np.int64)
+    targets = np.empty(0, dtype=np.int64)
+    weights = np.empty(0, dtype=np.float32)
+    for start in range(0, n, block_size):
+        similarity = matrix[start:start + block_size] @ matrix[start:].T
+        rows, cols = np.nonzero(np.triu(similarity >= min_similarity, k=1))
+        sources, targets, weights = _spanning_forest(
+            n,
+            np.concatenate([sources, rows + start]),
+            np.concatenate([targets, cols + start]),
+            np.concatenate([weights, similarity[rows, cols]]),
+        )
+
+    return list(zip(sources.tolist(), targets.tolist(), weights.tolist()))
+
+def cut_tree(n: int, merges: Sequence[Tuple[int, int, float]], threshold: float) -> List[List[int]]:
+    """Components left after applying every merge with similarity >= threshold."""
+    uf = UnionFind(n)
+    for i, j, weight in merges:
+        if weight < threshold:
+            break
+        uf.union(i, j)
+    return uf.groups()
+
+def group_counts(n: int, merges: Sequence[Tuple[int, int, float]], thresholds: Sequence[float]) -> Dict[float, int]:
+    """Number of groups at each threshold; every merge above it removes exactly one group."""
+    ascending = sorted(weight for _, _, weight in merges)
+    return {t: n - (len(ascending) - bisect_left(ascending, t)) for t in thresholds}
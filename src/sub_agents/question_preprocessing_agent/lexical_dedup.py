@@ -0,0 +1,107 @@
+"""
+Lexical near-duplicate detection for questions, ahead of any embedding call.
+
+PYQ repeats are often near-verbatim: the same question renumbered, with other
+marks, whitespace or punctuation. Texts are canonicalized, cut into character
+shingles and indexed with MinHash LSH; a candidate only counts as a duplicate
+when the exact Jaccard similarity of the shingle sets passes the threshold.
+"""
+import re
+import unicodedata
+import zlib
+from collections import defaultdict
+from typing import Dict, Generic, Hashable, List, Optional, Set, Tuple, TypeVar
+
+import numpy as np
+
+K = TypeVar("K", bound=Hashable)
+
+# "Q1.", "Q.2 (b)", "3)", "(a)", "ii." at the start of a question
+LEADING_NUMBERING_RE = re.compile(
+    r"^\s*(?:Q\s*\.?\s*\d{1,2}\s*[.:)\-]?\s*)?(?:\(?(?:\d{1,2}|[a-z]|[ivx]{1,4})[.)]\s+)?",
+    flags=re.IGNORECASE,
+)
+# "[5 marks]", "(10 M)", "(16)", "(2 x 10)" at the end of a question
+TRAILING_MARKS_RE = re.compile(
+    r"\s*[\(\[]\s*\d{1,2}\s*(?:[x×]\s*\d{1,2}\s*)?(?:marks?|m)?\s*[\)\]]\s*$",
+    flags=re.IGNORECASE,
+)
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+NUM_BANDS = 16 # 4 rows per band: pairs above ~0.5 Jaccard almost always share a bucket
+MERSENNE_PRIME = (1 << 31) - 1
+
+def strip_question_decorations(text: str) -> str:
+    """Unicode-normalizes a question and drops its numbering and marks annotation."""
+    text = unicodedata.normalize("NFKC", text).strip()
+    text = LEADING_NUMBERING_RE.sub("", text, count=1)
+    return TRAILING_MARKS_RE.sub("", text).strip()
+
+def canonical_form(text: str) -> str:
+    """Case-, punctuation- and whitespace-insensitive form of a question."""
+    text = strip_question_decorations(text).casefold()
+    return " ".join(re.sub(r"[\W_]+", " ", text).split())
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    """Hashed character shingles of the canonical form (stable across processes)."""
+    form = canonical_form(text)
+    if len(form) <= size:
+        return {zlib.crc32(form.encode("utf-8"))} if form else set()
+    return {zlib.crc32(form[i:i + size].encode("utf-8")) for i in range(len(form) - size + 1)}
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class MinHashLSH(Generic[K]):
+    """In-memory MinHash LSH index over shingle sets, with exact Jaccard verification."""
+
+    def __init__(self, threshold: float, num_perm: int = NUM_PERM, num_bands: int = NUM_BANDS, seed: int = 1):
+        if num_perm % num_bands:
+            raise ValueError("num_perm must be a multiple of num_bands")
+        self.threshold = threshold
+        self.rows = num_perm // num_bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[K]]] = [defaultdict(list) for _ in range(num_bands)]
+        self._shingles: Dict[K, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def _signature(self, shingle_set: Set[int]) -> np.ndarray:
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set)) & np.uint64(MERSENNE_PRIME)
+        hashed = (np.outer(self._a, values) + self._b[:, None]) % np.uint64(MERSENNE_PRIME)
+        return hashed.min(axis=1)
+
+    def _band_keys(self, shingle_set: Set[int]) -> List[bytes]:
+        signature = self._signature(shingle_set)
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(len(self._buckets))]
+
+    def add(self, key: K, text: str):
+        shingle_set = shingles(text)
+        if not shingle_set or key in self._shingles:
+            return
+        self._shingles[key] = shingle_set
+        for bucket, band_key in zip(self._buckets, self._band_keys(shingle_set)):
+            bucket[band_key].append(key)
+
+    def query(self, text: str) -> Optional[Tuple[K, float]]:
+        """The most similar indexed key at or above the threshold, with its Jaccard similarity."""
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return None
+        candidates = {
+            key
+            for bucket, band_key in zip(self._buckets, self._band_keys(shingle_set))
+            for key in bucket.get(band_key, ())
+        }
+        best: Optional[Tuple[K, float]] = None
+        for key in candidates:
+            score = jaccard(shingle_set, self._shingles[key])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
@@ -17,3 +17,21 @@ CONCEPT_STEM_PROMPT = ChatPromptTemplate.from_template(
     Canonical Concept Stem:
     """
 )
+
+CONCEPT_STEMS_BATCH_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You are an expert exam curator. You are given several clusters of similar questions. For **each cluster**, identify the **Single Core Concept** that unifies its questions and write a **Canonical Stem**.
+    
+    Input Clusters:
+    {clusters}
+    
+    Instructions:
+    1. Treat every cluster independently; never mix questions from different clusters.
+    2. Write a **Canonical Stem** that describes the *concept* being tested (e.g., "Calculate head movement using disk scheduling algorithms").
+    3. This is **NOT** a final exam question. Do **NOT** create a multi-part question (e.g., "Calculate i, ii, iii").
+    4. Keep it concise, neutral, and academic.
+    5. If the questions ask for specific algorithms (FIFO, SSTF), generalize it to the topic (Disk Scheduling Algorithms) unless all questions ask for the exact same specific one.
+    
+    Output a JSON object with one stem per cluster, ensuring the 'cluster_id' matches the input exactly.
+    """
+)
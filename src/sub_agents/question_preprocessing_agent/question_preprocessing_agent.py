@@ -1,16 +1,19 @@
 import asyncio
 import hashlib
-from typing import List, Optional
-from uuid import uuid4
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
 from datetime import datetime
-from sqlalchemy import select, func
+import numpy as np
+from sqlalchemy import bindparam, select, func, update, text as sql_text
 from sqlalchemy.ext.asyncio import AsyncSession
 from pgvector.sqlalchemy import Vector
 
 from utils.db import get_session
 from utils.logger import get_logger
-from utils.llm import generate_embedding
-from src.data_models.models import QuestionRaw, QuestionNormalized, VariantGroup
+from utils.llm import generate_embeddings
+from utils.settings import settings
+from src.data_models.models import QuestionRaw, QuestionNormalized, VariantGroup, VECTOR_DIM
+from src.sub_agents.question_preprocessing_agent.lexical_dedup import MinHashLSH, canonical_form, strip_question_decorations
 
 logger = get_logger()
 
@@ -20,28 +23,29 @@ SIMILARITY_THRESHOLD = 0.95
 def normalize_text(text: str) -> str:
     """
     Basic text normalization.
-    - Trims whitespace
-    - Standardizes line breaks (optional, but keeping markdown structure is key)
+    - Unicode NFKC normalization, trims whitespace
+    - Drops leading numbering ("Q2 (b)") and trailing marks ("[5 marks]")
+    - Keeps line breaks and casing (markdown structure is key)
     """
     if not text:
         return ""
-    return text.strip()
+    return strip_question_decorations(text)
 
 def get_canonical_hash(text: str) -> str:
     """
     Generate a deterministic hash for the normalized text.
-    Using SHA256.
+    Using SHA256 of the canonical (casefolded, punctuation-free) form.
     """
-    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return hashlib.sha256(canonical_form(text).encode('utf-8')).hexdigest()
 
 async def find_duplicate(session: AsyncSession, text: str, embedding: List[float]) -> Optional[QuestionNormalized]:
     """
     Finds a duplicate question using Hybrid Strategy:
-    1. Exact String Match (on normalized text)
+    1. Exact Match (on the canonical hash of the normalized text)
     2. Vector Similarity Match (> 0.95)
     """
-    # 1. Exact String Match
-    stmt = select(QuestionNormalized).where(QuestionNormalized.base_form == text).limit(1)
+    # 1. Exact Match
+    stmt = select(QuestionNormalized).where(QuestionNormalized.canonical_hash == get_canonical_hash(text)).limit(1)
     result = await session.execute(stmt)
     exact_match = result.scalar_one_or_none()
     if exact_match:
@@ -70,9 +74,255 @@ async def find_duplicate(session: AsyncSession, text: str, embedding: List[float
 
     return None
 
+async def find_duplicates_batch(
+    session: AsyncSession, texts: List[str], embeddings: List[List[float]]
+) -> Dict[str, QuestionNormalized]:
+    """
+    Batch version of find_duplicate: resolves a whole chunk in two round-trips.
+    1. Exact Match: one indexed canonical_hash IN (...) query
+    2. Vector Match: one query, a lateral top-1 nearest neighbour per VALUES row
+
+    Returns the existing duplicate for each text that has one.
+    """
+    if not texts:
+        return {}
+
+    # 1. Exact Match
+    # Texts differing only in case or punctuation share a canonical hash
+    hashes: Dict[str, List[str]] = {}
+    for text in texts:
+        hashes.setdefault(get_canonical_hash(text), []).append(text)
+    stmt = select(QuestionNormalized).where(QuestionNormalized.canonical_hash.in_(list(hashes)))
+    duplicates: Dict[str, QuestionNormalized] = {}
+    for match in (await session.execute(stmt)).scalars().all():
+        for text in hashes[match.canonical_hash]:
+            duplicates.setdefault(text, match)
+    if duplicates:
+        logger.info(f"Found {len(duplicates)} exact string duplicates.")
+
+    # 2. Vector Similarity Match for the rest
+    pending = [(text, emb) for text, emb in zip(texts, embeddings) if text not in duplicates]
+    if not pending:
+        return duplicates
+
+    probe_rows = ", ".join(f"({i}, CAST(:e{i} AS vector))" for i in range(len(pending)))
+    stmt = sql_text(f"""
+        SELECT probe.idx, nearest.id, nearest.distance
+        FROM (VALUES {probe_rows}) AS probe(idx, embedding)
+        CROSS JOIN LATERAL (
+            SELECT qn.id, qn.embedding <=> probe.embedding AS distance
+            FROM questions_normalized qn
+            ORDER BY qn.embedding <=> probe.embedding
+            LIMIT 1
+        ) AS nearest
+        WHERE nearest.distance < :max_distance
+    """).bindparams(
+        *(bindparam(f"e{i}", value=emb, type_=Vector(VECTOR_DIM)) for i, (_, emb) in enumerate(pending)),
+        max_distance=1 - SIMILARITY_THRESHOLD,
+    )
+    nearest = {idx: (match_id, distance) for idx, match_id, distance in (await session.execute(stmt)).all()}
+    if not nearest:
+        return duplicates
+
+    match_ids = {match_id for match_id, _ in nearest.values()}
+    stmt = select(QuestionNormalized).where(QuestionNormalized.id.in_(match_ids))
+    matches = {q.id: q for q in (await session.execute(stmt)).scalars().all()}
+    for idx, (match_id, distance) in nearest.items():
+        if match_id in matches:
+            duplicates[pending[idx][0]] = matches[match_id]
+    logger.info(f"Found {len(nearest)} vector duplicates.")
+
+    return duplicates
+
+def find_in_chunk_duplicates(embeddings: List[List[float]], threshold: float = SIMILARITY_THRESHOLD) -> List[Optional[int]]:
+    """
+    Duplicates within one chunk, from an in-memory cosine similarity matrix.
+
+    Returns, for each embedding, the index of the earlier embedding it duplicates
+    (the most similar one above `threshold`), or None if it is the first of its kind.
+    """
+    if not embeddings:
+        return []
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+    similarity = matrix @ matrix.T
+
+    leaders: List[Optional[int]] = []
+    for i in range(len(embeddings)):
+        if i == 0:
+            leaders.append(None)
+            continue
+        j = int(np.argmax(similarity[i, :i]))
+        leaders.append(j if similarity[i, j] >= threshold else None)
+    return leaders
+
+async def find_lexical_duplicates(
+    session: AsyncSession, texts: List[str], lexical_index: MinHashLSH[UUID]
+) -> Tuple[Dict[str, QuestionNormalized], Dict[str, str]]:
+    """
+    MinHash LSH prefilter, before any embedding call.
+
+    Returns the existing question each text near-verbatim repeats, and for texts
+    repeating an earlier unresolved text of the same chunk, that earlier text.
+    """
+    matched_ids: Dict[str, UUID] = {}
+    aliases: Dict[str, str] = {}
+    chunk_index: MinHashLSH[str] = MinHashLSH(threshold=lexical_index.threshold)
+    for text in texts:
+        match = lexical_index.query(text)
+        if match:
+            matched_ids[text] = match[0]
+            continue
+        chunk_match = chunk_index.query(text)
+        if chunk_match:
+            aliases[text] = chunk_match[0]
+        else:
+            chunk_index.add(text, text)
+
+    duplicates: Dict[str, QuestionNormalized] = {}
+    if matched_ids:
+        stmt = select(QuestionNormalized).where(QuestionNormalized.id.in_(set(matched_ids.values())))
+        matches = {q.id: q for q in (await session.execute(stmt)).scalars().all()}
+        duplicates = {text: matches[qid] for text, qid in matched_ids.items() if qid in matches}
+    if duplicates or aliases:
+        logger.info(f"Lexical prefilter: {len(duplicates)} linked to existing questions, {len(aliases)} repeats within the chunk.")
+    return duplicates, aliases
+
+async def rehash_legacy_questions(session: AsyncSession) -> int:
+    """
+    Recomputes canonical_hash for rows stored before it hashed the canonical form.
+
+    Those rows hashed the stripped text, so the exact-match check could never hit
+    them. Returns how many rows were updated; later runs find nothing to do.
+    """
+    result = await session.execute(
+        select(QuestionNormalized.id, QuestionNormalized.base_form, QuestionNormalized.canonical_hash)
+    )
+    rows = []
+    for qid, base_form, canonical_hash in result.all():
+        new_hash = get_canonical_hash(base_form or "")
+        if new_hash != canonical_hash:
+            rows.append({"id": qid, "canonical_hash": new_hash})
+    if rows:
+        await session.execute(update(QuestionNormalized), rows)
+        logger.info(f"Recomputed canonical hashes of {len(rows)} legacy normalized questions.")
+    return len(rows)
+
+async def build_lexical_index(session: AsyncSession) -> MinHashLSH[UUID]:
+    """Indexes every existing normalized question for the lexical prefilter."""
+    lexical_index: MinHashLSH[UUID] = MinHashLSH(threshold=settings.lexical_dedup_threshold)
+    result = await session.execute(select(QuestionNormalized.id, QuestionNormalized.base_form))
+    for qid, base_form in result.all():
+        lexical_index.add(qid, base_form or "")
+    logger.info(f"Lexical index built over {len(lexical_index)} normalized questions.")
+    return lexical_index
+
+async def normalize_batch(
+    session: AsyncSession,
+    raw_questions: List[QuestionRaw],
+    lexical_index: Optional[MinHashLSH[UUID]] = None,
+) -> int:
+    """
+    Normalizes and deduplicates one chunk of raw questions.
+
+    Near-verbatim repeats are resolved by the lexical index (when given) without
+    embedding. The rest take one embedding call for the chunk, one exact-match and
+    one vector query against the table, and a similarity matrix for duplicates
+    inside the chunk. Returns how many questions were processed; questions whose
+    embedding failed stay pending for the next run.
+    """
+    now = datetime.utcnow()
+    texts_by_question = []
+    for raw_q in raw_questions:
+        normalized_text = normalize_text(raw_q.raw_text)
+        if not normalized_text:
+            logger.warning(f"Empty text for Raw Q {raw_q.id}. Marking as processed.")
+            raw_q.processed = True
+            raw_q.updated_at = now
+            session.add(raw_q)
+            continue
+        texts_by_question.append((raw_q, normalized_text))
+
+    texts = list(dict.fromkeys(text for _, text in texts_by_question))
+    if not texts:
+        return 0
+
+    targets: Dict[str, QuestionNormalized] = {}
+    aliases: Dict[str, str] = {}
+    if lexical_index is not None:
+        targets, aliases = await find_lexical_duplicates(session, texts, lexical_index)
+    unresolved = [text for text in texts if text not in targets and text not in aliases]
+
+    created = 0
+    if unresolved:
+        try:
+            embeddings = await generate_embeddings(unresolved)
+        except Exception as e:
+            # Do NOT mark as processed so we retry on the next run.
+            logger.error(f"Failed to generate embeddings for {len(unresolved)} questions: {e}")
+            return 0
+
+        # Existing duplicates in the table, then duplicates among the new texts
+        targets.update(await find_duplicates_batch(session, unresolved, embeddings))
+        new_items = [(text, emb) for text, emb in zip(unresolved, embeddings) if text not in targets]
+        leaders = find_in_chunk_duplicates([emb for _, emb in new_items])
+
+        for (text, embedding), leader in zip(new_items, leaders):
+            if leader is not None:
+                # The leader comes earlier in the chunk, so it already has a target
+                targets[text] = targets[new_items[leader][0]]
+                continue
+            new_q = QuestionNormalized(
+                id=uuid4(),
+                base_form=text,
+                marks=None,
+                embedding=embedding,
+                original_ids=[],
+                canonical_hash=get_canonical_hash(text),
+                created_at=now,
+                updated_at=now
+            )
+            targets[text] = new_q
+            session.add(new_q)
+            if lexical_index is not None:
+                lexical_index.add(new_q.id, text)
+            created += 1
+
+    for text, leader in aliases.items():
+        targets[text] = targets[leader]
+
+    for raw_q, text in texts_by_question:
+        target = targets[text]
+        if target.marks is None:
+            target.marks = raw_q.marks
+        if target.difficulty is None and raw_q.difficulty is not None:
+            # Tags from a fused extraction call; the standalone tagger skips tagged rows
+            target.difficulty = raw_q.difficulty
+            target.taxonomy = list(raw_q.taxonomy or [])
+            target.updated_at = now
+            session.add(target)
+        if str(raw_q.id) not in target.original_ids:
+            # Reassign so the ARRAY column is flagged as changed
+            target.original_ids = list(target.original_ids) + [str(raw_q.id)]
+            target.updated_at = now
+            session.add(target)
+
+        # Mark Raw Question as Processed
+        raw_q.processed = True
+        raw_q.updated_at = now
+        session.add(raw_q)
+
+    logger.info(
+        f"Normalized {len(texts_by_question)} questions: {created} new, "
+        f"{len(texts_by_question) - created} linked to duplicates "
+        f"({len(texts) - len(unresolved)} distinct texts resolved without embedding)."
+    )
+    return len(texts_by_question)
+
 async def process_questions():
     """
-    Main loop to process pending raw questions.
+    Main loop to process pending raw questions, `settings.normalization_batch_size` at a time.
     """
     logger.info("Starting Question Preprocessing...")
     
@@ -85,65 +335,22 @@ async def process_questions():
             
             logger.info(f"Found {len(raw_questions)} pending raw questions.")
             
+            if raw_questions and await rehash_legacy_questions(session):
+                await session.commit()
+            
+            lexical_index = None
+            if raw_questions and settings.lexical_dedup_enabled:
+                lexical_index = await build_lexical_index(session)
+            
+            batch_size = max(1, settings.normalization_batch_size)
             processed_count = 0
             
-            for raw_q in raw_questions:
-                normalized_text = normalize_text(raw_q.raw_text)
-                if not normalized_text:
-                    # Mark as processed even if empty to avoid stuck loop? 
-                    # Or maybe just skip. Let's mark as processed but warn.
-                    logger.warning(f"Empty text for Raw Q {raw_q.id}. Marking as processed.")
-                    raw_q.processed = True
-                    raw_q.updated_at = datetime.utcnow()
-                    session.add(raw_q)
-                    continue
-                
-                # Generate Embedding
-                try:
-                    embedding = await generate_embedding(normalized_text)
-                except Exception as e:
-                    logger.error(f"Failed to generate embedding for Q {raw_q.id}: {e}")
-                    # Do NOT mark as processed so we retry later? 
-                    # Or mark as failed? For now, skip and retry next run.
-                    continue
-                
-                # Deduplicate
-                duplicate = await find_duplicate(session, normalized_text, embedding)
-                
-                if duplicate:
-                    # Link this raw question to the existing normalized question
-                    if str(raw_q.id) not in duplicate.original_ids:
-                        duplicate.original_ids.append(str(raw_q.id))
-                        duplicate.updated_at = datetime.utcnow()
-                        session.add(duplicate)
-                        logger.info(f"Linked Raw Q {raw_q.id} to Existing Normalized Q {duplicate.id}")
-                else:
-                    # Create New Normalized Question
-                    new_q = QuestionNormalized(
-                        id=uuid4(),
-                        base_form=normalized_text,
-                        marks=raw_q.marks,
-                        embedding=embedding,
-                        original_ids=[str(raw_q.id)],
-                        canonical_hash=get_canonical_hash(normalized_text),
-                        created_at=datetime.utcnow(),
-                        updated_at=datetime.utcnow()
-                    )
-                    session.add(new_q)
-                    logger.info(f"Created New Normalized Q {new_q.id}")
-                
-                # Mark Raw Question as Processed
-                raw_q.processed = True
-                raw_q.updated_at = datetime.utcnow()
-                session.add(raw_q)
-                
-                processed_count += 1
-                
-                # Commit every 10 questions to save progress
-                if processed_count % 10 == 0:
-                    await session.commit()
+            for start in range(0, len(raw_questions), batch_size):
+                chunk = raw_questions[start:start + batch_size]
+                processed_count += await normalize_batch(session, chunk, lexical_index)
+                # Commit every chunk so the next one sees its questions
+                await session.commit()
             
-            await session.commit()
             logger.info(f"Preprocessing complete. Processed {processed_count} questions.")
             
         except Exception as e:
@@ -151,4 +358,3 @@ async def process_questions():
             await session.rollback()
             raise
         break
-
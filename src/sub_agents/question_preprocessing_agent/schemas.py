@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+# --- Pydantic Models for Structured Output ---
+
+class ClusterStem(BaseModel):
+    """Canonical stem for one cluster of similar questions."""
+    cluster_id: str = Field(description="The ID of the cluster, exactly as given in the input.")
+    canonical_stem: str = Field(description="Concise, neutral concept stem unifying the cluster's questions.")
+
+class CanonicalStemBatchResponse(BaseModel):
+    """Response containing canonical stems for a batch of clusters."""
+    stems: List[ClusterStem]
@@ -1,22 +1,37 @@
 import asyncio
-from typing import List, Optional
-from uuid import uuid4
+import hashlib
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
 from datetime import datetime
-from sqlalchemy import select, func
+import numpy as np
+from sqlalchemy import bindparam, delete, insert, select, func, update, text as sql_text
 from sqlalchemy.ext.asyncio import AsyncSession
 from pgvector.sqlalchemy import Vector
 
 from utils.db import get_session
 from utils.logger import get_logger
-from utils.llm import get_default_llm
-from src.data_models.models import QuestionNormalized, VariantGroup
+from utils.llm import get_default_llm, call_llm_with_structured_output, EMBEDDING_MODEL
+from src.data_models.models import (
+    QuestionNormalized, VariantGroup, CompositeQuestion, ClusteringTree, QuestionTopicMap, VECTOR_DIM
+)
 from utils.settings import settings
-from src.sub_agents.question_preprocessing_agent.prompts import CONCEPT_STEM_PROMPT
+from src.sub_agents.question_preprocessing_agent.prompts import CONCEPT_STEM_PROMPT, CONCEPT_STEMS_BATCH_PROMPT
+from src.sub_agents.question_preprocessing_agent.schemas import CanonicalStemBatchResponse
+from src.sub_agents.question_preprocessing_agent.clustering import (
+    similarity_components, normalize_rows, single_linkage_tree, cut_tree, group_counts
+)
 
 logger = get_logger()
 
 # Threshold for grouping (lower than deduplication)
 GROUPING_THRESHOLD = settings.variant_grouping_threshold
+# Centroids fetched per new question (more than one lets a question bridge groups)
+CENTROID_CANDIDATES = 3
+# New questions per nearest-centroid query
+CENTROID_QUERY_BATCH_SIZE = 500
 
 async def generate_canonical_stem(questions: List[str]) -> str:
     """
@@ -43,106 +58,521 @@ async def generate_canonical_stem(questions: List[str]) -> str:
         # Fallback to the first question
         return questions[0]
 
+async def generate_canonical_stems(clusters: List[List[str]]) -> List[str]:
+    """
+    Canonical stems for many clusters, one per cluster in input order.
+
+    Singletons skip the LLM. The rest are packed settings.stem_clusters_per_call
+    to a structured-output call, at most settings.stem_max_concurrency calls at a
+    time; clusters a packed call leaves out fall back to generate_canonical_stem.
+    """
+    stems: List[Optional[str]] = [cluster[0] if len(cluster) == 1 else None for cluster in clusters]
+    pending = [i for i, stem in enumerate(stems) if stem is None]
+    if not pending:
+        return stems
+
+    semaphore = asyncio.Semaphore(max(1, settings.stem_max_concurrency))
+    per_call = max(1, settings.stem_clusters_per_call)
+    llm = get_default_llm()
+
+    async def stem_single(i: int):
+        async with semaphore:
+            stems[i] = await generate_canonical_stem(clusters[i])
+
+    async def stem_packed(indices: List[int]):
+        clusters_str = "\n\n".join(
+            f"Cluster ID: {i}\n" + "\n".join(f"- {q}" for q in clusters[i]) for i in indices
+        )
+        async with semaphore:
+            response = await call_llm_with_structured_output(
+                llm=llm,
+                output_class=CanonicalStemBatchResponse,
+                messages=CONCEPT_STEMS_BATCH_PROMPT.format_messages(clusters=clusters_str),
+                context_desc=f"Canonical Stems ({len(indices)} clusters)"
+            )
+        wanted = {str(i): i for i in indices}
+        for item in (response.stems if response else []):
+            i = wanted.get(item.cluster_id.strip())
+            if i is not None and item.canonical_stem.strip():
+                stems[i] = item.canonical_stem.strip()
+
+    if per_call == 1:
+        await asyncio.gather(*(stem_single(i) for i in pending))
+    else:
+        await asyncio.gather(*(stem_packed(pending[k:k + per_call]) for k in range(0, len(pending), per_call)))
+        missing = [i for i in pending if stems[i] is None]
+        if missing:
+            logger.warning(f"{len(missing)} clusters missing from packed stem responses; generating individually.")
+            await asyncio.gather(*(stem_single(i) for i in missing))
+
+    return stems
+
+@dataclass
+class GroupState:
+    """Centroid and member count of an existing group, as seen by the planner."""
+    centroid: np.ndarray
+    member_count: int
+
+@dataclass
+class GroupingPlan:
+    new_clusters: List[List[int]] = field(default_factory=list) # Question indices per new group
+    joins: Dict[UUID, List[int]] = field(default_factory=dict) # Existing group -> question indices joining it
+    merges: Dict[UUID, UUID] = field(default_factory=dict) # Absorbed group -> surviving group
+    groups: Dict[UUID, GroupState] = field(default_factory=dict) # Final state of every group that changed
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+    denominator = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(np.dot(a, b)) / denominator if denominator else 0.0
+
+def plan_incremental(
+    embeddings: np.ndarray,
+    components: List[List[int]],
+    matches: List[List[UUID]],
+    groups: Dict[UUID, GroupState],
+    threshold: float,
+) -> GroupingPlan:
+    """
+    Decides what happens to each component of new (ungrouped) questions.
+
+    `matches[i]` lists the groups whose centroid is within `threshold` of question i.
+    - No match in the component: it becomes a new group.
+    - One matched group: the whole component joins it.
+    - Several matched groups (the component bridges them): groups whose centroid
+      is within `threshold` of the largest one's are merged into it; the rest stay
+      apart (split) and each question joins the nearest remaining centroid.
+    Centroids and member counts are updated incrementally.
+    """
+    state = {gid: GroupState(np.asarray(g.centroid, dtype=np.float32), g.member_count) for gid, g in groups.items()}
+    plan = GroupingPlan()
+    touched = set()
+
+    def resolve(gid: UUID) -> UUID:
+        while gid in plan.merges:
+            gid = plan.merges[gid]
+        return gid
+
+    for component in components:
+        candidates = sorted(
+            {resolve(gid) for i in component for gid in matches[i]},
+            key=lambda gid: (-state[gid].member_count, str(gid)),
+        )
+        if not candidates:
+            plan.new_clusters.append(component)
+            continue
+
+        survivor = candidates[0]
+        kept = [survivor]
+        for gid in candidates[1:]:
+            s, g = state[survivor], state[gid]
+            if _cosine(s.centroid, g.centroid) < threshold:
+                kept.append(gid)
+                continue
+            # Merge: the bridged groups are one concept
+            count = s.member_count + g.member_count
+            s.centroid = (s.centroid * s.member_count + g.centroid * g.member_count) / max(count, 1)
+            s.member_count = count
+            plan.merges[gid] = survivor
+            plan.joins.setdefault(survivor, []).extend(plan.joins.pop(gid, []))
+            touched.discard(gid)
+            touched.add(survivor)
+
+        for i in component:
+            target = kept[0] if len(kept) == 1 else max(kept, key=lambda gid: _cosine(embeddings[i], state[gid].centroid))
+            plan.joins.setdefault(target, []).append(i)
+            touched.add(target)
+
+    for gid, members in plan.joins.items():
+        g = state[gid]
+        count = g.member_count + len(members)
+        g.centroid = (g.centroid * g.member_count + embeddings[members].sum(axis=0)) / count
+        g.member_count = count
+    plan.groups = {gid: state[gid] for gid in touched}
+    return plan
+
+async def backfill_centroids(session: AsyncSession):
+    """
+    Computes centroid and member_count for groups created before they were tracked.
+    The centroid is the mean of the L2-normalized member embeddings, as everywhere else.
+    """
+    stmt = select(QuestionNormalized.variant_group_id, QuestionNormalized.embedding).join(
+        VariantGroup, QuestionNormalized.variant_group_id == VariantGroup.id
+    ).where(VariantGroup.centroid == None)
+    members: Dict[UUID, List[Any]] = {}
+    for gid, embedding in (await session.execute(stmt)).all():
+        members.setdefault(gid, []).append(embedding)
+    if not members:
+        return
+
+    rows = []
+    for gid, embeddings in members.items():
+        vectors = [e for e in embeddings if e is not None]
+        rows.append({
+            "id": gid,
+            "centroid": normalize_rows(vectors).mean(axis=0).tolist() if vectors else None,
+            "member_count": len(embeddings),
+        })
+    await session.execute(update(VariantGroup), rows)
+    logger.info(f"Backfilled centroids of {len(rows)} variant groups.")
+
+async def nearest_centroids(
+    session: AsyncSession, embeddings: List[Any], limit: int = CENTROID_CANDIDATES
+) -> List[List[UUID]]:
+    """
+    Groups whose centroid is within GROUPING_THRESHOLD of each embedding, nearest first.
+    One round-trip: a lateral top-k over the HNSW-indexed centroids per VALUES row.
+    """
+    matches: List[List[UUID]] = [[] for _ in embeddings]
+    if not embeddings:
+        return matches
+    probe_rows = ", ".join(f"({i}, CAST(:e{i} AS vector))" for i in range(len(embeddings)))
+    stmt = sql_text(f"""
+        SELECT probe.idx, nearest.id
+        FROM (VALUES {probe_rows}) AS probe(idx, embedding)
+        CROSS JOIN LATERAL (
+            SELECT vg.id, vg.centroid <=> probe.embedding AS distance
+            FROM variant_groups vg
+            WHERE vg.centroid IS NOT NULL
+            ORDER BY vg.centroid <=> probe.embedding
+            LIMIT :limit
+        ) AS nearest
+        WHERE nearest.distance < :max_distance
+        ORDER BY probe.idx, nearest.distance
+    """).bindparams(
+        *(bindparam(f"e{i}", value=emb, type_=Vector(VECTOR_DIM)) for i, emb in enumerate(embeddings)),
+        limit=limit,
+        max_distance=1 - GROUPING_THRESHOLD,
+    )
+    for idx, group_id in (await session.execute(stmt)).all():
+        matches[idx].append(group_id)
+    return matches
+
+async def cluster_ungrouped() -> Tuple[List[List[Any]], Dict[UUID, List[Any]], Dict[UUID, UUID], Dict[UUID, GroupState]]:
+    """
+    Phase 1: assigns ungrouped questions incrementally.
+
+    Only the ungrouped questions are loaded. They are clustered among themselves
+    in memory, and each one is matched against the stored group centroids
+    (vector-indexed), so existing questions are never rescanned.
+
+    Returns the clusters that need a new group (rows with id, base_form and
+    embedding), the rows joining each existing group, the group merges, and the
+    updated state of every changed group.
+    """
+    async for session in get_session():
+        try:
+            await backfill_centroids(session)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+        stmt = select(
+            QuestionNormalized.id,
+            QuestionNormalized.base_form,
+            QuestionNormalized.embedding,
+        ).where(QuestionNormalized.variant_group_id == None)
+        rows = (await session.execute(stmt)).all()
+        logger.info(f"Found {len(rows)} ungrouped questions.")
+
+        # Questions without an embedding can only form a group of their own
+        embedded = [r for r in rows if r.embedding is not None]
+        unembedded = [r for r in rows if r.embedding is None]
+
+        matches: List[List[UUID]] = []
+        for start in range(0, len(embedded), CENTROID_QUERY_BATCH_SIZE):
+            chunk = embedded[start:start + CENTROID_QUERY_BATCH_SIZE]
+            matches.extend(await nearest_centroids(session, [r.embedding for r in chunk]))
+
+        groups: Dict[UUID, GroupState] = {}
+        matched_ids = {gid for m in matches for gid in m}
+        if matched_ids:
+            stmt = select(VariantGroup.id, VariantGroup.centroid, VariantGroup.member_count).where(
+                VariantGroup.id.in_(matched_ids)
+            )
+            for gid, centroid, member_count in (await session.execute(stmt)).all():
+                groups[gid] = GroupState(np.asarray(centroid, dtype=np.float32), member_count or 0)
+        break
+
+    started = time.perf_counter()
+    embeddings = normalize_rows([r.embedding for r in embedded]) if embedded else np.zeros((0, VECTOR_DIM), dtype=np.float32)
+    components = similarity_components(embeddings, GROUPING_THRESHOLD)
+    plan = plan_incremental(embeddings, components, [[g for g in m if g in groups] for m in matches], groups, GROUPING_THRESHOLD)
+    logger.info(
+        f"Planned {len(embedded)} questions in {time.perf_counter() - started:.2f}s: "
+        f"{len(plan.new_clusters)} new groups, {len(plan.joins)} groups joined, {len(plan.merges)} merged."
+    )
+
+    clusters = [[embedded[i] for i in sorted(cluster, key=lambda i: str(embedded[i].id))] for cluster in plan.new_clusters]
+    clusters.extend([r] for r in unembedded)
+    joins = {gid: [embedded[i] for i in members] for gid, members in plan.joins.items()}
+    return clusters, joins, plan.merges, plan.groups
+
+async def persist_groups(
+    clusters: List[List[Any]],
+    stems: List[str],
+    joins: Dict[UUID, List[Any]],
+    merges: Dict[UUID, UUID],
+    group_states: Dict[UUID, GroupState],
+):
+    """Phase 3: writes new groups, merges, centroids and memberships in bulk, in one transaction."""
+    now = datetime.utcnow()
+    group_rows = []
+    membership_rows = []
+    for cluster, canonical_stem in zip(clusters, stems):
+        group_id = uuid4()
+        vectors = [r.embedding for r in cluster if r.embedding is not None]
+        group_rows.append({
+            "id": group_id,
+            "canonical_stem": canonical_stem,
+            "slot_count": 0, # To be updated later
+            "recurrence_count": len(cluster), # Initial count
+            "centroid": normalize_rows(vectors).mean(axis=0).tolist() if vectors else None,
+            "member_count": len(cluster),
+            "created_at": now,
+        })
+        membership_rows.extend({"id": r.id, "variant_group_id": group_id, "topics_indexed_at": None, "updated_at": now} for r in cluster)
+    for group_id, members in joins.items():
+        membership_rows.extend({"id": r.id, "variant_group_id": group_id, "topics_indexed_at": None, "updated_at": now} for r in members)
+
+    async for session in get_session():
+        try:
+            group_update_rows = []
+            if group_states:
+                counted = set(group_states) | set(merges)
+                stmt = select(VariantGroup.id, VariantGroup.recurrence_count).where(VariantGroup.id.in_(counted))
+                recurrence = {gid: count or 0 for gid, count in (await session.execute(stmt)).all()}
+                absorbed: Dict[UUID, int] = Counter()
+                for gid, survivor in merges.items():
+                    while survivor in merges:
+                        survivor = merges[survivor]
+                    absorbed[survivor] += recurrence.get(gid, 0)
+                group_update_rows = [
+                    {
+                        "id": gid,
+                        "centroid": state.centroid.tolist(),
+                        "member_count": state.member_count,
+                        "recurrence_count": recurrence.get(gid, 0) + absorbed[gid] + len(joins.get(gid, [])),
+                    }
+                    for gid, state in group_states.items()
+                ]
+
+            # Questions changing group lose their relevance index rows (the "group" row
+            # names the old group's topic) and are queued for the next mapping run
+            if merges:
+                await session.execute(delete(QuestionTopicMap).where(QuestionTopicMap.question_id.in_(
+                    select(QuestionNormalized.id).where(QuestionNormalized.variant_group_id.in_(list(merges)))
+                )))
+            if membership_rows:
+                await session.execute(delete(QuestionTopicMap).where(
+                    QuestionTopicMap.question_id.in_([row["id"] for row in membership_rows])
+                ))
+            if group_rows:
+                await session.execute(insert(VariantGroup), group_rows)
+            if group_update_rows:
+                await session.execute(update(VariantGroup), group_update_rows)
+            # Merges: move members and references to the survivor, then drop the absorbed group
+            for gid, survivor in merges.items():
+                while survivor in merges:
+                    survivor = merges[survivor]
+                await session.execute(
+                    update(QuestionNormalized).where(QuestionNormalized.variant_group_id == gid)
+                    .values(variant_group_id=survivor, topics_indexed_at=None, updated_at=now)
+                )
+                await session.execute(
+                    update(CompositeQuestion).where(CompositeQuestion.source_variant_group_id == gid)
+                    .values(source_variant_group_id=survivor)
+                )
+                logger.info(f"Merged Group {gid} into {survivor}")
+            if membership_rows:
+                await session.execute(update(QuestionNormalized), membership_rows)
+            if merges:
+                await session.execute(delete(VariantGroup).where(VariantGroup.id.in_(list(merges))))
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        break
+
 async def process_grouping():
     """
     Main loop to group normalized questions into VariantGroups.
+
+    1. Match new questions to group centroids and cluster the rest in memory
+       (short read, no transaction held afterwards)
+    2. Generate canonical stems for the new groups concurrently
+    3. Write groups and memberships in bulk
     """
     logger.info("Starting Variant Grouping...")
     
+    try:
+        clusters, joins, merges, group_states = await cluster_ungrouped()
+        
+        started = time.perf_counter()
+        stems = await generate_canonical_stems([[r.base_form for r in cluster] for cluster in clusters])
+        logger.info(f"Generated {len(stems)} canonical stems in {time.perf_counter() - started:.2f}s.")
+        
+        await persist_groups(clusters, stems, joins, merges, group_states)
+        
+        logger.info(
+            f"Grouping complete. Created {len(clusters)} groups, Updated {len(joins)} groups "
+            f"({sum(len(m) for m in joins.values())} questions joined), Merged {len(merges)} groups."
+        )
+    except Exception as e:
+        logger.error(f"Error in grouping: {e}")
+        raise
+
+# --- Threshold changes: cached single-linkage tree ---
+
+def _tree_fingerprint(question_ids: List[UUID], min_similarity: float) -> str:
+    key = "|".join(["single", f"{min_similarity:.4f}", EMBEDDING_MODEL, *sorted(str(qid) for qid in question_ids)])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+async def load_or_build_tree(session: AsyncSession) -> Tuple[List[UUID], List[Tuple[int, int, float]], float]:
+    """
+    The single-linkage merge tree over every embedded question, built once per
+    question set and stored in clustering_trees.
+
+    Returns the leaf question ids, the merges (strongest first) and the tree's floor.
+    """
+    min_similarity = settings.grouping_tree_min_similarity
+    stmt = select(QuestionNormalized.id, QuestionNormalized.embedding).where(
+        QuestionNormalized.embedding != None
+    ).order_by(QuestionNormalized.id)
+    rows = (await session.execute(stmt)).all()
+    question_ids = [r.id for r in rows]
+    fingerprint = _tree_fingerprint(question_ids, min_similarity)
+
+    stmt = select(ClusteringTree).where(ClusteringTree.fingerprint == fingerprint)
+    tree = (await session.execute(stmt)).scalar_one_or_none()
+    if tree:
+        logger.info(f"Using cached clustering tree over {len(tree.question_ids)} questions.")
+        merges = [(int(i), int(j), float(sim)) for i, j, sim in tree.merges_json]
+        return [UUID(qid) for qid in tree.question_ids], merges, tree.min_similarity
+
+    started = time.perf_counter()
+    merges = single_linkage_tree([r.embedding for r in rows], min_similarity)
+    logger.info(f"Built clustering tree over {len(rows)} questions in {time.perf_counter() - started:.2f}s.")
+
+    # Only the tree for the current question set is worth keeping
+    await session.execute(delete(ClusteringTree))
+    session.add(ClusteringTree(
+        fingerprint=fingerprint,
+        min_similarity=min_similarity,
+        question_ids=[str(qid) for qid in question_ids],
+        merges_json=[[i, j, sim] for i, j, sim in merges],
+    ))
+    await session.commit()
+    return question_ids, merges, min_similarity
+
+async def threshold_sweep(thresholds: Optional[List[float]] = None) -> Dict[float, int]:
+    """Group counts per threshold (default 0.80-0.95), from cuts of the cached tree."""
+    thresholds = thresholds or [round(0.80 + 0.01 * k, 2) for k in range(16)]
+    async for session in get_session():
+        question_ids, merges, min_similarity = await load_or_build_tree(session)
+        break
+    below_floor = [t for t in thresholds if t < min_similarity]
+    if below_floor:
+        raise ValueError(f"Thresholds {below_floor} are below the tree floor {min_similarity} (GROUPING_TREE_MIN_SIMILARITY)")
+    counts = group_counts(len(question_ids), merges, thresholds)
+    for t, count in counts.items():
+        logger.info(f"Threshold {t:.2f}: {count} groups")
+    return counts
+
+async def regroup_at_threshold(threshold: float):
+    """
+    Regroups every question at a new threshold by cutting the cached tree.
+
+    Groups whose membership is unchanged are kept as they are, stem included;
+    only groups with new membership need a canonical stem from the LLM.
+    Questions without an embedding are not in the tree: when their group is
+    dissolved they form a new group together.
+    """
+    logger.info(f"Regrouping variants at threshold {threshold:.2f}...")
+
+    async for session in get_session():
+        question_ids, merges, min_similarity = await load_or_build_tree(session)
+        if threshold < min_similarity:
+            raise ValueError(f"Threshold {threshold} is below the tree floor {min_similarity} (GROUPING_TREE_MIN_SIMILARITY)")
+
+        stmt = select(
+            QuestionNormalized.id,
+            QuestionNormalized.variant_group_id,
+            QuestionNormalized.base_form,
+            QuestionNormalized.embedding,
+        )
+        rows = {r.id: r for r in (await session.execute(stmt)).all()}
+        break
+
+    current: Dict[UUID, set] = {}
+    for qid in question_ids:
+        gid = rows[qid].variant_group_id
+        if gid is not None:
+            current.setdefault(gid, set()).add(qid)
+    by_members = {frozenset(members): gid for gid, members in current.items()}
+
+    clusters: List[List[Any]] = []
+    kept = set()
+    for component in cut_tree(len(question_ids), merges, threshold):
+        members = frozenset(question_ids[i] for i in component)
+        gid = by_members.get(members)
+        if gid is not None:
+            kept.add(gid)
+        else:
+            clusters.append(sorted((rows[qid] for qid in members), key=lambda r: str(r.id)))
+    # Questions without an embedding (never in the tree) follow their group: kept
+    # with it, or regrouped together when its embedded members are regrouped
+    embedded = set(question_ids)
+    unembedded: Dict[UUID, List[Any]] = {}
+    for r in rows.values():
+        if r.id not in embedded and r.variant_group_id:
+            unembedded.setdefault(r.variant_group_id, []).append(r)
+    for gid, members in unembedded.items():
+        if gid not in current:
+            kept.add(gid) # No embedded member, so nothing about it changed
+        elif gid not in kept:
+            clusters.append(sorted(members, key=lambda r: str(r.id)))
+    obsolete = [gid for gid in current if gid not in kept]
+    logger.info(f"{len(kept)} groups unchanged, {len(clusters)} new groups, {len(obsolete)} groups dissolved.")
+
+    stems = await generate_canonical_stems([[r.base_form for r in cluster] for cluster in clusters])
+
+    now = datetime.utcnow()
+    group_rows = []
+    membership_rows = []
+    for cluster, canonical_stem in zip(clusters, stems):
+        group_id = uuid4()
+        vectors = [r.embedding for r in cluster if r.embedding is not None]
+        group_rows.append({
+            "id": group_id,
+            "canonical_stem": canonical_stem,
+            "slot_count": 0,
+            "recurrence_count": len(cluster),
+            "centroid": normalize_rows(vectors).mean(axis=0).tolist() if vectors else None,
+            "member_count": len(cluster),
+            "created_at": now,
+        })
+        membership_rows.extend({"id": r.id, "variant_group_id": group_id, "topics_indexed_at": None, "updated_at": now} for r in cluster)
+
     async for session in get_session():
         try:
-            # 1. Fetch Ungrouped Questions
-            stmt = select(QuestionNormalized).where(QuestionNormalized.variant_group_id == None)
-            result = await session.execute(stmt)
-            ungrouped_questions = result.scalars().all()
-            
-            logger.info(f"Found {len(ungrouped_questions)} ungrouped questions.")
-            
-            processed_ids = set()
-            groups_created = 0
-            groups_updated = 0
-            
-            for seed_q in ungrouped_questions:
-                if seed_q.id in processed_ids:
-                    continue
-                
-                processed_ids.add(seed_q.id)
-                
-                # 2. Find Neighbors (ALL questions, grouped or ungrouped)
-                distance_threshold = 1 - GROUPING_THRESHOLD
-                
-                stmt = select(QuestionNormalized).where(
-                    QuestionNormalized.id != seed_q.id,
-                    QuestionNormalized.embedding.cosine_distance(seed_q.embedding) < distance_threshold
+            if group_rows:
+                await session.execute(insert(VariantGroup), group_rows)
+            if membership_rows:
+                await session.execute(update(QuestionNormalized), membership_rows)
+                # Regrouped questions are queued for the next mapping run
+                await session.execute(delete(QuestionTopicMap).where(
+                    QuestionTopicMap.question_id.in_([row["id"] for row in membership_rows])
+                ))
+            if obsolete:
+                await session.execute(
+                    update(CompositeQuestion).where(CompositeQuestion.source_variant_group_id.in_(obsolete))
+                    .values(source_variant_group_id=None)
                 )
-                
-                result = await session.execute(stmt)
-                neighbors = result.scalars().all()
-                
-                # Check if any neighbor is already in a group
-                existing_group_id = None
-                for neighbor in neighbors:
-                    if neighbor.variant_group_id:
-                        existing_group_id = neighbor.variant_group_id
-                        break
-                
-                if existing_group_id:
-                    # JOIN EXISTING GROUP
-                    seed_q.variant_group_id = existing_group_id
-                    seed_q.updated_at = datetime.utcnow()
-                    session.add(seed_q)
-                    
-                    # Update group stats
-                    group = await session.get(VariantGroup, existing_group_id)
-                    if group:
-                        group.recurrence_count += 1
-                        session.add(group)
-                    
-                    groups_updated += 1
-                    logger.info(f"Joined Q {seed_q.id} to Existing Group {existing_group_id}")
-                    
-                else:
-                    # CREATE NEW GROUP
-                    cluster_questions = [seed_q]
-                    
-                    # Collect ungrouped neighbors for this new group
-                    for neighbor in neighbors:
-                        if neighbor.variant_group_id is None and neighbor.id not in processed_ids:
-                            cluster_questions.append(neighbor)
-                            processed_ids.add(neighbor.id)
-                    
-                    # Generate Canonical Stem
-                    question_texts = [q.base_form for q in cluster_questions]
-                    canonical_stem = await generate_canonical_stem(question_texts)
-                    
-                    new_group = VariantGroup(
-                        id=uuid4(),
-                        canonical_stem=canonical_stem,
-                    slot_count=0, # To be updated later
-                    recurrence_count=len(cluster_questions), # Initial count
-                        created_at=datetime.utcnow()
-                    )
-                    session.add(new_group)
-                    await session.flush()
-                    
-                    # Link questions to group
-                    for q in cluster_questions:
-                        q.variant_group_id = new_group.id
-                        q.updated_at = datetime.utcnow()
-                        session.add(q)
-                    
-                    groups_created += 1
-                    logger.info(f"Created Group {new_group.id} with {len(cluster_questions)} variants. Stem: {canonical_stem}")
-                
-                # Commit every 5 operations
-                if (groups_created + groups_updated) % 5 == 0:
-                    await session.commit()
-            
+                await session.execute(delete(VariantGroup).where(VariantGroup.id.in_(obsolete)))
             await session.commit()
-            logger.info(f"Grouping complete. Created {groups_created} groups, Updated {groups_updated} groups.")
-            
-        except Exception as e:
-            logger.error(f"Error in grouping: {e}")
+        except Exception:
             await session.rollback()
             raise
         break
+
+    logger.info(f"Regrouping complete at threshold {threshold:.2f}. Set VARIANT_GROUPING_THRESHOLD={threshold} to keep it.")
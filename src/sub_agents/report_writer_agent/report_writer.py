@@ -11,6 +11,7 @@ from src.data_models.models import (
     VariantGroup,
     QuestionNormalized,
     SyllabusNode,
+    QuestionTopicMap,
     TrendSnapshot,
     PredictionCandidate,
     SamplePaper,
@@ -47,6 +48,13 @@ async def generate_comprehensive_report(snapshot_id: UUID, output_dir: str = "."
         ).where(PredictionCandidate.trend_snapshot_id == snapshot_id)
         candidates = (await session.execute(stmt_cand)).scalars().all()
         
+        # Relevance index coverage
+        stmt_index = select(
+            func.count(func.distinct(QuestionTopicMap.question_id)),
+            func.count(func.distinct(QuestionTopicMap.topic_id)),
+        )
+        indexed_questions, indexed_topics = (await session.execute(stmt_index)).one()
+        
         stmt_paper = select(SamplePaper).options(
             selectinload(SamplePaper.items)
         ).order_by(SamplePaper.generation_timestamp.desc()).limit(1)
@@ -68,6 +76,7 @@ async def generate_comprehensive_report(snapshot_id: UUID, output_dir: str = "."
         md.append(f"- **Total Raw Questions Processed:** {len(raw_questions)}")
         md.append(f"- **Unique Concept Groups (Variants):** {len(variant_groups)}")
         md.append(f"- **Compression Ratio:** {len(raw_questions) / len(variant_groups):.2f}:1")
+        md.append(f"- **Questions Mapped to Syllabus:** {indexed_questions} (covering {indexed_topics} topics)")
         md.append(f"- **Total Candidates Generated:** {len(candidates)}")
         md.append(f"- **Final Questions Selected:** {len([c for c in candidates if c.status == CandidateStatus.selected])}")
         md.append(f"- **Final Paper Marks:** {paper.total_marks if paper else 0}")
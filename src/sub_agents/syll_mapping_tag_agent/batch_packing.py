@@ -0,0 +1,36 @@
+"""
+Token-budget packing of questions into LLM batches.
+
+Instead of a fixed number of questions per prompt, each batch is filled until
+its question block reaches the token budget, so short questions share a call
+and long ones do not overflow it.
+"""
+from typing import List, Tuple, TypeVar
+
+from utils.token_estimation import count_tokens
+
+K = TypeVar("K")
+
+def format_question(question_id: str, text: str) -> str:
+    """How a question appears in a tagging prompt."""
+    return f"ID: {question_id}\nText: {text}"
+
+def pack_by_token_budget(items: List[Tuple[K, str]], token_budget: int, max_items: int = 0) -> List[List[Tuple[K, str]]]:
+    """
+    Packs (key, prompt text) items, in order, into batches of at most `token_budget`
+    tokens and, if `max_items` > 0, at most `max_items` items.
+    An item larger than the budget gets a batch of its own.
+    """
+    batches: List[List[Tuple[K, str]]] = []
+    current: List[Tuple[K, str]] = []
+    current_tokens = 0
+    for key, text in items:
+        tokens = count_tokens(text)
+        if current and (current_tokens + tokens > token_budget or (max_items > 0 and len(current) >= max_items)):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append((key, text))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
@@ -1,165 +1,294 @@
 import asyncio
+import time
+from datetime import datetime
 import numpy as np
-from typing import List, Optional
-from sqlalchemy import select
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+from sqlalchemy import and_, delete, insert, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from utils.db import get_session
 from utils.logger import get_logger
-from utils.llm import generate_embedding
-from src.data_models.models import SyllabusNode, VariantGroup
+from utils.llm import generate_embeddings
+from utils.settings import settings
+from src.data_models.models import SyllabusNode, VariantGroup, QuestionNormalized, QuestionTopicMap
+from src.sub_agents.syll_mapping_tag_agent.topic_scoring import (
+    normalize_rows, top_k_topics, coarse_to_fine_top_k, pruned_best_rate, assign_tiers
+)
 
 logger = get_logger()
 
 # Threshold tiers for mapping questions to syllabus topics (High to Low)
 MAPPING_THRESHOLDS = [0.75, 0.65, 0.60, 0.50, 0.40, 0.30]
 
-async def enrich_syllabus_nodes():
+def embedding_semaphore() -> asyncio.Semaphore:
+    """Limits embedding batches in flight to settings.embedding_max_concurrency."""
+    return asyncio.Semaphore(max(1, settings.embedding_max_concurrency))
+
+async def _enrich_embeddings(
+    label: str, model: Any, rows: List[Tuple[UUID, str]], semaphore: Optional[asyncio.Semaphore] = None
+) -> int:
+    """
+    Embeds (id, text) rows settings.embedding_batch_size at a time, with at most
+    settings.embedding_max_concurrency batches in flight; each batch is persisted
+    with one bulk UPDATE as soon as it is embedded. Passes running concurrently
+    share one `semaphore` so the limit holds across them.
+    """
+    batch_size = max(1, settings.embedding_batch_size)
+    batches = [rows[start:start + batch_size] for start in range(0, len(rows), batch_size)]
+    semaphore = semaphore or embedding_semaphore()
+    updated_count = 0
+
+    async def enrich_batch(batch: List[Tuple[UUID, str]]):
+        nonlocal updated_count
+        async with semaphore:
+            embeddings = await generate_embeddings([text for _, text in batch])
+        async for session in get_session():
+            try:
+                await session.execute(
+                    update(model),
+                    [{"id": row_id, "embedding": embedding} for (row_id, _), embedding in zip(batch, embeddings)],
+                )
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+            break
+        updated_count += len(batch)
+        logger.info(f"Enriched {updated_count}/{len(rows)} {label}.")
+
+    await asyncio.gather(*(enrich_batch(batch) for batch in batches))
+    return updated_count
+
+async def enrich_syllabus_nodes(semaphore: Optional[asyncio.Semaphore] = None):
     """
     Generates embeddings for all SyllabusNodes that don't have them.
     """
     logger.info("Starting Syllabus Enrichment (Embeddings)...")
     
-    async for session in get_session():
-        try:
-            stmt = select(SyllabusNode).where(SyllabusNode.embedding == None)
-            result = await session.execute(stmt)
-            nodes = result.scalars().all()
-            
-            logger.info(f"Found {len(nodes)} syllabus nodes needing embeddings.")
-            
-            updated_count = 0
-            
-            for node in nodes:
-                # Create text for embedding: Topic + Description + Module
-                text_to_embed = f"{node.topic}. {node.description or ''}. Module: {node.module}"
-                
-                embedding = await generate_embedding(text_to_embed)
-                node.embedding = embedding
-                session.add(node)
-                updated_count += 1
-                
-                if updated_count % 10 == 0:
-                    logger.info(f"Enriched {updated_count} syllabus nodes.")
-                    await session.commit()
-            
-            await session.commit()
-            logger.info(f"Enriched {updated_count} syllabus nodes.")
-            
-        except Exception as e:
-            logger.error(f"Error enriching syllabus: {e}")
-            await session.rollback()
-            raise
-        break
+    try:
+        async for session in get_session():
+            stmt = select(
+                SyllabusNode.id, SyllabusNode.topic, SyllabusNode.description, SyllabusNode.module
+            ).where(SyllabusNode.embedding == None)
+            nodes = (await session.execute(stmt)).all()
+            break
+        
+        logger.info(f"Found {len(nodes)} syllabus nodes needing embeddings.")
+        
+        # Create text for embedding: Topic + Description + Module
+        rows = [(node.id, f"{node.topic}. {node.description or ''}. Module: {node.module}") for node in nodes]
+        updated_count = await _enrich_embeddings("syllabus nodes", SyllabusNode, rows, semaphore)
+        
+        logger.info(f"Enriched {updated_count} syllabus nodes.")
+    except Exception as e:
+        logger.error(f"Error enriching syllabus: {e}")
+        raise
 
-async def enrich_variant_groups():
+async def enrich_variant_groups(semaphore: Optional[asyncio.Semaphore] = None):
     """
     Generates embeddings for all VariantGroups that don't have them.
     """
     logger.info("Starting Variant Group Enrichment (Embeddings)...")
     
-    async for session in get_session():
-        try:
-            stmt = select(VariantGroup).where(VariantGroup.embedding == None)
-            result = await session.execute(stmt)
-            groups = result.scalars().all()
-            
-            logger.info(f"Found {len(groups)} variant groups needing embeddings.")
-            
-            updated_count = 0
-            
-            for group in groups:
-                embedding = await generate_embedding(group.canonical_stem)
-                group.embedding = embedding
-                session.add(group)
-                updated_count += 1
-                
-                if updated_count % 10 == 0:
-                    logger.info(f"Enriched {updated_count} variant groups.")
-                    await session.commit()
-            
-            await session.commit()
-            logger.info(f"Enriched {updated_count} variant groups.")
-            
-        except Exception as e:
-            logger.error(f"Error enriching variant groups: {e}")
-            await session.rollback()
-            raise
-        break
+    try:
+        async for session in get_session():
+            stmt = select(VariantGroup.id, VariantGroup.canonical_stem).where(VariantGroup.embedding == None)
+            groups = (await session.execute(stmt)).all()
+            break
+        
+        logger.info(f"Found {len(groups)} variant groups needing embeddings.")
+        
+        updated_count = await _enrich_embeddings(
+            "variant groups", VariantGroup, [(g.id, g.canonical_stem) for g in groups], semaphore
+        )
+        
+        logger.info(f"Enriched {updated_count} variant groups.")
+    except Exception as e:
+        logger.error(f"Error enriching variant groups: {e}")
+        raise
+
+def score_topics(
+    matrix: np.ndarray, topic_matrix: np.ndarray, syllabus_nodes: List[Any], label: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top settings.mapping_top_k topics per row. Syllabi with at least
+    settings.mapping_coarse_min_topics topics are routed coarse-to-fine through
+    module/chapter centroids; a sample is checked against the exact best topic.
+    """
+    if len(syllabus_nodes) < settings.mapping_coarse_min_topics:
+        return top_k_topics(matrix, topic_matrix, settings.mapping_top_k)
+
+    top_indices, top_scores = coarse_to_fine_top_k(
+        matrix,
+        topic_matrix,
+        [n.module for n in syllabus_nodes],
+        [n.parent_topic for n in syllabus_nodes],
+        settings.mapping_top_k,
+        settings.mapping_coarse_modules,
+    )
+    pruned, sampled = pruned_best_rate(matrix, topic_matrix, top_indices[:, 0])
+    if sampled:
+        logger.info(
+            f"Coarse-to-fine {label}: kept {settings.mapping_coarse_modules} modules per row; "
+            f"true best topic pruned for {pruned}/{sampled} sampled rows ({pruned / sampled:.1%})."
+        )
+    return top_indices, top_scores
+
+async def map_variant_groups(
+    session: AsyncSession, syllabus_nodes: List[Any], topic_matrix: np.ndarray
+) -> Dict[UUID, UUID]:
+    """
+    Maps every unmapped VariantGroup to its best topic, scored in one matrix multiply
+    and assigned by tier. Returns the groups mapped in this call and their topic.
+    """
+    # 1. Fetch all VariantGroups that are not mapped
+    stmt = select(VariantGroup.id, VariantGroup.canonical_stem, VariantGroup.embedding).where(
+        VariantGroup.syllabus_node_id == None
+    )
+    groups = (await session.execute(stmt)).all()
+    
+    logger.info(f"Found {len(groups)} unmapped variant groups.")
+    
+    missing = [g for g in groups if g.embedding is None]
+    if missing:
+        logger.warning(f"{len(missing)} groups have no embedding. Skipping them.")
+    groups = [g for g in groups if g.embedding is not None]
+    if not groups:
+        return {}
+    
+    # 2. Score every group against every topic at once
+    started = time.perf_counter()
+    top_indices, top_scores = score_topics(
+        normalize_rows([g.embedding for g in groups]), topic_matrix, syllabus_nodes, "group mapping"
+    )
+    best_scores = top_scores[:, 0]
+    tiers = assign_tiers(best_scores, MAPPING_THRESHOLDS)
+    mapped = ~np.isnan(tiers)
+    logger.info(
+        f"Scored {len(groups)} groups x {len(syllabus_nodes)} topics "
+        f"in {time.perf_counter() - started:.3f}s."
+    )
+    
+    # 3. Bulk write the best topic of every group that reached a tier
+    group_topics = {
+        groups[i].id: syllabus_nodes[top_indices[i, 0]].id for i in np.flatnonzero(mapped).tolist()
+    }
+    if group_topics:
+        await session.execute(
+            update(VariantGroup),
+            [{"id": gid, "syllabus_node_id": node_id} for gid, node_id in group_topics.items()],
+        )
+    
+    for i in np.flatnonzero(~mapped).tolist():
+        # Log the best attempt to debug why it failed
+        best_topic = syllabus_nodes[top_indices[i, 0]].topic
+        logger.info(f"Unmapped '{groups[i].canonical_stem[:30]}...' | Best: '{best_topic}' ({best_scores[i]:.2f}) < Min Threshold {MAPPING_THRESHOLDS[-1]}")
+    
+    # Log summary of tiers
+    tier_counts = {t: int(np.count_nonzero(tiers == t)) for t in MAPPING_THRESHOLDS}
+    summary_msg = ", ".join([f">={t}: {c}" for t, c in tier_counts.items()])
+    logger.info(f"Mapped {len(group_topics)} groups. Breakdown: [{summary_msg}]")
+    return group_topics
+
+async def index_question_topics(
+    session: AsyncSession, syllabus_nodes: List[Any], topic_matrix: np.ndarray, remapped_groups: List[UUID]
+):
+    """
+    Writes the question -> topic relevance index (QuestionTopicMap).
+
+    Every question gets its top settings.mapping_top_k topics that reach a tier,
+    plus its variant group's topic, each with its cosine score and source.
+    Covers questions not indexed yet and every question of a group mapped in this run.
+    Indexed questions are stamped with topics_indexed_at, so one that got no row
+    (no topic reached a tier and it has no group topic) is not rescored every run.
+    """
+    # Rows written before topics_indexed_at existed also count as indexed
+    has_rows = select(QuestionTopicMap.id).where(QuestionTopicMap.question_id == QuestionNormalized.id).exists()
+    stmt = select(
+        QuestionNormalized.id, QuestionNormalized.embedding, VariantGroup.syllabus_node_id
+    ).outerjoin(
+        VariantGroup, QuestionNormalized.variant_group_id == VariantGroup.id
+    ).where(
+        QuestionNormalized.embedding != None,
+        or_(
+            and_(QuestionNormalized.topics_indexed_at == None, ~has_rows),
+            QuestionNormalized.variant_group_id.in_(remapped_groups),
+        ),
+    )
+    questions = (await session.execute(stmt)).all()
+    if not questions:
+        return
+    
+    question_matrix = normalize_rows([q.embedding for q in questions])
+    top_indices, top_scores = score_topics(question_matrix, topic_matrix, syllabus_nodes, "question index")
+    top_tiers = assign_tiers(top_scores, MAPPING_THRESHOLDS)
+    node_position = {node.id: pos for pos, node in enumerate(syllabus_nodes)}
+    
+    rows = []
+    for i, q in enumerate(questions):
+        entries: Dict[int, Tuple[float, List[str]]] = {}
+        for rank in range(top_indices.shape[1]):
+            if not np.isnan(top_tiers[i, rank]):
+                entries[int(top_indices[i, rank])] = (float(top_scores[i, rank]), [f"tier>={top_tiers[i, rank]}"])
+        group_pos = node_position.get(q.syllabus_node_id)
+        if group_pos is not None:
+            score, sources = entries.get(group_pos, (float(question_matrix[i] @ topic_matrix[group_pos]), []))
+            entries[group_pos] = (score, ["group"] + sources)
+        rows.extend(
+            {
+                "id": uuid4(),
+                "question_id": q.id,
+                "topic_id": syllabus_nodes[pos].id,
+                "relevance_score": round(score, 4),
+                "source": ",".join(sources),
+            }
+            for pos, (score, sources) in entries.items()
+        )
+    
+    question_ids = [q.id for q in questions]
+    await session.execute(delete(QuestionTopicMap).where(QuestionTopicMap.question_id.in_(question_ids)))
+    if rows:
+        await session.execute(insert(QuestionTopicMap), rows)
+    await session.execute(
+        update(QuestionNormalized).where(QuestionNormalized.id.in_(question_ids)).values(topics_indexed_at=datetime.utcnow())
+    )
+    logger.info(f"Indexed {len(rows)} question-topic relevance scores for {len(questions)} questions.")
+
+async def load_relevance_index(session: AsyncSession, question_ids: List[UUID]) -> Dict[Tuple[UUID, UUID], float]:
+    """Precomputed relevance of (question, topic) pairs from QuestionTopicMap."""
+    if not question_ids:
+        return {}
+    stmt = select(QuestionTopicMap.question_id, QuestionTopicMap.topic_id, QuestionTopicMap.relevance_score).where(
+        QuestionTopicMap.question_id.in_(question_ids)
+    )
+    return {(qid, tid): score for qid, tid, score in (await session.execute(stmt)).all()}
 
 async def map_questions_to_syllabus():
     """
-    Maps VariantGroups to SyllabusNodes using vector similarity with dynamic thresholds.
+    Maps VariantGroups to SyllabusNodes using vector similarity with dynamic thresholds,
+    then refreshes the question -> topic relevance index.
     """
     logger.info("Starting Question Mapping...")
     
     async for session in get_session():
         try:
-            # 1. Fetch all VariantGroups that are not mapped
-            stmt = select(VariantGroup).where(VariantGroup.syllabus_node_id == None)
-            result = await session.execute(stmt)
-            groups = result.scalars().all()
-            
-            logger.info(f"Found {len(groups)} unmapped variant groups.")
-            
-            if not groups:
-                return
-
-            # 2. Fetch all SyllabusNodes with embeddings
-            stmt = select(SyllabusNode).where(SyllabusNode.embedding != None)
-            result = await session.execute(stmt)
-            syllabus_nodes = result.scalars().all()
+            # Fetch all SyllabusNodes with embeddings
+            stmt = select(
+                SyllabusNode.id, SyllabusNode.topic, SyllabusNode.module, SyllabusNode.parent_topic, SyllabusNode.embedding
+            ).where(SyllabusNode.embedding != None)
+            syllabus_nodes = (await session.execute(stmt)).all()
             
             if not syllabus_nodes:
                 logger.warning("No enriched syllabus nodes found. Please run enrichment first.")
                 return
+            topic_matrix = normalize_rows([n.embedding for n in syllabus_nodes])
             
-            mapped_count = 0
-            tier_counts = {t: 0 for t in MAPPING_THRESHOLDS}
-            
-            def cosine_similarity(a, b):
-                return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-            
-            for group in groups:
-                if group.embedding is None:
-                    logger.warning(f"Group {group.id} has no embedding. Skipping.")
-                    continue
-
-                best_node = None
-                best_score = -1.0
-                
-                for node in syllabus_nodes:
-                    score = cosine_similarity(group.embedding, node.embedding)
-                    if score > best_score:
-                        best_score = score
-                        best_node = node
-                
-                # Dynamic Threshold Logic
-                matched_tier = None
-                for threshold in MAPPING_THRESHOLDS:
-                    if best_score >= threshold:
-                        matched_tier = threshold
-                        break
-                
-                if matched_tier is not None:
-                    group.syllabus_node_id = best_node.id
-                    session.add(group)
-                    mapped_count += 1
-                    tier_counts[matched_tier] += 1
-                    logger.info(f"Mapped Group '{group.canonical_stem[:30]}...' -> '{best_node.topic}' (Score: {best_score:.2f} | Tier: {matched_tier})")
-                else:
-                    # Log the best attempt to debug why it failed
-                    best_topic = best_node.topic if best_node else "None"
-                    logger.info(f"Unmapped '{group.canonical_stem[:30]}...' | Best: '{best_topic}' ({best_score:.2f}) < Min Threshold {MAPPING_THRESHOLDS[-1]}")
-                
-                if mapped_count % 10 == 0:
-                    await session.commit()
-            
+            group_topics = await map_variant_groups(session, syllabus_nodes, topic_matrix)
+            await index_question_topics(session, syllabus_nodes, topic_matrix, list(group_topics))
             await session.commit()
             
-            # Log summary of tiers
-            summary_msg = ", ".join([f">={t}: {c}" for t, c in tier_counts.items()])
-            logger.info(f"Mapping complete. Mapped {mapped_count} groups. Breakdown: [{summary_msg}]")
+            logger.info(f"Mapping complete. Mapped {len(group_topics)} groups.")
             
         except Exception as e:
             logger.error(f"Error in mapping: {e}")
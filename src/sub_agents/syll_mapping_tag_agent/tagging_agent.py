@@ -1,14 +1,16 @@
 import asyncio
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 from uuid import UUID
-from sqlalchemy import select
+from sqlalchemy import select, update
 from langchain_core.prompts import ChatPromptTemplate
 
 from utils.db import get_session
 from utils.logger import get_logger
 from utils.llm import get_llm, call_llm_with_structured_output
 from src.data_models.models import QuestionNormalized
-from src.sub_agents.syll_mapping_tag_agent.schemas import TaggingBatchResponse
+from utils.settings import settings
+from src.sub_agents.syll_mapping_tag_agent.schemas import QuestionTag, TaggingBatchResponse
+from src.sub_agents.syll_mapping_tag_agent.batch_packing import format_question, pack_by_token_budget
 from src.sub_agents.syll_mapping_tag_agent.prompts import TAGGING_PROMPT
 
 logger = get_logger()
@@ -17,72 +19,101 @@ logger = get_logger()
 
 # --- Main Logic ---
 
-async def tag_questions(batch_size: int = 10):
+async def _save_tags(tags: Dict[UUID, QuestionTag]):
+    """Writes one batch of tags with a single bulk UPDATE."""
+    async for session in get_session():
+        try:
+            await session.execute(
+                update(QuestionNormalized),
+                [{"id": qid, "difficulty": tag.difficulty, "taxonomy": tag.taxonomy} for qid, tag in tags.items()],
+            )
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        break
+
+async def tag_questions(batch_size: Optional[int] = None):
     """
     Fetches untagged questions and uses an LLM to assign difficulty and taxonomy.
+    Questions extracted with settings.ocr_fused_tagging arrive tagged, so this
+    only picks up rows ingested without it (and any the extraction left untagged).
+
+    Questions are packed into prompts up to settings.tagging_token_budget tokens
+    (and at most `batch_size` questions, if given), settings.tagging_max_concurrency
+    batches run at a time, and only the question IDs missing from a response are
+    retried, up to settings.tagging_retries times.
+
+    A batch whose tags cannot be saved does not cancel the others: every batch
+    finishes (and saves what it can) before the first save error is raised.
     """
     logger.info("Starting Question Tagging...")
     
     llm = get_llm(temperature=0.0)
     
+    # 1. Fetch untagged questions (where difficulty is None)
     async for session in get_session():
-        try:
-            # 1. Fetch untagged questions (where difficulty is None)
-            stmt = select(QuestionNormalized).where(QuestionNormalized.difficulty == None)
-            result = await session.execute(stmt)
-            questions = result.scalars().all()
-            
-            if not questions:
-                logger.info("No untagged questions found.")
-                return
-
-            logger.info(f"Found {len(questions)} questions to tag.")
-            
-            # 2. Process in batches
-            for i in range(0, len(questions), batch_size):
-                batch = questions[i : i + batch_size]
-                
-                # Format input for prompt
-                questions_text = "\n\n".join([
-                    f"ID: {str(q.id)}\nText: {q.base_form}" 
-                    for q in batch
-                ])
-                
-                logger.info(f"Processing batch {i//batch_size + 1} ({len(batch)} questions)...")
-                
-                # Call LLM
-                response = await call_llm_with_structured_output(
-                    llm=llm,
-                    output_class=TaggingBatchResponse,
-                    messages=TAGGING_PROMPT.format_messages(questions_text=questions_text),
-                    context_desc="Question Tagging"
-                )
-                
-                if response and response.tags:
-                    # Update DB
-                    update_count = 0
-                    tag_map = {t.question_id: t for t in response.tags}
-                    
-                    for q in batch:
-                        tag_data = tag_map.get(str(q.id))
-                        if tag_data:
-                            q.difficulty = tag_data.difficulty
-                            q.taxonomy = tag_data.taxonomy
-                            session.add(q)
-                            update_count += 1
-                    
-                    await session.commit()
-                    logger.info(f"Updated {update_count} questions in this batch.")
-                else:
-                    logger.warning("Failed to get valid tags from LLM for this batch.")
-            
-            logger.info("Tagging run complete.")
-            
-        except Exception as e:
-            logger.error(f"Error in tagging: {e}")
-            await session.rollback()
-            raise
+        stmt = select(QuestionNormalized.id, QuestionNormalized.base_form).where(QuestionNormalized.difficulty == None)
+        questions = (await session.execute(stmt)).all()
         break
+    
+    if not questions:
+        logger.info("No untagged questions found.")
+        return
+
+    logger.info(f"Found {len(questions)} questions to tag.")
+    
+    semaphore = asyncio.Semaphore(max(1, settings.tagging_max_concurrency))
+    pending = {q.id: format_question(str(q.id), q.base_form) for q in questions}
+    tagged_count = 0
+    
+    async def tag_batch(batch: List[Tuple[UUID, str]]) -> Set[UUID]:
+        nonlocal tagged_count
+        async with semaphore:
+            response = await call_llm_with_structured_output(
+                llm=llm,
+                output_class=TaggingBatchResponse,
+                messages=TAGGING_PROMPT.format_messages(questions_text="\n\n".join(text for _, text in batch)),
+                context_desc=f"Question Tagging ({len(batch)} questions)"
+            )
+        wanted = {str(qid): qid for qid, _ in batch}
+        tags = {}
+        for tag in (response.tags if response else []):
+            qid = wanted.get(tag.question_id.strip())
+            if qid is not None:
+                tags[qid] = tag
+        if tags:
+            await _save_tags(tags)
+            tagged_count += len(tags)
+        return set(tags)
+    
+    # 2. Process packed batches concurrently, retrying only what a response left out
+    failures: List[BaseException] = []
+    for attempt in range(settings.tagging_retries + 1):
+        if not pending:
+            break
+        batches = pack_by_token_budget(list(pending.items()), settings.tagging_token_budget, batch_size or 0)
+        if attempt:
+            logger.warning(f"Retrying {len(pending)} untagged questions in {len(batches)} batches (attempt {attempt + 1})")
+        else:
+            logger.info(f"Tagging in {len(batches)} batches...")
+        outcomes = await asyncio.gather(*(tag_batch(batch) for batch in batches), return_exceptions=True)
+        for batch, outcome in zip(batches, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Tagging batch of {len(batch)} questions failed: {outcome}")
+                failures.append(outcome)
+                continue
+            for qid in outcome:
+                pending.pop(qid, None)
+        if failures:
+            break # Save errors are not worth retrying within this run
+    
+    if pending:
+        logger.warning(f"{len(pending)} questions are still untagged after retries.")
+    logger.info(f"Tagging run complete. Tagged {tagged_count} questions.")
+    if failures:
+        logger.error(f"{len(failures)} tagging batches failed; re-raising the first error.")
+        raise failures[0]
 
 if __name__ == "__main__":
     asyncio.run(tag_questions())
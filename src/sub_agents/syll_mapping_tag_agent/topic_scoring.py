@@ -0,0 +1,106 @@
+"""
+Vectorized scoring of variant groups against syllabus topics.
+
+Groups and topics are unit-normalized float32 matrices, so one matrix multiply
+gives every cosine similarity; top-k and threshold tiers are taken from it
+without any Python loop over pairs. Large syllabi can be routed coarse-to-fine
+through module and chapter centroids first.
+"""
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+from src.sub_agents.question_preprocessing_agent.clustering import normalize_rows
+
+def top_k_from_similarity(similarity: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k columns per row of a similarity matrix. Returns (indices, scores), best first."""
+    k = max(1, min(k, similarity.shape[1]))
+    if k < similarity.shape[1]:
+        candidates = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(similarity.shape[1]), similarity.shape)
+    candidate_scores = np.take_along_axis(similarity, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+def top_k_topics(groups: np.ndarray, topics: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k topics per group from normalized matrices (groups x dim, topics x dim).
+
+    Returns (indices, scores), both groups x k, best first.
+    """
+    return top_k_from_similarity(groups @ topics.T, k)
+
+def _label_ids(labels: Sequence[Hashable]) -> Tuple[np.ndarray, int]:
+    ids: Dict[Hashable, int] = {}
+    return np.array([ids.setdefault(label, len(ids)) for label in labels], dtype=np.int64), len(ids)
+
+def _centroids(topics: np.ndarray, label_ids: np.ndarray, n_labels: int) -> np.ndarray:
+    sums = np.zeros((n_labels, topics.shape[1]), dtype=np.float32)
+    np.add.at(sums, label_ids, topics)
+    return normalize_rows(sums)
+
+def coarse_to_fine_top_k(
+    groups: np.ndarray,
+    topics: np.ndarray,
+    modules: Sequence[Hashable],
+    chapters: Sequence[Hashable],
+    k: int,
+    top_modules: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Two-stage top-k for large syllabi.
+
+    Coarse: each group is scored against module and chapter centroids (means of
+    their topics' embeddings); a module scores the better of its own centroid and
+    its best chapter. Fine: each group is scored only against the topics of its
+    `top_modules` best modules. Topics outside them score -inf.
+
+    Returns (indices, scores) like top_k_topics.
+    """
+    module_ids, n_modules = _label_ids(modules)
+    chapter_ids, n_chapters = _label_ids(list(zip(modules, chapters))) # Chapters are scoped by module
+    chapter_module = np.zeros(n_chapters, dtype=np.int64)
+    chapter_module[chapter_ids] = module_ids
+
+    module_scores = groups @ _centroids(topics, module_ids, n_modules).T
+    chapter_scores = groups @ _centroids(topics, chapter_ids, n_chapters).T
+    for m in range(n_modules):
+        module_scores[:, m] = np.maximum(module_scores[:, m], chapter_scores[:, chapter_module == m].max(axis=1))
+
+    top_modules = max(1, min(top_modules, n_modules))
+    selected = np.argpartition(-module_scores, top_modules - 1, axis=1)[:, :top_modules]
+
+    similarity = np.full((groups.shape[0], topics.shape[0]), -np.inf, dtype=np.float32)
+    for m in range(n_modules):
+        rows = np.flatnonzero((selected == m).any(axis=1))
+        if rows.size:
+            cols = np.flatnonzero(module_ids == m)
+            similarity[np.ix_(rows, cols)] = groups[rows] @ topics[cols].T
+    return top_k_from_similarity(similarity, k)
+
+def pruned_best_rate(
+    groups: np.ndarray, topics: np.ndarray, best_indices: np.ndarray, sample_size: int = 200, seed: int = 0
+) -> Tuple[int, int]:
+    """
+    How often a coarse stage dropped the true best topic, checked exactly on a sample.
+
+    Returns (pruned, sampled).
+    """
+    if groups.shape[0] == 0:
+        return 0, 0
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(groups.shape[0], size=min(sample_size, groups.shape[0]), replace=False)
+    exact = groups[sample] @ topics.T
+    exact_best = exact[np.arange(len(sample)), best_indices[sample]]
+    # Compare scores, not indices, so exact ties do not count as pruning
+    pruned = int(np.count_nonzero(exact.max(axis=1) > exact_best + 1e-6))
+    return pruned, len(sample)
+
+def assign_tiers(scores: np.ndarray, thresholds: List[float]) -> np.ndarray:
+    """
+    The highest threshold each score reaches, or NaN below the lowest one.
+    """
+    ascending = np.asarray(sorted(thresholds), dtype=np.float64)
+    positions = np.searchsorted(ascending, scores.astype(np.float64), side="right") - 1
+    return np.where(positions >= 0, ascending[np.clip(positions, 0, None)], np.nan)
@@ -1,46 +1,68 @@
 import asyncio
 from typing import List, Dict, Any, Tuple
-from uuid import UUID
 from collections import defaultdict
 import numpy as np
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from utils.db import get_session
 from utils.logger import get_logger
 from src.data_models.models import (
-    QuestionNormalized, 
-    QuestionRaw, 
-    VariantGroup, 
-    SyllabusNode, 
     TrendSnapshot,
     TopicStatus
 )
 
 logger = get_logger()
 
-def analyze_section_distribution(year_data: Dict) -> Dict[str, Any]:
+# One row per occurrence of a question in [start_year, end_year]: every raw id in
+# original_ids is a paper it was asked in. The topic comes from the relevance
+# index ("group" rows), falling back to the variant group's topic.
+OCCURRENCES_SQL = """
+    WITH question_topics AS (
+        SELECT q.original_ids, q.difficulty, q.taxonomy,
+               COALESCE(m.topic_id, g.syllabus_node_id) AS topic_id
+        FROM questions_normalized q
+        LEFT JOIN question_topic_map m ON m.question_id = q.id AND m.source LIKE 'group%'
+        LEFT JOIN variant_groups g ON g.id = q.variant_group_id
+    ),
+    occurrences AS (
+        SELECT qt.topic_id, r.year, qt.difficulty, qt.taxonomy
+        FROM question_topics qt
+        CROSS JOIN LATERAL unnest(qt.original_ids) AS o(raw_id)
+        JOIN questions_raw r ON r.id = o.raw_id::uuid
+        WHERE qt.topic_id IS NOT NULL AND r.year BETWEEN :start_year AND :end_year
+    )
+"""
+
+# Section buckets follow analyze_section_distribution: 1-2 -> A, 3 -> B, 4-5 -> C (untagged counts as 3)
+TOPIC_YEAR_SQL = OCCURRENCES_SQL + """
+    SELECT n.id AS topic_id, n.topic, n.module, n.weight, o.year,
+           count(*) AS question_count,
+           avg(o.difficulty) AS avg_difficulty,
+           sum(COALESCE(o.difficulty, 3)) AS difficulty_sum,
+           count(*) FILTER (WHERE COALESCE(o.difficulty, 3) <= 2) AS section_a,
+           count(*) FILTER (WHERE COALESCE(o.difficulty, 3) = 3) AS section_b,
+           count(*) FILTER (WHERE COALESCE(o.difficulty, 3) >= 4) AS section_c
+    FROM occurrences o
+    JOIN syllabus_nodes n ON n.id = o.topic_id
+    GROUP BY n.id, n.topic, n.module, n.weight, o.year
+    ORDER BY n.id, o.year
+"""
+
+TAXONOMY_SQL = OCCURRENCES_SQL + """
+    SELECT o.topic_id, o.year, t.level, count(*) AS level_count
+    FROM occurrences o
+    CROSS JOIN LATERAL unnest(o.taxonomy) AS t(level)
+    GROUP BY o.topic_id, o.year, t.level
+"""
+
+def analyze_section_distribution(section_counts: Dict[str, int], difficulty_sum: float) -> Dict[str, Any]:
     """
     Analyzes which sections a topic historically appears in.
-    Based on difficulty: 1-2 -> Section A, 3 -> Section B, 4-5 -> Section C
+    Takes the topic's question count per section (by difficulty: 1-2 -> A, 3 -> B, 4-5 -> C)
+    and the sum of their difficulties (untagged questions counted as 3).
     """
-    section_counts = {"A": 0, "B": 0, "C": 0}
-    total_questions = 0
-    difficulties = []
-    
-    for year, q_list in year_data.items():
-        for q in q_list:
-            diff = q.difficulty or 3
-            difficulties.append(diff)
-            total_questions += 1
-            
-            if diff <= 2:
-                section_counts["A"] += 1
-            elif diff == 3:
-                section_counts["B"] += 1
-            else:
-                section_counts["C"] += 1
-    
+    total_questions = sum(section_counts.values())
     if total_questions == 0:
         return {}
     
@@ -51,7 +73,7 @@ def analyze_section_distribution(year_data: Dict) -> Dict[str, Any]:
     preferred_section = max(section_distribution.items(), key=lambda x: x[1])[0]
     
     # Calculate average difficulty
-    avg_difficulty = round(sum(difficulties) / len(difficulties), 2) if difficulties else 3.0
+    avg_difficulty = round(difficulty_sum / total_questions, 2)
     
     return {
         "section_distribution": section_distribution,
@@ -129,6 +151,30 @@ def detect_cyclicity(years: List[int], end_year: int) -> Dict[str, Any]:
         "confidence": 0.3
     }
 
+async def aggregate_topic_years(
+    session: AsyncSession, start_year: int, end_year: int
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[int, Any]], Dict[str, Dict[int, Dict[str, int]]]]:
+    """
+    Topic x year aggregates of question occurrences, computed in Postgres.
+
+    Returns topic info (name, module, weight), the per-year aggregate rows
+    (question count, average difficulty, section counts) and the per-year
+    taxonomy tallies, each keyed by topic ID.
+    """
+    params = {"start_year": start_year, "end_year": end_year}
+    topic_info: Dict[str, Dict[str, Any]] = {}
+    topic_year_rows: Dict[str, Dict[int, Any]] = defaultdict(dict)
+    for row in (await session.execute(text(TOPIC_YEAR_SQL), params)).all():
+        topic_id = str(row.topic_id)
+        topic_info[topic_id] = {"topic": row.topic, "module": row.module, "weight": row.weight}
+        topic_year_rows[topic_id][row.year] = row
+
+    taxonomy_counts: Dict[str, Dict[int, Dict[str, int]]] = defaultdict(lambda: defaultdict(dict))
+    for row in (await session.execute(text(TAXONOMY_SQL), params)).all():
+        taxonomy_counts[str(row.topic_id)][row.year][row.level] = row.level_count
+
+    return topic_info, topic_year_rows, taxonomy_counts
+
 async def generate_trend_snapshot(start_year: int, end_year: int) -> TrendSnapshot:
     """
     Analyzes question data to generate a TrendSnapshot with topic stats.
@@ -137,63 +183,28 @@ async def generate_trend_snapshot(start_year: int, end_year: int) -> TrendSnapsh
     
     async for session in get_session():
         try:
-            # 1. Fetch all QuestionNormalized with hierarchy
-            # We need VariantGroup -> SyllabusNode to attribute questions to topics
-            stmt = select(QuestionNormalized).options(
-                selectinload(QuestionNormalized.variant_group).selectinload(VariantGroup.syllabus_node)
-            )
-            result = await session.execute(stmt)
-            norm_questions = result.scalars().all()
-            
-            # 2. Build a lookup for QuestionRaw years
-            # We need to know the year for each original_id to place it on the timeline
-            stmt_raw = select(QuestionRaw.id, QuestionRaw.year)
-            result_raw = await session.execute(stmt_raw)
-            raw_year_map = {str(row[0]): row[1] for row in result_raw.all()}
-            
-            # 3. Aggregate Data
-            # Structure: topic_id -> { year -> [list of questions] }
-            topic_year_data = defaultdict(lambda: defaultdict(list))
-            topic_info = {} # topic_id -> {name, module}
-            
-            for q in norm_questions:
-                if not q.variant_group or not q.variant_group.syllabus_node:
-                    continue
-                
-                topic = q.variant_group.syllabus_node
-                topic_id = str(topic.id)
-                topic_info[topic_id] = {
-                    "topic": topic.topic, 
-                    "module": topic.module,
-                    "weight": topic.weight
-                }
-                
-                # For each occurrence (original_id), record the year
-                for raw_id in q.original_ids:
-                    year = raw_year_map.get(str(raw_id))
-                    if year and start_year <= year <= end_year:
-                        topic_year_data[topic_id][year].append(q)
+            # 1. Aggregate occurrences per topic and year in the database
+            topic_info, topic_year_rows, taxonomy_counts = await aggregate_topic_years(session, start_year, end_year)
 
-            # 4. Calculate Statistics
+            # 2. Calculate Statistics
             topic_stats = {}
             emerging_topics = []
             declining_topics = []
             
-            for topic_id, year_data in topic_year_data.items():
-                years = sorted(year_data.keys())
+            for topic_id, year_rows in topic_year_rows.items():
+                years = sorted(year_rows.keys())
                 if not years:
                     continue
                 
                 # Frequency per year
-                freq_map = {y: len(year_data[y]) for y in years}
+                freq_map = {y: year_rows[y].question_count for y in years}
                 total_count = sum(freq_map.values())
                 
-                # Difficulty per year (avg of questions in that year)
-                diff_map = {}
-                for y, q_list in year_data.items():
-                    diffs = [q.difficulty for q in q_list if q.difficulty is not None]
-                    if diffs:
-                        diff_map[y] = round(sum(diffs) / len(diffs), 2)
+                # Difficulty per year (avg of tagged questions in that year)
+                diff_map = {
+                    y: round(float(year_rows[y].avg_difficulty), 2)
+                    for y in years if year_rows[y].avg_difficulty is not None
+                }
                 
                 # Calculate Trend Slope (Simple Linear Regression on Frequency)
                 # We focus on the last 3-5 years for "Emerging" status if possible, else all available
@@ -223,23 +234,22 @@ async def generate_trend_snapshot(start_year: int, end_year: int) -> TrendSnapsh
                 topic_weight = topic_info[topic_id].get("weight", 1.0) 
                 gap_score = gap_years * topic_weight if gap_years > 0 else 0
                 
-                # Taxonomy Evolution
-                # year -> {level: count}
-                taxonomy_map = defaultdict(lambda: defaultdict(int))
-                for y, q_list in year_data.items():
-                    for q in q_list:
-                        for tax in q.taxonomy:
-                            taxonomy_map[y][tax] += 1
-                
-                # Convert to percentage for the snapshot
+                # Taxonomy Evolution, as a percentage per year for the snapshot
                 taxonomy_dist = {}
-                for y, counts in taxonomy_map.items():
+                for y, counts in sorted(taxonomy_counts.get(topic_id, {}).items()):
                     total_tax = sum(counts.values())
                     if total_tax > 0:
                         taxonomy_dist[y] = {k: round(v / total_tax, 2) for k, v in counts.items()}
 
                 # Enhanced Analysis: Section Distribution
-                section_analysis = analyze_section_distribution(year_data)
+                section_analysis = analyze_section_distribution(
+                    {
+                        "A": sum(row.section_a for row in year_rows.values()),
+                        "B": sum(row.section_b for row in year_rows.values()),
+                        "C": sum(row.section_c for row in year_rows.values()),
+                    },
+                    sum(float(row.difficulty_sum) for row in year_rows.values()),
+                )
                 
                 # Enhanced Analysis: Cyclicity Detection
                 cyclicity_analysis = detect_cyclicity(years, end_year)
@@ -263,7 +273,7 @@ async def generate_trend_snapshot(start_year: int, end_year: int) -> TrendSnapsh
                     "cyclicity": cyclicity_analysis
                 }
 
-            # 5. Generate Qualitative Insight using LLM
+            # 3. Generate Qualitative Insight using LLM
             # Prepare data for prompt
             emerging_names = [topic_stats[tid]["name"] for tid in emerging_topics]
             declining_names = [topic_stats[tid]["name"] for tid in declining_topics]
@@ -292,7 +302,7 @@ async def generate_trend_snapshot(start_year: int, end_year: int) -> TrendSnapsh
             
             qualitative_insight = insight_response.content
             
-            # 6. Create Snapshot
+            # 4. Create Snapshot
             snapshot = TrendSnapshot(
                 year_range=[start_year, end_year],
                 topic_stats_json=topic_stats,
@@ -1,13 +1,13 @@
 import asyncio
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from uuid import UUID
 from sqlalchemy import select, update
 from sqlalchemy.orm import selectinload
 
 from utils.db import get_session
 from utils.logger import get_logger
-from utils.llm import generate_embedding
+from utils.llm import generate_embeddings
 from src.data_models.models import (
     TrendSnapshot,
     PredictionCandidate,
@@ -16,6 +16,7 @@ from src.data_models.models import (
     VariantGroup,
     SyllabusNode
 )
+from src.sub_agents.syll_mapping_tag_agent.mapping_agent import load_relevance_index
 
 logger = get_logger()
 
@@ -39,57 +40,74 @@ def cosine_similarity(v1: List[float], v2: List[float]) -> float:
     if norm1 == 0 or norm2 == 0: return 0.0
     return float(np.dot(vec1, vec2) / (norm1 * norm2))
 
+def _needs_embedding(embedding) -> bool:
+    """True when an embedding is missing, empty or all zeros."""
+    if embedding is None:
+        return True
+    if isinstance(embedding, list):
+        return not embedding or all(x == 0 for x in embedding)
+    if hasattr(embedding, 'any'):
+        return embedding.size == 0 or not np.any(embedding)
+    return False
+
 async def vote_section(
     candidates: List[PredictionCandidate],
     section_name: str,
     section_config: dict,
-    session
+    session,
+    relevance_index: Optional[Dict[Tuple[UUID, UUID], float]] = None
 ) -> List[PredictionCandidate]:
-    """Vote and select candidates for a specific section."""
+    """
+    Vote and select candidates for a specific section.
+
+    Relevance is read from the precomputed question -> topic index
+    (QuestionTopicMap); only pairs missing from it are computed here.
+    """
     
     logger.info(f"Section {section_name}: Processing {len(candidates)} candidates...")
     
     target_count = section_config['final_count']
     max_per_topic = section_config['max_per_topic']
+    relevance_index = relevance_index or {}
     
-    # Generate embeddings and calculate relevance
+    def topic_of(cand: PredictionCandidate) -> Optional[SyllabusNode]:
+        q = cand.normalized_question
+        return q.variant_group.syllabus_node if q.variant_group and q.variant_group.syllabus_node else None
+    
+    unindexed = [
+        cand for cand in candidates
+        if topic_of(cand) is not None and (cand.normalized_question.id, topic_of(cand).id) not in relevance_index
+    ]
+    if unindexed:
+        logger.info(f"Section {section_name}: {len(unindexed)} candidates missing from the relevance index; computing.")
+    
+    # Generate missing embeddings in one batched request
+    missing = [cand.normalized_question for cand in unindexed if _needs_embedding(cand.normalized_question.embedding)]
+    if missing:
+        logger.info(f"Generating embeddings for {len(missing)} candidates...")
+        embeddings = await generate_embeddings([q.base_form for q in missing])
+        for q, emb in zip(missing, embeddings):
+            q.embedding = emb
+            session.add(q)
+    
+    # Calculate relevance
     scored_candidates = []
     
     for cand in candidates:
         q = cand.normalized_question
         
-        # Generate embedding if missing
-        needs_embedding = False
-        if q.embedding is None:
-            needs_embedding = True
-        elif isinstance(q.embedding, list) and (not q.embedding or all(x == 0 for x in q.embedding)):
-            needs_embedding = True
-        elif hasattr(q.embedding, 'any'):
-             if q.embedding.size == 0 or not np.any(q.embedding):
-                needs_embedding = True
-        
-        if needs_embedding:
-            logger.info(f"Generating embedding for {cand.id}...")
-            emb = await generate_embedding(q.base_form)
-            q.embedding = emb
-            session.add(q)
-        
         # Calculate relevance
         relevance = 0.0
         topic_id = "unknown"
         
-        if q.variant_group and q.variant_group.syllabus_node:
-            topic_node = q.variant_group.syllabus_node
+        topic_node = topic_of(cand)
+        if topic_node is not None:
             topic_id = str(topic_node.id)
-            if topic_node.embedding is not None:
-                 has_emb = False
-                 if isinstance(topic_node.embedding, list) and topic_node.embedding:
-                     has_emb = True
-                 elif hasattr(topic_node.embedding, 'any') and topic_node.embedding.size > 0:
-                     has_emb = True
-                     
-                 if has_emb:
-                    relevance = cosine_similarity(q.embedding, topic_node.embedding)
+            indexed = relevance_index.get((q.id, topic_node.id))
+            if indexed is not None:
+                relevance = indexed
+            elif not _needs_embedding(topic_node.embedding):
+                relevance = cosine_similarity(q.embedding, topic_node.embedding)
         
         # Update scores
         scores = dict(cand.scores_json) if cand.scores_json else {}
@@ -188,6 +206,10 @@ async def run_voting_process_multi_section(snapshot_id: UUID):
             
             logger.info(f"Total candidates: {len(all_candidates)}")
             
+            relevance_index = await load_relevance_index(
+                session, list({cand.normalized_question_id for cand in all_candidates})
+            )
+            
             # Group by section - only process candidates with section_target
             section_groups = {"A": [], "B": [], "C": []}
             skipped_old = 0
@@ -213,7 +235,7 @@ async def run_voting_process_multi_section(snapshot_id: UUID):
                     continue
                 
                 section_config = SECTION_TARGETS[section_name]
-                selected = await vote_section(candidates, section_name, section_config, session)
+                selected = await vote_section(candidates, section_name, section_config, session, relevance_index)
                 all_selected[section_name] = selected
             
             await session.commit()
@@ -8,7 +8,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'
 
 from data_models.database import engine, init_db
 from data_models.models import (
-    QuestionRaw, VariantGroup, QuestionNormalized, SyllabusNode, 
+    QuestionRaw, PdfIngestion, VariantGroup, QuestionNormalized, SyllabusNode, 
     TrendSnapshot, PredictionCandidate, SamplePaper, MemoryArtifact,
     ModelRun, EnsembleVote, Exclusion, QuestionParameter, QuestionTopicMap,
     CompositeQuestion, SamplePaperItem, ProvenanceLink, EvaluationResult,
@@ -31,13 +31,25 @@ def test_all_models():
         return
 
     with Session(engine) as session:
+        print("\n--- Testing PdfIngestion ---")
+        ingestion = PdfIngestion(
+            file_hash="0" * 64,
+            source_file="2023_paper.pdf",
+            question_count=1,
+            extraction_path="markdown"
+        )
+        session.add(ingestion)
+        session.commit()
+        session.refresh(ingestion)
+        print(f"Created PdfIngestion with ID: {ingestion.id}")
+
         print("\n--- Testing QuestionRaw ---")
         q_raw = QuestionRaw(
             year=2023,
             raw_text="What is the capital of France?",
             marks=5,
             section="A",
-            source_pdf="2023_paper.pdf",
+            ingestion_id=ingestion.id,
             original_numbering="Q1"
         )
         session.add(q_raw)
@@ -0,0 +1,24 @@
+import sys
+import os
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.sub_agents.syll_mapping_tag_agent.batch_packing import pack_by_token_budget, format_question
+
+def test_pack_by_token_budget():
+    items = [(1, "a" * 400), (2, "b" * 400), (3, "c" * 400), (4, "d" * 40)] # 100, 100, 100, 10 tokens
+
+    batches = pack_by_token_budget(items, token_budget=200)
+    assert [[key for key, _ in batch] for batch in batches] == [[1, 2], [3, 4]]
+
+    capped = pack_by_token_budget(items, token_budget=10_000, max_items=3)
+    assert [[key for key, _ in batch] for batch in capped] == [[1, 2, 3], [4]]
+
+def test_oversized_item_gets_its_own_batch():
+    items = [(1, "x" * 40), (2, "y" * 4000), (3, "z" * 40)]
+    batches = pack_by_token_budget(items, token_budget=100)
+    assert [[key for key, _ in batch] for batch in batches] == [[1], [2], [3]]
+    assert pack_by_token_budget([], token_budget=100) == []
+
+def test_format_question():
+    assert format_question("abc", "What is HAZOP?") == "ID: abc\nText: What is HAZOP?"
@@ -0,0 +1,71 @@
+import sys
+import os
+import random
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.sub_agents.question_preprocessing_agent.clustering import (
+    similarity_components, UnionFind, single_linkage_tree, cut_tree, group_counts
+)
+
+def as_sets(components, labels):
+    return {frozenset(labels[i] for i in component) for component in components}
+
+def test_components_follow_similarity_chains():
+    embeddings = [
+        [1.0, 0.0, 0.0],
+        [0.95, 0.31, 0.0], # ~0.95 to the first
+        [0.8, 0.6, 0.0],   # ~0.95 to the second, 0.8 to the first
+        [0.0, 0.0, 1.0],
+        [0.0, 0.0, 0.0],   # No embedding signal: always alone
+    ]
+    components = similarity_components(embeddings, threshold=0.9)
+    assert components == [[0, 1, 2], [3], [4]]
+
+def test_components_do_not_depend_on_row_order_or_block_size():
+    rng = np.random.default_rng(7)
+    centers = rng.normal(size=(20, 32))
+    embeddings = np.concatenate([c + rng.normal(scale=0.05, size=(5, 32)) for c in centers])
+    labels = list(range(len(embeddings)))
+    expected = as_sets(similarity_components(embeddings, threshold=0.9), labels)
+    assert len(expected) == 20
+
+    order = labels[:]
+    random.Random(3).shuffle(order)
+    shuffled = similarity_components(embeddings[order], threshold=0.9, block_size=7)
+    assert as_sets(shuffled, order) == expected
+
+def test_union_find_groups():
+    uf = UnionFind(5)
+    uf.union(3, 1)
+    uf.union(4, 3)
+    assert uf.groups() == [[0], [1, 3, 4], [2]]
+
+def test_tree_cuts_match_components_at_every_threshold():
+    rng = np.random.default_rng(11)
+    centers = rng.normal(size=(8, 16))
+    embeddings = np.concatenate([c + rng.normal(scale=0.3, size=(6, 16)) for c in centers])
+    merges = single_linkage_tree(embeddings, min_similarity=0.75, block_size=10)
+
+    assert len(merges) <= len(embeddings) - 1
+    assert [m[2] for m in merges] == sorted((m[2] for m in merges), reverse=True)
+    thresholds = [0.80, 0.85, 0.90, 0.95]
+    counts = group_counts(len(embeddings), merges, thresholds)
+    for t in thresholds:
+        cut = cut_tree(len(embeddings), merges, t)
+        assert cut == similarity_components(embeddings, threshold=t, block_size=10)
+        assert counts[t] == len(cut)
+
+def test_tree_does_not_depend_on_block_size():
+    rng = np.random.default_rng(5)
+    centers = rng.normal(size=(5, 12))
+    embeddings = np.concatenate([c + rng.normal(scale=0.4, size=(9, 12)) for c in centers])
+    whole = single_linkage_tree(embeddings, min_similarity=0.6, block_size=len(embeddings))
+
+    for block_size in (1, 4, 16):
+        blocked = single_linkage_tree(embeddings, min_similarity=0.6, block_size=block_size)
+        # Same edges; weights only differ by float32 rounding between block shapes
+        assert sorted((i, j) for i, j, _ in blocked) == sorted((i, j) for i, j, _ in whole)
+        assert np.allclose([w for _, _, w in blocked], [w for _, _, w in whole], atol=1e-5)
@@ -0,0 +1,81 @@
+import sys
+import os
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, Table, Text, create_engine, inspect, text
+from sqlalchemy.dialects import postgresql
+
+from utils.db import _add_column_ddl, _add_missing_columns, _create_missing_indexes
+from src.data_models.models import QuestionRaw, VariantGroup
+
+def schema_v1() -> MetaData:
+    metadata = MetaData()
+    Table("groups", metadata, Column("id", Integer, primary_key=True), Column("name", Text))
+    return metadata
+
+def schema_v2() -> MetaData:
+    """The same table with columns (and an index) declared after it was created."""
+    metadata = MetaData()
+    Table("parents", metadata, Column("id", Integer, primary_key=True))
+    Table(
+        "groups", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("name", Text),
+        Column("member_count", Integer, nullable=False, default=0),
+        Column("note", Text),
+        Column("parent_id", Integer, ForeignKey("parents.id")),
+        Index("ix_groups_parent_id", "parent_id"),
+    )
+    return metadata
+
+def init_schema(conn, metadata: MetaData):
+    """The schema steps of init_db, without the PostgreSQL-only HNSW indexes."""
+    metadata.create_all(conn)
+    _add_missing_columns(conn, metadata)
+    _create_missing_indexes(conn, metadata)
+
+def test_init_on_existing_schema_adds_new_columns_and_indexes():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        schema_v1().create_all(conn)
+        conn.execute(text("INSERT INTO groups (id, name) VALUES (1, 'existing')"))
+
+    with engine.begin() as conn:
+        init_schema(conn, schema_v2())
+
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        columns = {c["name"]: c for c in inspector.get_columns("groups")}
+        assert set(columns) == {"id", "name", "member_count", "note", "parent_id"}
+        assert columns["member_count"]["nullable"] is False
+        assert "ix_groups_parent_id" in {i["name"] for i in inspector.get_indexes("groups")}
+        # Existing rows get the declared default
+        row = conn.execute(text("SELECT member_count, note, parent_id FROM groups WHERE id = 1")).one()
+        assert tuple(row) == (0, None, None)
+
+    # A second run finds nothing to add
+    with engine.begin() as conn:
+        init_schema(conn, schema_v2())
+        assert len(inspect(conn).get_columns("groups")) == 5
+
+def test_column_ddl_for_model_columns_added_later():
+    dialect = postgresql.dialect()
+
+    assert _add_column_ddl("variant_groups", VariantGroup.__table__.c.centroid, dialect) == (
+        'ALTER TABLE "variant_groups" ADD COLUMN IF NOT EXISTS "centroid" VECTOR(768)'
+    )
+    assert _add_column_ddl("variant_groups", VariantGroup.__table__.c.member_count, dialect) == (
+        'ALTER TABLE "variant_groups" ADD COLUMN IF NOT EXISTS "member_count" INTEGER DEFAULT 0 NOT NULL'
+    )
+    assert _add_column_ddl("questions_raw", QuestionRaw.__table__.c.ingestion_id, dialect) == (
+        'ALTER TABLE "questions_raw" ADD COLUMN IF NOT EXISTS "ingestion_id" UUID REFERENCES "pdf_ingestions" ("id")'
+    )
+    assert _add_column_ddl("questions_raw", QuestionRaw.__table__.c.taxonomy, dialect) == (
+        'ALTER TABLE "questions_raw" ADD COLUMN IF NOT EXISTS "taxonomy" TEXT[]'
+    )
+
+if __name__ == "__main__":
+    test_init_on_existing_schema_adds_new_columns_and_indexes()
+    test_column_ddl_for_model_columns_added_later()
+    print("All tests passed!")
@@ -0,0 +1,66 @@
+import sys
+import os
+import asyncio
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import utils.db
+import utils.llm
+from utils.settings import settings
+from utils.embedding_cache import EmbeddingCache, text_hash
+
+class FakeSession:
+    async def execute(self, *args, **kwargs):
+        pass
+
+    async def commit(self):
+        pass
+
+async def fake_get_session():
+    yield FakeSession()
+
+def test_text_hash_ignores_whitespace():
+    assert text_hash("Define  safety.\n") == text_hash("Define safety.")
+    assert text_hash("Define safety.") != text_hash("Define hazard.")
+
+def test_memory_entries_are_float32_and_served_as_lists(monkeypatch):
+    monkeypatch.setattr(utils.db, "get_session", fake_get_session)
+    cache = EmbeddingCache(maxsize=10)
+    vector = [0.1, 0.2, 0.3]
+
+    asyncio.run(cache.put_many({"k": vector}, "model", 3))
+    stored = cache._memory[("k", "model", 3)]
+    assert isinstance(stored, np.ndarray) and stored.dtype == np.float32
+
+    found = asyncio.run(cache.get_many(["k"], "model", 3))
+    assert isinstance(found["k"], list)
+    assert np.allclose(found["k"], vector)
+    assert cache.stats.memory_hits == 1 and cache.stats.misses == 1
+
+class StubEmbeddingsClient:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts, batch_size=None, task_type=None):
+        self.calls.append((list(texts), batch_size, task_type))
+        return [[float(len(text))] for text in texts]
+
+def test_embed_uncached_clamps_batch_size_and_sets_task_type(monkeypatch):
+    client = StubEmbeddingsClient()
+    monkeypatch.setattr(utils.llm, "get_embeddings_client", lambda: client)
+    monkeypatch.setattr(settings, "embedding_cache_enabled", False)
+
+    monkeypatch.setattr(settings, "embedding_batch_size", 500)
+    vectors = asyncio.run(utils.llm.generate_embeddings(["a", "bb"]))
+    assert vectors == [[1.0], [2.0]]
+    assert client.calls[-1] == (["a", "bb"], utils.llm.MAX_EMBEDDING_BATCH_SIZE, utils.llm.EMBEDDING_TASK_TYPE)
+
+    monkeypatch.setattr(settings, "embedding_batch_size", 0)
+    asyncio.run(utils.llm.generate_embeddings(["a"]))
+    assert client.calls[-1][1] == 1
+
+if __name__ == "__main__":
+    test_text_hash_ignores_whitespace()
+    print("All tests passed!")
@@ -0,0 +1,81 @@
+import sys
+import os
+import asyncio
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.llm
+from utils.settings import settings
+from src.sub_agents.ocr_agent import ocr_agent
+from src.sub_agents.ocr_agent.schemas import ExtractedQuestion
+from src.sub_agents.syll_mapping_tag_agent.schemas import QuestionTag, TaggingBatchResponse
+
+def rule_parsed_questions():
+    return [
+        ExtractedQuestion(original_numbering="1", raw_text="Define safety.", marks=2, year=2023, confidence=0.95),
+        ExtractedQuestion(original_numbering="2", raw_text="Design a fire escape plan.", marks=10, year=2023, confidence=0.9),
+        ExtractedQuestion(original_numbering="3", raw_text="List PPE types.", marks=2, year=2023, difficulty=1, taxonomy=["Recall"]),
+    ]
+
+def test_rule_parsed_questions_are_tagged_before_caching(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "paper.pdf"
+    pdf_path.write_bytes(b"fake pdf")
+    calls, stored = [], []
+
+    async def rules_only(path, pdf_hash=None):
+        return rule_parsed_questions(), "rules"
+
+    async def fake_llm_call(llm, output_class, messages, context_desc):
+        calls.append(messages[0].content)
+        return TaggingBatchResponse(tags=[
+            QuestionTag(question_id="0", difficulty=1, taxonomy=["Recall"]),
+            QuestionTag(question_id="1", difficulty=5, taxonomy=["Create"]),
+        ])
+
+    async def no_cache(*args):
+        return None
+
+    async def record_cache(pdf_hash, kind, version, model_name, result):
+        stored.append((version, result))
+
+    monkeypatch.setattr(settings, "ocr_fused_tagging", True)
+    monkeypatch.setattr(ocr_agent, "get_llm", lambda temperature: None)
+    monkeypatch.setattr(utils.llm, "call_llm_with_structured_output", fake_llm_call)
+    monkeypatch.setattr(ocr_agent, "_extract_questions_uncached", rules_only)
+    monkeypatch.setattr(ocr_agent, "get_cached_extraction", no_cache)
+    monkeypatch.setattr(ocr_agent, "store_extraction", record_cache)
+
+    questions, path = asyncio.run(ocr_agent._extract_questions(str(pdf_path)))
+
+    assert path == "rules"
+    assert [(q.difficulty, q.taxonomy) for q in questions] == [(1, ["Recall"]), (5, ["Create"]), (1, ["Recall"])]
+    # One packed call, for the two untagged questions only
+    assert len(calls) == 1 and "Define safety." in calls[0] and "List PPE types." not in calls[0]
+    version, result = stored[0]
+    assert "-tagged-" in version
+    assert result.questions[1].difficulty == 5
+
+    raw = ocr_agent._to_question_raw(questions)
+    assert [q.difficulty for q in raw] == [1, 5, 1]
+
+def test_tagging_is_skipped_when_fused_tagging_is_off(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "paper.pdf"
+    pdf_path.write_bytes(b"fake pdf")
+
+    async def rules_only(path, pdf_hash=None):
+        return rule_parsed_questions(), "rules"
+
+    async def no_cache(*args):
+        return None
+
+    async def fail_tagging(*args):
+        raise AssertionError("tagging must not run")
+
+    monkeypatch.setattr(settings, "ocr_fused_tagging", False)
+    monkeypatch.setattr(ocr_agent, "_extract_questions_uncached", rules_only)
+    monkeypatch.setattr(ocr_agent, "_tag_untagged_questions", fail_tagging)
+    monkeypatch.setattr(ocr_agent, "get_cached_extraction", no_cache)
+    monkeypatch.setattr(ocr_agent, "store_extraction", no_cache)
+
+    questions, _ = asyncio.run(ocr_agent._extract_questions(str(pdf_path)))
+    assert [q.difficulty for q in questions] == [None, None, 1]
@@ -0,0 +1,151 @@
+import sys
+import os
+import asyncio
+from datetime import datetime
+from uuid import uuid4
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.db
+from src.data_models.models import PdfIngestion, QuestionRaw
+from src.sub_agents.ocr_agent import ocr_agent
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar_one_or_none(self):
+        return self.value
+
+    def scalar_one(self):
+        return self.value
+
+class FakeSession:
+    def __init__(self, *results, columns=()):
+        self.results = list(results)
+        self.columns = set(columns)
+        self.executed = []
+        self.added = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def run_sync(self, fn):
+        # Only used for the questions_raw column lookup
+        return self.columns
+
+    async def execute(self, stmt, params=None):
+        self.executed.append((str(stmt), params))
+        return FakeResult(self.results.pop(0) if self.results else None)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+def use_session(monkeypatch, session):
+    async def fake_get_session():
+        yield session
+    monkeypatch.setattr(utils.db, "get_session", fake_get_session)
+
+def ledger_entry(**overrides):
+    values = dict(
+        id=uuid4(), file_hash="abc", source_file="paper.pdf", question_count=2,
+        extraction_path="rules", ingested_at=datetime(2024, 1, 1),
+    )
+    values.update(overrides)
+    return PdfIngestion(**values)
+
+def questions():
+    return [QuestionRaw(id=uuid4(), year=2023, raw_text=f"Question {i}") for i in range(2)]
+
+def test_populate_db_writes_ledger_entry_and_questions(monkeypatch):
+    ingestion = ledger_entry()
+    session = FakeSession(ingestion.id)
+    use_session(monkeypatch, session)
+
+    assert asyncio.run(ocr_agent.populate_db(questions(), ingestion)) is True
+    assert "ON CONFLICT (file_hash) DO NOTHING" in session.executed[0][0]
+    assert len(session.added) == 2 and session.commits == 1
+
+def test_populate_db_skips_file_recorded_concurrently(monkeypatch):
+    session = FakeSession(None) # ON CONFLICT DO NOTHING returned no row
+    use_session(monkeypatch, session)
+
+    assert asyncio.run(ocr_agent.populate_db(questions(), ledger_entry())) is False
+    assert session.added == [] and session.commits == 0 and session.rollbacks == 1
+
+def test_ingest_skips_pdf_already_in_ledger(monkeypatch, tmp_path):
+    pdf_path = tmp_path / "renamed copy.pdf"
+    pdf_path.write_bytes(b"fake pdf")
+    existing = ledger_entry(question_count=7, extraction_path="markdown")
+
+    async def found(file_hash):
+        return existing
+
+    async def must_not_run(*args, **kwargs):
+        raise AssertionError("extraction should be skipped")
+
+    monkeypatch.setattr(ocr_agent, "get_ingestion", found)
+    monkeypatch.setattr(ocr_agent, "adopt_legacy_ingestion", must_not_run)
+    monkeypatch.setattr(ocr_agent, "_extract_questions", must_not_run)
+
+    result = asyncio.run(ocr_agent.ingest_pyq_pdf(str(pdf_path)))
+    assert result.skipped and result.error is None
+    assert result.question_count == 7 and result.extraction_path == "markdown"
+
+def test_legacy_rows_are_adopted_instead_of_reingested(monkeypatch):
+    legacy_id = uuid4()
+    # count of legacy rows, then the id returned by the ledger insert
+    session = FakeSession(3, legacy_id, columns={"id", "source_pdf", "ingestion_id"})
+    use_session(monkeypatch, session)
+
+    ingestion = asyncio.run(ocr_agent.adopt_legacy_ingestion("abc", "paper.pdf"))
+    assert ingestion.question_count == 3 and ingestion.extraction_path == "legacy"
+    update_sql, params = session.executed[-1]
+    assert update_sql.startswith("UPDATE questions_raw SET ingestion_id")
+    assert params == {"ingestion_id": ingestion.id, "source_file": "paper.pdf"}
+    assert session.commits == 1
+
+def test_no_legacy_adoption_without_source_column(monkeypatch):
+    session = FakeSession(columns={"id", "ingestion_id"})
+    use_session(monkeypatch, session)
+
+    assert asyncio.run(ocr_agent.adopt_legacy_ingestion("abc", "paper.pdf")) is None
+    assert session.executed == []
+
+def test_ingest_pyq_pdfs_isolates_failures_and_keeps_input_order(monkeypatch, tmp_path):
+    names = ["slow.pdf", "broken.pdf", "fast.pdf"]
+    paths = []
+    for name in names:
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        paths.append(str(path))
+    delays = {"slow.pdf": 0.05, "broken.pdf": 0.0, "fast.pdf": 0.0}
+
+    async def no_ingestion(*args):
+        return None
+
+    async def fake_extract(pdf_path, file_hash):
+        name = os.path.basename(pdf_path)
+        await asyncio.sleep(delays[name])
+        if name == "broken.pdf":
+            raise RuntimeError("unreadable PDF")
+        return [object()], "rules"
+
+    async def fake_populate(questions, ingestion):
+        return True
+
+    monkeypatch.setattr(ocr_agent, "get_ingestion", no_ingestion)
+    monkeypatch.setattr(ocr_agent, "adopt_legacy_ingestion", no_ingestion)
+    monkeypatch.setattr(ocr_agent, "_extract_questions", fake_extract)
+    monkeypatch.setattr(ocr_agent, "_to_question_raw", lambda extracted, ingestion_id: extracted)
+    monkeypatch.setattr(ocr_agent, "populate_db", fake_populate)
+
+    results = asyncio.run(ocr_agent.ingest_pyq_pdfs(paths, max_concurrency=3))
+    assert [r.source_file for r in results] == names
+    assert [r.error for r in results] == [None, "unreadable PDF", None]
+    assert [r.question_count for r in results] == [1, 0, 1]
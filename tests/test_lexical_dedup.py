@@ -0,0 +1,90 @@
+import sys
+import os
+import asyncio
+import hashlib
+from types import SimpleNamespace
+from uuid import uuid4
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.sub_agents.question_preprocessing_agent.lexical_dedup import (
+    MinHashLSH, canonical_form, strip_question_decorations, shingles, jaccard
+)
+from src.sub_agents.question_preprocessing_agent.question_preprocessing_agent import (
+    find_duplicates_batch, get_canonical_hash, rehash_legacy_questions
+)
+
+def test_strip_question_decorations():
+    assert strip_question_decorations("Q2 (b) Explain fault tree analysis. [5 marks]") == "Explain fault tree analysis."
+    assert strip_question_decorations("a) What is HAZOP? (16)") == "What is HAZOP?"
+    assert strip_question_decorations("ii. Define risk (2 x 10)") == "Define risk"
+    assert strip_question_decorations("A fire triangle has three sides.") == "A fire triangle has three sides."
+
+def test_canonical_form_ignores_case_punctuation_and_width():
+    assert canonical_form("Q1. What is  SAFETY-audit?") == canonical_form("（c） what is safety audit")
+    assert canonical_form("What is safety audit?") == "what is safety audit"
+
+def test_jaccard_of_identical_canonical_forms():
+    a = shingles("Q3 Explain the different types of lubrication systems. (16)")
+    b = shingles("b) explain the different types of lubrication systems")
+    assert jaccard(a, b) == 1.0
+
+def test_lsh_finds_near_verbatim_repeat_only():
+    index = MinHashLSH(threshold=0.9)
+    index.add("lubrication", "Explain the different types of lubrication systems in detail.")
+    index.add("colour", "Discuss the significance of colour codes used in industrial safety.")
+
+    match = index.query("Q4 (a) EXPLAIN the different types of lubrication systems in details. [10 Marks]")
+    assert match is not None and match[0] == "lubrication"
+    assert match[1] >= 0.9
+
+    assert index.query("Describe fault tree analysis with a suitable example.") is None
+    assert index.query("") is None
+
+def test_lsh_ignores_duplicate_keys_and_empty_texts():
+    index = MinHashLSH(threshold=0.9)
+    index.add(1, "What are the methods of fire prevention?")
+    index.add(1, "Something else entirely")
+    index.add(2, "   ")
+    assert len(index) == 1
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+class FakeSession:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.executed = []
+
+    async def execute(self, stmt, params=None):
+        self.executed.append((stmt, params))
+        return FakeResult(self.results.pop(0) if self.results else [])
+
+def test_exact_match_covers_every_text_sharing_a_hash():
+    existing = SimpleNamespace(id=uuid4(), canonical_hash=get_canonical_hash("What is a safety audit?"))
+    session = FakeSession([existing])
+    texts = ["What is a safety audit?", "what is a SAFETY audit"]
+
+    duplicates = asyncio.run(find_duplicates_batch(session, texts, [[0.0], [0.0]]))
+    assert duplicates == {texts[0]: existing, texts[1]: existing}
+    # Both resolved exactly, so no vector query
+    assert len(session.executed) == 1
+
+def test_rehash_updates_only_legacy_rows():
+    legacy_id, current_id = uuid4(), uuid4()
+    legacy_hash = hashlib.sha256("Define risk.".encode("utf-8")).hexdigest()
+    session = FakeSession([
+        (legacy_id, "Define risk.", legacy_hash),
+        (current_id, "Define hazard.", get_canonical_hash("Define hazard.")),
+    ])
+
+    assert asyncio.run(rehash_legacy_questions(session)) == 1
+    _, rows = session.executed[-1]
+    assert rows == [{"id": legacy_id, "canonical_hash": get_canonical_hash("Define risk.")}]
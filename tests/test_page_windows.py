@@ -0,0 +1,136 @@
+import sys
+import os
+import asyncio
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.llm
+from utils.settings import settings
+from src.sub_agents.ocr_agent import ocr_agent
+from src.sub_agents.ocr_agent.page_windows import build_page_windows, stitch_window_results
+from src.sub_agents.ocr_agent.schemas import ExtractedQuestion, ExtractionResult
+
+def test_build_page_windows():
+    pages = ["a" * 400, "b" * 400, "c" * 400] # 100 tokens each
+
+    per_page = build_page_windows(pages, token_budget=0)
+    assert [(w.page_start, w.page_end) for w in per_page] == [(1, 1), (2, 2), (3, 3)]
+
+    packed = build_page_windows(pages, token_budget=200)
+    assert [(w.page_start, w.page_end) for w in packed] == [(1, 2), (3, 3)]
+    assert packed[0].text == pages[0] + "\n\n" + pages[1]
+
+    # A page larger than the budget still gets its own window
+    oversized = build_page_windows(["x" * 4000, "y" * 40], token_budget=200)
+    assert [(w.page_start, w.page_end) for w in oversized] == [(1, 1), (2, 2)]
+
+    # A run taken from the middle of the PDF keeps its real page numbers
+    middle = build_page_windows(pages, token_budget=200, first_page=4)
+    assert [(w.page_start, w.page_end) for w in middle] == [(4, 5), (6, 6)]
+
+def test_stitch_window_results():
+    window_1 = [
+        ExtractedQuestion(original_numbering="1(a)", raw_text="Define safety.", marks=2, section="Part-I", year=2023),
+        ExtractedQuestion(original_numbering="Q2", raw_text="Explain the causes of", marks=5, section="Part-II", year=2023),
+    ]
+    window_2 = [
+        ExtractedQuestion(original_numbering="(continued)", raw_text="industrial accidents.", marks=0),
+        ExtractedQuestion(original_numbering="3", raw_text="Discuss fire prevention.", marks=5),
+    ]
+    window_3 = [
+        ExtractedQuestion(original_numbering="3", raw_text="methods in detail.", marks=5),
+    ]
+
+    stitched = stitch_window_results([window_1, window_2, window_3])
+    print([q.original_numbering for q in stitched])
+
+    assert [q.original_numbering for q in stitched] == ["1(a)", "Q2", "3"]
+    assert stitched[1].raw_text == "Explain the causes of\nindustrial accidents."
+    assert stitched[2].raw_text == "Discuss fire prevention.\nmethods in detail."
+    # Section carried forward, year filled from the paper
+    assert stitched[2].section == "Part-II"
+    assert stitched[2].year == 2023
+    # Inputs are not mutated
+    assert window_1[1].raw_text == "Explain the causes of"
+
+PAGES = ["Q1. Define safety. [2]", "Q2. Explain hazards. [5]", "Q3. Discuss fire prevention. [5]"]
+
+def window_ingestion(monkeypatch, tmp_path, failing_pages):
+    """
+    Runs ingest_pyq_pdf in page-window mode with a fake LLM that fails every call
+    for `failing_pages` (a set of page numbers, emptied by a retry when given as a list).
+    Returns the ingest result and the cache / ledger writes it made.
+    """
+    pdf_path = tmp_path / "paper.pdf"
+    pdf_path.write_bytes(f"fake pdf {tmp_path}".encode())
+    writes = {"cache": [], "ledger": []}
+
+    async def fake_pages(path):
+        return PAGES
+
+    async def fake_llm_call(llm, output_class, messages, context_desc):
+        page = int(context_desc.rsplit(" ", 1)[-1].split("-")[0])
+        if page in failing_pages:
+            if isinstance(failing_pages, list):
+                failing_pages.remove(page) # Transient: the retry succeeds
+            return None
+        return ExtractionResult(questions=[
+            ExtractedQuestion(original_numbering=str(page), raw_text=PAGES[page - 1], marks=5, year=2023)
+        ])
+
+    async def no_cache(*args):
+        return None
+
+    async def record_cache(*args):
+        writes["cache"].append(args)
+
+    async def no_ingestion(file_hash, source_file=None):
+        return None
+
+    async def record_ledger(questions, ingestion=None):
+        writes["ledger"].append((questions, ingestion))
+        return True
+
+    async def no_multimodal(path, pdf_hash=None):
+        return []
+
+    monkeypatch.setattr(settings, "ocr_probe_enabled", False)
+    monkeypatch.setattr(settings, "ocr_rule_based", False)
+    monkeypatch.setattr(settings, "ocr_page_windows", True)
+    monkeypatch.setattr(settings, "ocr_window_token_budget", 0)
+    monkeypatch.setattr(settings, "ocr_window_retries", 1)
+    monkeypatch.setattr(settings, "ocr_fallback_threshold", 0)
+    monkeypatch.setattr(utils.llm, "get_default_llm", lambda: None)
+    monkeypatch.setattr(utils.llm, "call_llm_with_structured_output", fake_llm_call)
+    monkeypatch.setattr(ocr_agent, "pdf_to_markdown_pages", fake_pages)
+    monkeypatch.setattr(ocr_agent, "get_cached_extraction", no_cache)
+    monkeypatch.setattr(ocr_agent, "store_extraction", record_cache)
+    monkeypatch.setattr(ocr_agent, "get_ingestion", no_ingestion)
+    monkeypatch.setattr(ocr_agent, "adopt_legacy_ingestion", no_ingestion)
+    monkeypatch.setattr(ocr_agent, "populate_db", record_ledger)
+    monkeypatch.setattr(ocr_agent, "_extract_via_multimodal", no_multimodal)
+
+    result = asyncio.run(ocr_agent.ingest_pyq_pdf(str(pdf_path)))
+    return result, writes
+
+def test_failed_window_is_neither_cached_nor_ingested(monkeypatch, tmp_path):
+    result, writes = window_ingestion(monkeypatch, tmp_path, {2})
+
+    assert result.error and "pages 2-2" in result.error
+    assert writes["cache"] == []
+    assert writes["ledger"] == []
+
+def test_retried_window_completes_the_extraction(monkeypatch, tmp_path):
+    result, writes = window_ingestion(monkeypatch, tmp_path, [2])
+
+    assert result.error is None
+    assert result.question_count == 3
+    assert len(writes["cache"]) == 1
+    questions, ingestion = writes["ledger"][0]
+    assert [q.original_numbering for q in questions] == ["1", "2", "3"]
+    assert ingestion.question_count == 3
+
+if __name__ == "__main__":
+    test_build_page_windows()
+    test_stitch_window_results()
+    print("All tests passed!")
@@ -0,0 +1,54 @@
+import sys
+import os
+import asyncio
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.settings import settings
+from src.sub_agents.ocr_agent import pdf_probe
+from src.sub_agents.ocr_agent.pdf_probe import (
+    probe_pdf, probe_pdf_cached, decide_verdict, PdfProbeMetrics, VERDICT_MARKDOWN, VERDICT_MULTIMODAL
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_decide_verdict():
+    # Scanned paper: no text layer
+    assert decide_verdict(5, 0.95, 0.0)[0] == VERDICT_MULTIMODAL
+    # Broken font map: plenty of characters, mostly unreadable
+    assert decide_verdict(1500, 0.0, 0.4)[0] == VERDICT_MULTIMODAL
+    # Image-heavy page with only a thin text layer
+    assert decide_verdict(250, 0.8, 0.0)[0] == VERDICT_MULTIMODAL
+    # Born-digital paper
+    assert decide_verdict(1500, 0.05, 0.0)[0] == VERDICT_MARKDOWN
+
+def test_probe_sample_pyq():
+    pdf_path = os.path.join(PROJECT_ROOT, "static", "pyqs", "Industrial Safety Engineering-7th-2022-23-Btech.pdf")
+    result = probe_pdf(pdf_path)
+    print(f"Probe result: {result}")
+    assert result.page_count == 2
+    assert result.verdict == VERDICT_MARKDOWN
+
+def test_cached_metrics_follow_current_thresholds(monkeypatch):
+    stored = []
+
+    async def cached_metrics(pdf_hash, kind, version, model_name, result_class):
+        assert result_class is PdfProbeMetrics
+        return PdfProbeMetrics(page_count=2, chars_per_page=300.0)
+
+    async def record_store(*args):
+        stored.append(args)
+
+    monkeypatch.setattr(pdf_probe, "get_cached_extraction", cached_metrics)
+    monkeypatch.setattr(pdf_probe, "store_extraction", record_store)
+
+    monkeypatch.setattr(settings, "ocr_probe_min_chars_per_page", 200)
+    assert asyncio.run(probe_pdf_cached("paper.pdf", "hash")).verdict == VERDICT_MARKDOWN
+    monkeypatch.setattr(settings, "ocr_probe_min_chars_per_page", 400)
+    assert asyncio.run(probe_pdf_cached("paper.pdf", "hash")).verdict == VERDICT_MULTIMODAL
+    assert stored == []
+
+if __name__ == "__main__":
+    test_decide_verdict()
+    test_probe_sample_pyq()
+    print("All tests passed!")
@@ -0,0 +1,108 @@
+import sys
+import os
+import asyncio
+from uuid import uuid4
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.settings import settings
+from src.data_models.models import QuestionNormalized, QuestionRaw
+from src.sub_agents.question_preprocessing_agent import question_preprocessing_agent as preprocessing
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+class FakeSession:
+    def __init__(self, raw_questions=()):
+        self.raw_questions = list(raw_questions)
+        self.added = []
+        self.commits = 0
+
+    async def execute(self, stmt, params=None):
+        # Only the pending raw questions query reaches the session in these tests
+        return FakeResult(self.raw_questions)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+def raw(text):
+    return QuestionRaw(id=uuid4(), year=2023, raw_text=text, marks=5)
+
+def direction(text):
+    """Same fake embedding for texts that differ only in case."""
+    return [1.0, 0.0] if "fire" in text.lower() else [0.0, 1.0]
+
+def stub_embeddings(monkeypatch, fail_on=None):
+    calls = []
+
+    async def fake_embeddings(texts):
+        calls.append(list(texts))
+        if fail_on and any(fail_on in text for text in texts):
+            raise RuntimeError("embedding quota exceeded")
+        return [direction(text) for text in texts]
+
+    async def no_table_duplicates(session, texts, embeddings):
+        return {}
+
+    monkeypatch.setattr(preprocessing, "generate_embeddings", fake_embeddings)
+    monkeypatch.setattr(preprocessing, "find_duplicates_batch", no_table_duplicates)
+    return calls
+
+def test_failed_embedding_leaves_the_chunk_pending(monkeypatch):
+    stub_embeddings(monkeypatch, fail_on="fire")
+    session = FakeSession()
+    questions = [raw("Explain fire prevention."), raw("Define hazard.")]
+
+    assert asyncio.run(preprocessing.normalize_batch(session, questions)) == 0
+    assert not any(q.processed for q in questions)
+    assert session.added == []
+
+def test_partial_chunk_links_repeats_and_skips_empty_text(monkeypatch):
+    calls = stub_embeddings(monkeypatch)
+    session = FakeSession()
+    empty = raw("   ")
+    first, repeat, other = raw("Q1. Explain fire prevention. [5]"), raw("Explain FIRE prevention!"), raw("Define hazard.")
+
+    processed = asyncio.run(preprocessing.normalize_batch(session, [empty, first, repeat, other]))
+    assert processed == 3
+    assert all(q.processed for q in (empty, first, repeat, other))
+    # One embedding call for the distinct texts, empty text excluded
+    assert calls == [["Explain fire prevention.", "Explain FIRE prevention!", "Define hazard."]]
+
+    created = list({id(obj): obj for obj in session.added if isinstance(obj, QuestionNormalized)}.values())
+    assert [q.base_form for q in created] == ["Explain fire prevention.", "Define hazard."]
+    assert created[0].original_ids == [str(first.id), str(repeat.id)]
+    assert created[1].original_ids == [str(other.id)]
+
+def test_failed_chunk_does_not_stop_later_chunks(monkeypatch):
+    calls = stub_embeddings(monkeypatch, fail_on="fire")
+    questions = [raw("Explain fire prevention."), raw("Define hazard."), raw("Define risk.")]
+    session = FakeSession(questions)
+
+    async def fake_get_session():
+        yield session
+
+    async def no_rehash(session):
+        return 0
+
+    monkeypatch.setattr(preprocessing, "get_session", fake_get_session)
+    monkeypatch.setattr(preprocessing, "rehash_legacy_questions", no_rehash)
+    monkeypatch.setattr(settings, "lexical_dedup_enabled", False)
+    monkeypatch.setattr(settings, "normalization_batch_size", 2)
+
+    asyncio.run(preprocessing.process_questions())
+    assert len(calls) == 2 and session.commits == 2
+    assert [q.processed for q in questions] == [False, False, True]
@@ -0,0 +1,72 @@
+import sys
+import os
+import asyncio
+from collections import namedtuple
+from datetime import datetime
+from uuid import uuid4
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.settings import settings
+from src.sub_agents.syll_mapping_tag_agent.mapping_agent import index_question_topics
+from src.sub_agents.syll_mapping_tag_agent.topic_scoring import normalize_rows
+
+Node = namedtuple("Node", "id topic module parent_topic embedding")
+Question = namedtuple("Question", "id embedding syllabus_node_id")
+
+NODES = [
+    Node(uuid4(), "Fire triangle", "Module 1", "Fire", [1.0, 0.0, 0.0]),
+    Node(uuid4(), "Hazard analysis", "Module 2", "Hazards", [0.0, 1.0, 0.0]),
+]
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+class FakeSession:
+    def __init__(self, questions):
+        self.questions = questions
+        self.statements = []
+
+    async def execute(self, stmt, params=None):
+        self.statements.append((stmt, params))
+        return FakeResult(self.questions if len(self.statements) == 1 else [])
+
+def run_index(monkeypatch, questions, remapped_groups=()):
+    monkeypatch.setattr(settings, "mapping_top_k", 2)
+    session = FakeSession(questions)
+    topic_matrix = normalize_rows([n.embedding for n in NODES])
+    asyncio.run(index_question_topics(session, NODES, topic_matrix, list(remapped_groups)))
+    return session.statements
+
+def test_questions_without_topics_are_stamped_too(monkeypatch):
+    on_topic = Question(uuid4(), [0.9, 0.1, 0.0], None)
+    off_topic = Question(uuid4(), [0.0, 0.0, 1.0], None) # Reaches no tier and has no group topic
+    grouped = Question(uuid4(), [0.0, 0.0, 1.0], NODES[1].id)
+
+    before = datetime.utcnow()
+    statements = run_index(monkeypatch, [on_topic, off_topic, grouped])
+    (select_stmt, _), _, (_, rows), (stamp_stmt, _) = statements
+
+    # Unstamped questions without legacy rows, or members of remapped groups
+    where = str(select_stmt.whereclause)
+    assert "topics_indexed_at IS NULL" in where and "NOT (EXISTS" in where
+
+    assert {(row["question_id"], row["topic_id"], row["source"]) for row in rows} == {
+        (on_topic.id, NODES[0].id, "tier>=0.75"),
+        (grouped.id, NODES[1].id, "group"),
+    }
+
+    params = stamp_stmt.compile().params
+    stamped = next(value for value in params.values() if isinstance(value, list))
+    assert stamped == [on_topic.id, off_topic.id, grouped.id]
+    assert params["topics_indexed_at"] >= before
+
+def test_nothing_pending_writes_nothing(monkeypatch):
+    statements = run_index(monkeypatch, [])
+    assert len(statements) == 1
@@ -0,0 +1,77 @@
+import sys
+import os
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.sub_agents.ocr_agent.rule_based_extractor import parse_questions_by_rules, detect_year, _finish_text
+
+CLEAN_PAPER = [
+    """# Biju Patnaik University of Technology, Odisha
+B.Tech (7th Semester) Examination: 2022-23
+Industrial Safety Engineering
+
+**Part-I**
+**Q1** Answer the following questions: **(2 x 10)**
+a) What is the primary function of maintenance department?
+b) What are different types of maintenance?
+c) What are the methods of fire prevention?
+
+**Part-II**
+**Q2** Answer any eight out of twelve questions: **(6 × 8)**
+a) Examine some of the common sources of mechanical hazards.
+b) Describe fault tree analysis with a suitable example.
+""",
+    """|**Q3**|Explain the different types of lubrication systems in detail.<br>**9-20/02**|**(16)**|
+|---|---|---|
+|**Q4**|Discuss the significance of colour codes used in industrial safety.|**(16)**|
+""",
+]
+
+def test_detect_year():
+    assert detect_year("Examination: 2022-23") == 2023
+    assert detect_year("Session 2024-2025") == 2025
+    assert detect_year("Held in 2021") == 2021
+    assert detect_year("No year here") is None
+
+def test_parse_clean_paper():
+    result = parse_questions_by_rules(CLEAN_PAPER)
+    by_number = {rq.question.original_numbering: rq for rq in result.questions}
+
+    assert list(by_number) == ["1(a)", "1(b)", "1(c)", "2(a)", "2(b)", "3", "4"]
+    assert by_number["1(a)"].question.marks == 2
+    assert by_number["2(b)"].question.marks == 6
+    assert by_number["2(b)"].question.section == "Part-II"
+    assert by_number["3"].question.marks == 16
+    # Table pipes, bold and the date stamp are stripped from the question text
+    assert by_number["3"].question.raw_text == "Explain the different types of lubrication systems in detail."
+    assert by_number["3"].page == 2
+    assert all(rq.question.year == 2023 for rq in result.questions)
+    assert result.unresolved_pages == []
+
+def test_only_marks_annotations_are_stripped():
+    assert _finish_text("Explain the three (3) types of hazards. (16)") == ("Explain the three (3) types of hazards.", 16)
+    assert _finish_text("Define risk [5 marks] and hazard.") == ("Define risk and hazard.", 5)
+    # A bare number mid-question is not a marks annotation
+    assert _finish_text("List the (4) phases of HAZOP.") == ("List the (4) phases of HAZOP.", None)
+
+def test_messy_pages_are_unresolved():
+    # The same sub-part twice (duplicated layout) and a sub-part with no marks anywhere
+    pages = [
+        CLEAN_PAPER[0] + "a) What is the primary function of maintenance department?\n",
+        """**Q5** Answer the following:
+a) Define hazard.
+c) Explain the causes of industrial accidents in detail.
+""",
+    ]
+    result = parse_questions_by_rules(pages)
+    assert result.unresolved_pages == [1, 2]
+
+    # Nothing recognisable at all: every page goes to the LLM
+    assert parse_questions_by_rules(["Some scanned noise", "more noise"]).unresolved_pages == [1, 2]
+
+if __name__ == "__main__":
+    test_detect_year()
+    test_parse_clean_paper()
+    test_only_marks_annotations_are_stripped()
+    test_messy_pages_are_unresolved()
+    print("All tests passed!")
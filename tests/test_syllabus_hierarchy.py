@@ -0,0 +1,71 @@
+import sys
+import os
+import time
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.sub_agents.ocr_agent.schemas import ExtractedTopic
+from src.sub_agents.ocr_agent.syllabus_hierarchy import flatten_syllabus_topics, UNKNOWN_MODULE
+
+def topic(name, level, parent_name=None):
+    return ExtractedTopic(name=name, level=level, parent_name=parent_name)
+
+def test_flatten_scopes_duplicates_by_parent():
+    topics = [
+        topic("Module I", 1),
+        topic("Introduction", 2, "Module I"),
+        topic("Scope of safety", 3, "Introduction"),
+        topic("Fire Prevention", 2, "Module I"), # Leaf directly under the module
+        topic("Module II", 1),
+        topic("Introduction", 2, "Module II"),
+        topic("Types of wear", 3, "Introduction"),
+        topic("Lubrication", 3, "Introduction"),
+        topic("Loose Topic", 3, "Missing Chapter"),
+    ]
+    rows = [(f.topic.name, f.module, f.parent_topic) for f in flatten_syllabus_topics(topics)]
+    print(rows)
+
+    assert rows == [
+        ("Scope of safety", "Module I", "Introduction"),
+        ("Fire Prevention", "Module I", None),
+        ("Types of wear", "Module II", "Introduction"),
+        ("Lubrication", "Module II", "Introduction"),
+        ("Loose Topic", UNKNOWN_MODULE, None),
+    ]
+
+def test_flatten_handles_depth_and_forward_references():
+    topics = [
+        topic("Heat treatment", 4, "Metals"), # Listed before its ancestors
+        topic("Elective Basket", 1),
+        topic("Materials", 2, "Elective Basket"),
+        topic("Metals", 3, "Materials"),
+        topic("Polymers", 3, "Materials"),
+    ]
+    rows = [(f.topic.name, f.module, f.parent_topic) for f in flatten_syllabus_topics(topics)]
+    assert rows == [
+        ("Heat treatment", "Elective Basket", "Metals"),
+        ("Polymers", "Elective Basket", "Materials"),
+    ]
+
+def test_flatten_large_syllabus_is_linear():
+    topics = []
+    for m in range(50):
+        topics.append(topic(f"Module {m}", 1))
+        for c in range(20):
+            topics.append(topic("Introduction" if c == 0 else f"Chapter {m}.{c}", 2, f"Module {m}"))
+            for t in range(10):
+                topics.append(topic(f"Topic {t}", 3, "Introduction" if c == 0 else f"Chapter {m}.{c}"))
+
+    started = time.perf_counter()
+    rows = flatten_syllabus_topics(topics)
+    elapsed = time.perf_counter() - started
+    print(f"Flattened {len(topics)} topics in {elapsed:.3f}s")
+
+    assert len(rows) == 50 * 20 * 10
+    assert elapsed < 1.0
+
+if __name__ == "__main__":
+    test_flatten_scopes_duplicates_by_parent()
+    test_flatten_handles_depth_and_forward_references()
+    test_flatten_large_syllabus_is_linear()
+    print("All tests passed!")
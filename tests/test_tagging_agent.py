@@ -0,0 +1,47 @@
+import sys
+import os
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from utils.settings import settings
+from src.sub_agents.syll_mapping_tag_agent import tagging_agent
+from src.sub_agents.syll_mapping_tag_agent.schemas import QuestionTag, TaggingBatchResponse
+
+def test_save_failure_does_not_cancel_other_batches(monkeypatch):
+    questions = [SimpleNamespace(id=uuid4(), base_form=f"Question {i}") for i in range(4)]
+    saved = []
+
+    class FakeSession:
+        async def execute(self, stmt):
+            return SimpleNamespace(all=lambda: questions)
+
+    async def fake_get_session():
+        yield FakeSession()
+
+    async def fake_llm_call(llm, output_class, messages, context_desc):
+        wanted = [q for q in questions if str(q.id) in messages[0].content]
+        return TaggingBatchResponse(tags=[
+            QuestionTag(question_id=str(q.id), difficulty=3, taxonomy=["Apply"]) for q in wanted
+        ])
+
+    async def fake_save(tags):
+        if questions[0].id in tags:
+            raise RuntimeError("connection lost")
+        await asyncio.sleep(0.01) # Still in flight when the other batch fails
+        saved.extend(tags)
+
+    monkeypatch.setattr(settings, "tagging_max_concurrency", 4)
+    monkeypatch.setattr(tagging_agent, "get_session", fake_get_session)
+    monkeypatch.setattr(tagging_agent, "get_llm", lambda temperature: None)
+    monkeypatch.setattr(tagging_agent, "call_llm_with_structured_output", fake_llm_call)
+    monkeypatch.setattr(tagging_agent, "_save_tags", fake_save)
+
+    with pytest.raises(RuntimeError, match="connection lost"):
+        asyncio.run(tagging_agent.tag_questions(batch_size=1))
+
+    assert sorted(saved) == sorted(q.id for q in questions[1:])
@@ -0,0 +1,58 @@
+import sys
+import os
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.sub_agents.syll_mapping_tag_agent.topic_scoring import (
+    normalize_rows, top_k_topics, assign_tiers, coarse_to_fine_top_k, pruned_best_rate
+)
+
+def test_top_k_matches_brute_force():
+    rng = np.random.default_rng(5)
+    groups = normalize_rows(rng.normal(size=(40, 24)))
+    topics = normalize_rows(rng.normal(size=(15, 24)))
+    indices, scores = top_k_topics(groups, topics, k=3)
+
+    assert indices.shape == scores.shape == (40, 3)
+    for g in range(40):
+        brute = sorted(range(15), key=lambda t: -float(groups[g] @ topics[t]))[:3]
+        assert indices[g].tolist() == brute
+        assert np.allclose(scores[g], [groups[g] @ topics[t] for t in brute], atol=1e-5)
+
+def test_top_k_is_capped_by_topic_count():
+    groups = normalize_rows([[1.0, 0.0], [0.0, 1.0]])
+    topics = normalize_rows([[0.0, 2.0], [3.0, 0.0]])
+    indices, scores = top_k_topics(groups, topics, k=5)
+    assert indices.tolist() == [[1, 0], [0, 1]]
+    assert np.allclose(scores[:, 0], [1.0, 1.0])
+
+def test_assign_tiers():
+    tiers = assign_tiers(np.array([0.9, 0.75, 0.62, 0.31, 0.1]), [0.75, 0.65, 0.60, 0.50, 0.40, 0.30])
+    assert tiers[:4].tolist() == [0.75, 0.75, 0.60, 0.30]
+    assert np.isnan(tiers[4])
+
+def test_coarse_to_fine_routes_to_the_right_module():
+    rng = np.random.default_rng(9)
+    module_centers = rng.normal(size=(4, 24)) * 3
+    topics = normalize_rows(np.concatenate([c + rng.normal(size=(10, 24)) for c in module_centers]))
+    modules = [f"Module {m}" for m in range(4) for _ in range(10)]
+    chapters = [f"Chapter {t // 5}" for t in range(40)]
+    groups = normalize_rows(topics[::3] + rng.normal(scale=0.1, size=topics[::3].shape))
+
+    exact_indices, exact_scores = top_k_topics(groups, topics, k=3)
+    indices, scores = coarse_to_fine_top_k(groups, topics, modules, chapters, k=3, top_modules=1)
+    assert indices[:, 0].tolist() == exact_indices[:, 0].tolist()
+    assert pruned_best_rate(groups, topics, indices[:, 0]) == (0, len(groups))
+
+def test_coarse_to_fine_with_every_module_is_exact():
+    rng = np.random.default_rng(2)
+    topics = normalize_rows(rng.normal(size=(12, 8)))
+    groups = normalize_rows(rng.normal(size=(6, 8)))
+    modules = ["I", "II", "III"] * 4
+    chapters = [None] * 12
+    exact = top_k_topics(groups, topics, k=4)
+    routed = coarse_to_fine_top_k(groups, topics, modules, chapters, k=4, top_modules=3)
+    assert routed[0].tolist() == exact[0].tolist()
+    assert np.allclose(routed[1], exact[1])
@@ -0,0 +1,105 @@
+import sys
+import os
+import asyncio
+from collections import namedtuple
+from uuid import uuid4
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+import utils.llm
+from src.sub_agents.trend_analysis_agent import trend_analysis_agent
+from src.sub_agents.trend_analysis_agent.trend_analysis_agent import (
+    TAXONOMY_SQL, TOPIC_YEAR_SQL, aggregate_topic_years, analyze_section_distribution
+)
+
+TopicYearRow = namedtuple(
+    "TopicYearRow",
+    "topic_id topic module weight year question_count avg_difficulty difficulty_sum section_a section_b section_c",
+)
+TaxonomyRow = namedtuple("TaxonomyRow", "topic_id year level level_count")
+
+TOPIC = uuid4()
+TOPIC_YEAR_ROWS = [
+    # 2021: difficulties 1, 2, 4; 2023: one untagged question (counted as 3)
+    TopicYearRow(TOPIC, "Fire safety", "Module 2", 2.0, 2021, 3, 2.33, 7, 2, 0, 1),
+    TopicYearRow(TOPIC, "Fire safety", "Module 2", 2.0, 2023, 1, None, 3, 0, 1, 0),
+]
+TAXONOMY_ROWS = [
+    TaxonomyRow(TOPIC, 2021, "Remember", 2),
+    TaxonomyRow(TOPIC, 2021, "Analyze", 1),
+]
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+class FakeSession:
+    def __init__(self):
+        self.queries = []
+        self.added = []
+
+    async def execute(self, stmt, params=None):
+        self.queries.append((str(stmt), params))
+        return FakeResult(TOPIC_YEAR_ROWS if str(stmt) == TOPIC_YEAR_SQL else TAXONOMY_ROWS)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+def test_aggregate_topic_years_keys_rows_by_topic_and_year():
+    session = FakeSession()
+    topic_info, topic_year_rows, taxonomy_counts = asyncio.run(aggregate_topic_years(session, 2020, 2024))
+
+    assert [sql for sql, _ in session.queries] == [TOPIC_YEAR_SQL, TAXONOMY_SQL]
+    assert all(params == {"start_year": 2020, "end_year": 2024} for _, params in session.queries)
+    topic_id = str(TOPIC)
+    assert topic_info == {topic_id: {"topic": "Fire safety", "module": "Module 2", "weight": 2.0}}
+    assert sorted(topic_year_rows[topic_id]) == [2021, 2023]
+    assert taxonomy_counts[topic_id][2021] == {"Remember": 2, "Analyze": 1}
+
+def test_section_distribution_uses_difficulty_sum():
+    analysis = analyze_section_distribution({"A": 2, "B": 1, "C": 1}, 10)
+    assert analysis["section_distribution"] == {"A": 0.5, "B": 0.25, "C": 0.25}
+    assert analysis["section_preference"] == "A"
+    assert analysis["avg_difficulty"] == 2.5
+    assert analyze_section_distribution({"A": 0, "B": 0, "C": 0}, 0) == {}
+
+def test_snapshot_is_built_from_aggregated_rows(monkeypatch):
+    session = FakeSession()
+
+    async def fake_get_session():
+        yield session
+
+    fake_llm = RunnableLambda(lambda prompt: AIMessage(content="Fire safety keeps coming back."))
+    monkeypatch.setattr(trend_analysis_agent, "get_session", fake_get_session)
+    monkeypatch.setattr(utils.llm, "get_llm", lambda temperature=0.0: fake_llm)
+
+    snapshot = asyncio.run(trend_analysis_agent.generate_trend_snapshot(2020, 2024))
+    stats = snapshot.topic_stats_json[str(TOPIC)]
+
+    assert stats["total_count"] == 4
+    assert stats["frequency_by_year"] == {2021: 3, 2023: 1}
+    assert stats["difficulty_by_year"] == {2021: 2.33} # Untagged-only years have no average
+    assert stats["taxonomy_distribution"] == {2021: {"Remember": 0.67, "Analyze": 0.33}}
+    assert stats["section_distribution"] == {"A": 0.5, "B": 0.25, "C": 0.25}
+    assert stats["avg_difficulty"] == 2.5
+    assert stats["last_asked_year"] == 2023
+    assert stats["gap_score"] == 2.0 # One year since last asked, weight 2
+    assert snapshot.topic_stats_json["_meta"]["qualitative_insight"] == "Fire safety keeps coming back."
+    assert session.added == [snapshot]
+
+if __name__ == "__main__":
+    test_aggregate_topic_years_keys_rows_by_topic_and_year()
+    test_section_distribution_uses_difficulty_sum()
+    print("All tests passed!")
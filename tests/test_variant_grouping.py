@@ -0,0 +1,130 @@
+import sys
+import os
+import asyncio
+from uuid import uuid4
+# Add the project root to the python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.settings import settings
+from src.sub_agents.question_preprocessing_agent import variant_grouping
+from src.sub_agents.question_preprocessing_agent.schemas import CanonicalStemBatchResponse, ClusterStem
+from src.sub_agents.question_preprocessing_agent.variant_grouping import GroupState, plan_incremental
+
+THRESHOLD = 0.85
+
+def unit(degrees):
+    """Unit vector in the plane; the cosine of two of them is cos(angle between)."""
+    radians = np.deg2rad(degrees)
+    return np.array([np.cos(radians), np.sin(radians)], dtype=np.float32)
+
+def test_unmatched_component_becomes_new_group():
+    plan = plan_incremental(np.stack([unit(0), unit(5)]), [[0, 1]], [[], []], {}, THRESHOLD)
+    assert plan.new_clusters == [[0, 1]]
+    assert plan.joins == {} and plan.merges == {} and plan.groups == {}
+
+def test_component_joins_matched_group_and_updates_centroid():
+    a = uuid4()
+    embeddings = np.stack([unit(5), unit(10)])
+    groups = {a: GroupState(unit(0), 2)}
+
+    # Only the first question matched, the component carries the second along
+    plan = plan_incremental(embeddings, [[0, 1]], [[a], []], groups, THRESHOLD)
+    assert plan.joins == {a: [0, 1]}
+    assert plan.groups[a].member_count == 4
+    assert np.allclose(plan.groups[a].centroid, (2 * unit(0) + unit(5) + unit(10)) / 4)
+    # The caller's state is not mutated
+    assert groups[a].member_count == 2 and np.allclose(groups[a].centroid, unit(0))
+
+def test_bridged_groups_with_close_centroids_merge_into_largest():
+    a, b = uuid4(), uuid4()
+    groups = {a: GroupState(unit(0), 3), b: GroupState(unit(10), 1)}
+
+    plan = plan_incremental(np.stack([unit(5)]), [[0]], [[a, b]], groups, THRESHOLD)
+    assert plan.merges == {b: a}
+    assert plan.joins == {a: [0]}
+    assert set(plan.groups) == {a}
+    assert plan.groups[a].member_count == 5
+    assert np.allclose(plan.groups[a].centroid, (3 * unit(0) + unit(10) + unit(5)) / 5)
+
+def test_bridging_component_splits_when_centroids_are_apart():
+    # cos(a, b) = 0.8 < threshold, but the two questions are 0.96 apart and
+    # so form one component that matches both groups
+    a, b = uuid4(), uuid4()
+    b_angle = np.rad2deg(np.arccos(0.8))
+    embeddings = np.stack([unit(10), unit(b_angle - 10)])
+    assert float(embeddings[0] @ embeddings[1]) >= THRESHOLD
+    groups = {a: GroupState(unit(0), 2), b: GroupState(unit(b_angle), 1)}
+
+    plan = plan_incremental(embeddings, [[0, 1]], [[a], [b]], groups, THRESHOLD)
+    assert plan.merges == {}
+    assert plan.joins == {a: [0], b: [1]}
+    assert plan.groups[a].member_count == 3 and plan.groups[b].member_count == 2
+
+def test_merges_chain_across_components():
+    a, b, c = uuid4(), uuid4(), uuid4()
+    embeddings = np.stack([unit(5), unit(12), unit(8)])
+    groups = {a: GroupState(unit(0), 2), b: GroupState(unit(10), 1), c: GroupState(unit(20), 5)}
+    components = [[0], [1], [2]]
+    # 1st: bridges a and b (b merges into a); 2nd: bridges a and c (a merges into c);
+    # 3rd: matched b, which now resolves through a to c
+    matches = [[a, b], [a, c], [b]]
+
+    plan = plan_incremental(embeddings, components, matches, groups, THRESHOLD)
+    assert plan.merges == {b: a, a: c}
+    # The question that joined a before a was merged moved along to c
+    assert plan.joins == {c: [0, 1, 2]}
+    assert set(plan.groups) == {c}
+
+    merged_a = (2 * unit(0) + unit(10)) / 3
+    merged_c = (5 * unit(20) + 3 * merged_a) / 8
+    assert plan.groups[c].member_count == 11
+    assert np.allclose(plan.groups[c].centroid, (8 * merged_c + embeddings.sum(axis=0)) / 11)
+
+CLUSTERS = [
+    ["Define hazard."],
+    ["Explain fire triangle.", "What is the fire triangle?"],
+    ["Define risk.", "What is risk?"],
+    ["Explain HAZOP.", "What is HAZOP study?"],
+]
+
+def stub_stem_calls(monkeypatch, clusters_per_call, answered):
+    """Packed calls answer the cluster IDs in `answered`; returns the packed and single calls made."""
+    calls = {"packed": [], "single": []}
+
+    async def fake_llm_call(llm, output_class, messages, context_desc):
+        prompt = messages[-1].content
+        ids = [line.split(": ", 1)[1] for line in map(str.strip, prompt.splitlines()) if line.startswith("Cluster ID: ")]
+        calls["packed"].append(ids)
+        stems = [ClusterStem(cluster_id=i, canonical_stem=f"stem {i}") for i in ids if i in answered]
+        # IDs outside the call are ignored
+        stems.append(ClusterStem(cluster_id="99", canonical_stem="stray"))
+        return CanonicalStemBatchResponse(stems=stems)
+
+    async def fake_single(questions):
+        calls["single"].append(questions)
+        return f"single {questions[0]}"
+
+    monkeypatch.setattr(settings, "stem_clusters_per_call", clusters_per_call)
+    monkeypatch.setattr(variant_grouping, "get_default_llm", lambda: None)
+    monkeypatch.setattr(variant_grouping, "call_llm_with_structured_output", fake_llm_call)
+    monkeypatch.setattr(variant_grouping, "generate_canonical_stem", fake_single)
+    return calls
+
+def test_stems_are_packed_and_missing_clusters_fall_back(monkeypatch):
+    calls = stub_stem_calls(monkeypatch, clusters_per_call=2, answered={"1", "2"})
+
+    stems = asyncio.run(variant_grouping.generate_canonical_stems(CLUSTERS))
+    # The singleton skips the LLM; cluster 3 was left out of its packed response
+    assert stems == ["Define hazard.", "stem 1", "stem 2", "single Explain HAZOP."]
+    assert sorted(calls["packed"]) == [["1", "2"], ["3"]]
+    assert calls["single"] == [CLUSTERS[3]]
+
+def test_one_cluster_per_call_skips_packing(monkeypatch):
+    calls = stub_stem_calls(monkeypatch, clusters_per_call=1, answered=set())
+
+    stems = asyncio.run(variant_grouping.generate_canonical_stems(CLUSTERS))
+    assert stems[0] == "Define hazard."
+    assert stems[1:] == [f"single {cluster[0]}" for cluster in CLUSTERS[1:]]
+    assert calls["packed"] == []
@@ -1,7 +1,12 @@
 from sqlmodel import SQLModel
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import MetaData, event, inspect, literal, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from src.config import Config
+from utils.logger import get_logger
+from utils.settings import settings
+
+logger = get_logger()
 
 # Ensure we use the async driver
 DATABASE_URL = Config.DATABASE_URL
@@ -10,6 +15,23 @@ if DATABASE_URL and DATABASE_URL.startswith("postgresql://"):
 
 engine = create_async_engine(DATABASE_URL, echo=False, future=True)
 
+# pgvector embedding columns served by HNSW (cosine distance) indexes
+HNSW_INDEXED_COLUMNS = [
+    ("questions_normalized", "embedding"),
+    ("variant_groups", "embedding"),
+    ("variant_groups", "centroid"),
+    ("syllabus_nodes", "embedding"),
+]
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_hnsw_ef_search(dbapi_connection, connection_record):
+    """Sets the HNSW search breadth (recall vs. latency) on every new connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"SET hnsw.ef_search = {int(settings.hnsw_ef_search)}")
+    finally:
+        cursor.close()
+
 async def get_session() -> AsyncSession:
     async_session = sessionmaker(
         engine, class_=AsyncSession, expire_on_commit=False
@@ -88,8 +110,78 @@ async def create_db_if_not_exists(url: str):
             # Proceeding anyway, maybe it exists or we don't have permissions
             pass
 
+def _hnsw_index_name(table: str, column: str) -> str:
+    return f"ix_{table}_{column}_hnsw"
+
+async def ensure_hnsw_indexes(conn: AsyncConnection):
+    """
+    Creates the HNSW indexes on the embedding columns, and rebuilds any whose
+    m / ef_construction no longer match the settings.
+    """
+    wanted = {"m": str(settings.hnsw_m), "ef_construction": str(settings.hnsw_ef_construction)}
+    for table, column in HNSW_INDEXED_COLUMNS:
+        name = _hnsw_index_name(table, column)
+        row = (await conn.execute(
+            text("SELECT reloptions FROM pg_class WHERE relname = :name AND relkind = 'i'"),
+            {"name": name},
+        )).first()
+
+        if row is not None:
+            current = dict(option.split("=", 1) for option in (row[0] or []))
+            if all(current.get(key) == value for key, value in wanted.items()):
+                continue
+            logger.info(f"Rebuilding {name}: options {current} -> {wanted}")
+            await conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+        else:
+            logger.info(f"Creating HNSW index {name} ({wanted})")
+
+        await conn.execute(text(
+            f'CREATE INDEX "{name}" ON "{table}" USING hnsw ("{column}" vector_cosine_ops) '
+            f"WITH (m = {int(settings.hnsw_m)}, ef_construction = {int(settings.hnsw_ef_construction)})"
+        ))
+
+def _add_column_ddl(table_name: str, column, dialect) -> str:
+    """
+    ALTER TABLE statement adding a column declared after its table was created.
+    A NOT NULL column needs a scalar default to fill existing rows; otherwise it is added nullable.
+    """
+    # IF NOT EXISTS keeps concurrent init_db runs from failing on the same column (PostgreSQL only)
+    if_not_exists = "IF NOT EXISTS " if dialect.name == "postgresql" else ""
+    ddl = f'ALTER TABLE "{table_name}" ADD COLUMN {if_not_exists}"{column.name}" {column.type.compile(dialect=dialect)}'
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if isinstance(default, (bool, int, float, str)):
+        ddl += " DEFAULT " + str(literal(default).compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        if not column.nullable:
+            ddl += " NOT NULL"
+    for fk in column.foreign_keys:
+        ddl += f' REFERENCES "{fk.column.table.name}" ("{fk.column.name}")'
+    return ddl
+
+def _add_missing_columns(sync_conn, metadata: MetaData = SQLModel.metadata):
+    """create_all never alters tables that already exist; add columns declared later to them."""
+    inspector = inspect(sync_conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in present:
+                logger.info(f"Adding column {table.name}.{column.name}")
+                sync_conn.execute(text(_add_column_ddl(table.name, column, sync_conn.dialect)))
+
+def _create_missing_indexes(sync_conn, metadata: MetaData = SQLModel.metadata):
+    """create_all only indexes tables it creates; add indexes declared later to existing tables."""
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
 async def init_db():
     await create_db_if_not_exists(DATABASE_URL)
     async with engine.begin() as conn:
         # await conn.run_sync(SQLModel.metadata.drop_all)
         await conn.run_sync(SQLModel.metadata.create_all)
+        # Columns first: the indexes below may be on columns added since the table was created
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
+        await ensure_hnsw_indexes(conn)
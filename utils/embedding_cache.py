@@ -0,0 +1,125 @@
+"""
+Two-level embedding cache: an in-process LRU in front of the embedding_cache table.
+
+Entries are keyed by sha256(normalized text), embedding model and dimension,
+so the same string is embedded by the API at most once per model, across
+pipeline stages and across runs.
+
+The LRU holds float32 arrays (about 3 KB per 768-dim entry, against about
+24 KB as a list of Python floats); callers get plain lists back.
+"""
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import uuid4
+import numpy as np
+from cachetools import LRUCache
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from utils.logger import get_logger
+from utils.settings import settings
+
+logger = get_logger()
+
+def normalize_for_embedding(text: str) -> str:
+    """Collapses whitespace, so formatting-only differences share one cache entry."""
+    return " ".join(text.split())
+
+def text_hash(text: str) -> str:
+    """Cache key for a text: SHA-256 of its normalized form."""
+    return hashlib.sha256(normalize_for_embedding(text).encode("utf-8")).hexdigest()
+
+@dataclass
+class EmbeddingCacheStats:
+    memory_hits: int = 0
+    db_hits: int = 0
+    misses: int = 0 # Texts that had to be embedded by the API
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.memory_hits + self.db_hits + self.misses
+        return (self.memory_hits + self.db_hits) / total if total else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.memory_hits} memory hits, {self.db_hits} DB hits, "
+            f"{self.misses} API embeds ({self.hit_rate:.0%} hit rate)"
+        )
+
+class EmbeddingCache:
+    """Process-wide embedding cache. Database failures degrade to misses."""
+
+    def __init__(self, maxsize: int):
+        self._memory: LRUCache = LRUCache(maxsize=max(1, maxsize))
+        self.stats = EmbeddingCacheStats()
+
+    async def get_many(self, keys: List[str], model_name: str, dim: int) -> Dict[str, List[float]]:
+        """Returns the cached embeddings for whichever of `keys` are known."""
+        from utils.db import get_session
+        from src.data_models.models import EmbeddingCache as EmbeddingCacheRow
+
+        found: Dict[str, List[float]] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            vector = self._memory.get((key, model_name, dim))
+            if vector is not None:
+                found[key] = vector.tolist()
+            else:
+                missing.append(key)
+        self.stats.memory_hits += len(found)
+
+        if missing:
+            try:
+                async for session in get_session():
+                    stmt = select(EmbeddingCacheRow.text_hash, EmbeddingCacheRow.embedding).where(
+                        EmbeddingCacheRow.text_hash.in_(missing),
+                        EmbeddingCacheRow.model_name == model_name,
+                        EmbeddingCacheRow.dim == dim,
+                    )
+                    for key, embedding in (await session.execute(stmt)).all():
+                        vector = np.asarray(embedding, dtype=np.float32)
+                        self._memory[(key, model_name, dim)] = vector
+                        found[key] = vector.tolist()
+                        self.stats.db_hits += 1
+                    break
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed for {len(missing)} texts: {e}")
+
+        return found
+
+    async def put_many(self, vectors: Dict[str, List[float]], model_name: str, dim: int):
+        """Stores freshly generated embeddings in memory and in the database."""
+        from utils.db import get_session
+        from src.data_models.models import EmbeddingCache as EmbeddingCacheRow
+
+        if not vectors:
+            return
+        self.stats.misses += len(vectors)
+        for key, vector in vectors.items():
+            self._memory[(key, model_name, dim)] = np.asarray(vector, dtype=np.float32)
+
+        now = datetime.utcnow()
+        rows = [
+            {"id": uuid4(), "text_hash": key, "model_name": model_name, "dim": dim,
+             "embedding": vector, "created_at": now}
+            for key, vector in vectors.items()
+        ]
+        try:
+            async for session in get_session():
+                stmt = insert(EmbeddingCacheRow).on_conflict_do_nothing(constraint="uq_embedding_cache_key")
+                await session.execute(stmt, rows)
+                await session.commit()
+                break
+        except Exception as e:
+            logger.warning(f"Embedding cache store failed for {len(rows)} texts: {e}")
+
+    def get_stats(self) -> EmbeddingCacheStats:
+        return self.stats
+
+    def reset_stats(self):
+        self.stats = EmbeddingCacheStats()
+
+# Global cache instance shared by every embedding call
+embedding_cache = EmbeddingCache(maxsize=settings.embedding_cache_size)
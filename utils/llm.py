@@ -1,3 +1,5 @@
+import asyncio
+
 from pydantic import BaseModel
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import BaseMessage
@@ -12,9 +14,11 @@ T = TypeVar("T")
 R = TypeVar("R")
 M = TypeVar("M", bound=BaseModel)
 
+DEFAULT_MODEL = "gemini-2.5-flash"
+
 
 def get_llm(
-    model_name: str = "gemini-2.5-flash",
+    model_name: str = DEFAULT_MODEL,
     temperature: float = 0.0,
     completions: int = 1,
 ) -> BaseChatModel:
@@ -72,15 +76,68 @@ async def call_llm_with_structured_output(
 async def process_with_voting():
     pass
 
-async def generate_embedding(text: str) -> List[float]:
-    """Generate vector embedding for text using Google GenAI."""
-    if not settings.google_api_key:
-        raise ValueError("GOOGLE_API_KEY must be set in environment variables")
-        
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model="models/text-embedding-004",
-        google_api_key=settings.google_api_key
+EMBEDDING_MODEL = "models/text-embedding-004"
+# Same task type aembed_query uses, so batched vectors match the ones already stored
+EMBEDDING_TASK_TYPE = "RETRIEVAL_QUERY"
+# Google's embedding endpoint accepts at most 100 texts per request
+MAX_EMBEDDING_BATCH_SIZE = 100
+
+_embeddings_client: Optional[GoogleGenerativeAIEmbeddings] = None
+
+def get_embeddings_client() -> GoogleGenerativeAIEmbeddings:
+    """Get the process-wide embeddings client, creating it on first use."""
+    global _embeddings_client
+    if _embeddings_client is None:
+        if not settings.google_api_key:
+            raise ValueError("GOOGLE_API_KEY must be set in environment variables")
+        _embeddings_client = GoogleGenerativeAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            google_api_key=settings.google_api_key
+        )
+    return _embeddings_client
+
+async def _embed_uncached(texts: List[str]) -> List[List[float]]:
+    batch_size = min(max(1, settings.embedding_batch_size), MAX_EMBEDDING_BATCH_SIZE)
+    # aembed_documents in langchain-google-genai 2.0.x takes no batch_size/task_type,
+    # so run the sync batching call off the event loop instead
+    return await asyncio.to_thread(
+        get_embeddings_client().embed_documents,
+        list(texts),
+        batch_size=batch_size,
+        task_type=EMBEDDING_TASK_TYPE,
     )
-    
-    # embed_query returns a list of floats
-    return await embeddings.aembed_query(text)
\ No newline at end of file
+
+async def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """Generate vector embeddings for many texts, `settings.embedding_batch_size` texts per request.
+
+    Texts already in the embedding cache (in-process LRU, then the embedding_cache
+    table) skip the API; identical texts in one call are embedded once.
+
+    Args:
+        texts: Texts to embed
+
+    Returns:
+        One embedding per input text, in input order
+    """
+    if not texts:
+        return []
+    if not settings.embedding_cache_enabled:
+        return await _embed_uncached(texts)
+
+    from utils.embedding_cache import embedding_cache, text_hash
+    from src.data_models.models import VECTOR_DIM
+
+    keys = [text_hash(text) for text in texts]
+    vectors = await embedding_cache.get_many(keys, EMBEDDING_MODEL, VECTOR_DIM)
+
+    to_embed = {key: text for key, text in zip(keys, texts) if key not in vectors}
+    if to_embed:
+        fresh = dict(zip(to_embed, await _embed_uncached(list(to_embed.values()))))
+        await embedding_cache.put_many(fresh, EMBEDDING_MODEL, VECTOR_DIM)
+        vectors.update(fresh)
+
+    return [vectors[key] for key in keys]
+
+async def generate_embedding(text: str) -> List[float]:
+    """Generate vector embedding for text using Google GenAI (cached)."""
+    return (await generate_embeddings([text]))[0]
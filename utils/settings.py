@@ -10,6 +10,38 @@ class Settings(BaseSettings):
     google_api_key: Optional[SecretStr] = Field(default=None, alias="GOOGLE_API_KEY")
     ocr_fallback_threshold: int = Field(default=26, alias="OCR_FALLBACK_THRESHOLD")
     variant_grouping_threshold: float = Field(default=0.85, alias="VARIANT_GROUPING_THRESHOLD")
+    ocr_probe_enabled: bool = Field(default=True, alias="OCR_PROBE_ENABLED")
+    ocr_probe_min_chars_per_page: int = Field(default=200, alias="OCR_PROBE_MIN_CHARS_PER_PAGE")
+    ocr_probe_max_image_ratio: float = Field(default=0.6, alias="OCR_PROBE_MAX_IMAGE_RATIO")
+    ocr_probe_max_garbage_ratio: float = Field(default=0.1, alias="OCR_PROBE_MAX_GARBAGE_RATIO")
+    ocr_max_concurrent_pdfs: int = Field(default=3, alias="OCR_MAX_CONCURRENT_PDFS")
+    pdf_conversion_workers: int = Field(default=0, alias="PDF_CONVERSION_WORKERS") # 0 = one per CPU core
+    ocr_page_windows: bool = Field(default=False, alias="OCR_PAGE_WINDOWS")
+    ocr_window_token_budget: int = Field(default=6000, alias="OCR_WINDOW_TOKEN_BUDGET")
+    ocr_window_max_concurrency: int = Field(default=4, alias="OCR_WINDOW_MAX_CONCURRENCY")
+    ocr_window_retries: int = Field(default=2, alias="OCR_WINDOW_RETRIES")
+    ocr_rule_based: bool = Field(default=True, alias="OCR_RULE_BASED")
+    ocr_rule_min_confidence: float = Field(default=0.8, alias="OCR_RULE_MIN_CONFIDENCE")
+    ocr_fused_tagging: bool = Field(default=False, alias="OCR_FUSED_TAGGING") # Tag difficulty/taxonomy at ingest (in the extraction call, or packed calls for rule-parsed questions)
+    embedding_batch_size: int = Field(default=100, alias="EMBEDDING_BATCH_SIZE") # Max 100 per request
+    embedding_max_concurrency: int = Field(default=4, alias="EMBEDDING_MAX_CONCURRENCY") # Batches in flight during enrichment
+    embedding_cache_enabled: bool = Field(default=True, alias="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_size: int = Field(default=20000, alias="EMBEDDING_CACHE_SIZE") # In-process LRU entries (~3 KB each at 768 dims)
+    normalization_batch_size: int = Field(default=500, alias="NORMALIZATION_BATCH_SIZE")
+    lexical_dedup_enabled: bool = Field(default=True, alias="LEXICAL_DEDUP_ENABLED")
+    lexical_dedup_threshold: float = Field(default=0.9, alias="LEXICAL_DEDUP_THRESHOLD") # Shingle Jaccard
+    grouping_tree_min_similarity: float = Field(default=0.75, alias="GROUPING_TREE_MIN_SIMILARITY") # Lowest threshold a cached tree can be cut at
+    mapping_top_k: int = Field(default=3, alias="MAPPING_TOP_K") # Topics scored per variant group
+    mapping_coarse_min_topics: int = Field(default=500, alias="MAPPING_COARSE_MIN_TOPICS") # Syllabi this large map coarse-to-fine
+    mapping_coarse_modules: int = Field(default=3, alias="MAPPING_COARSE_MODULES") # Modules kept by the coarse stage
+    tagging_token_budget: int = Field(default=3000, alias="TAGGING_TOKEN_BUDGET") # Question tokens per tagging prompt
+    tagging_max_concurrency: int = Field(default=4, alias="TAGGING_MAX_CONCURRENCY")
+    tagging_retries: int = Field(default=2, alias="TAGGING_RETRIES")
+    stem_max_concurrency: int = Field(default=4, alias="STEM_MAX_CONCURRENCY")
+    stem_clusters_per_call: int = Field(default=5, alias="STEM_CLUSTERS_PER_CALL") # 1 = one LLM call per cluster
+    hnsw_m: int = Field(default=16, alias="HNSW_M")
+    hnsw_ef_construction: int = Field(default=64, alias="HNSW_EF_CONSTRUCTION")
+    hnsw_ef_search: int = Field(default=100, alias="HNSW_EF_SEARCH")
 
     model_config = SettingsConfigDict(
         env_file=".env",